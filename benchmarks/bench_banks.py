@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the parse speed of each bank format adapter (monex_banks).
+
+Usage:
+    python benchmarks/bench_banks.py [--rows 1000000]
+
+For each registered format, a synthetic export of --rows transactions is
+written with its columns and date format. It is then parsed by its adapter
+(format detected from the header, explicit dtypes, exact date format) and by
+the generic pandas parse (type and date format inference). Both must give
+the same transactions.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_banks import BANK_FORMATS, read_statement
+from monex_mock import mock_table
+from monex_statement import Statement
+
+
+def write_export(path, fmt, st):
+    # Export of a statement in a bank format (extra columns the adapter skips)
+    cols = {}
+    dates = pd.DatetimeIndex(st.dates)
+    if "%H" in fmt.date_format:
+        dates = dates + pd.to_timedelta(np.arange(len(st)) % 86400, unit="s")
+    cols[fmt.columns["date"]] = dates.strftime(fmt.date_format)
+    cols[fmt.columns["amount"]] = st.amount * fmt.sign
+    cols[fmt.columns["merchant"]] = st.merchant
+    if "fees" in fmt.columns:
+        cols[fmt.columns["fees"]] = st.fees
+    if "category" in fmt.columns:
+        cols[fmt.columns["category"]] = st.category
+    if "currency" in fmt.columns:
+        cols[fmt.columns["currency"]] = np.where(np.arange(len(st)) % 3, "NZD", "EUR")
+    if "account" in fmt.columns:
+        cols[fmt.columns["account"]] = np.where(st.amount > 0, "Savings", "Current")
+    cols["Reference"] = np.arange(len(st))
+    pd.DataFrame(cols).to_csv(path, index=False, sep=fmt.sep)
+
+
+def generic_parse(path, fmt):
+    # Parse without declared dtypes nor date format (as a generic reader)
+    df = pd.read_csv(path, sep=fmt.sep)
+    dates = pd.to_datetime(df[fmt.columns["date"]],
+                           dayfirst=fmt.date_format.startswith("%d"))
+    fees = (pd.to_numeric(df[fmt.columns["fees"]], errors="coerce").fillna(0)
+            if "fees" in fmt.columns else np.zeros(len(df)))
+    category = (df[fmt.columns["category"]].fillna("") if "category" in fmt.columns
+                else np.full(len(df), "", dtype=object))
+    return Statement.from_columns(dates.to_numpy(dtype="datetime64[D]"),
+                                  pd.to_numeric(df[fmt.columns["amount"]],
+                                                errors="coerce") * fmt.sign,
+                                  df[fmt.columns["merchant"]].fillna(""), fees, category)
+
+
+def best_of(f, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    st = mock_table(args.rows, "2015-01-01", "2020-12-31", seed=0)
+    print("{:>14} {:>12} {:>12} {:>8}".format("format", "adapter [s]", "generic [s]", "speedup"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, fmt in BANK_FORMATS.items():
+            path = os.path.join(tmp, name + ".csv")
+            write_export(path, fmt, st)
+
+            t_adapter, parsed = best_of(lambda: read_statement(path))
+            t_generic, generic = best_of(lambda: generic_parse(path, fmt))
+
+            assert np.array_equal(parsed.ordinals, st.ordinals), name
+            assert np.allclose(parsed.amount, st.amount), name
+            assert (parsed.merchant == st.merchant).all(), name
+            assert np.array_equal(parsed.ordinals, generic.ordinals), name
+            if "fees" in fmt.columns:
+                assert np.allclose(parsed.fees, st.fees), name
+            if "category" in fmt.columns:
+                assert (parsed.category == st.category).all(), name
+            if "currency" in fmt.columns:
+                assert (parsed.currency == np.where(np.arange(len(st)) % 3, "NZD",
+                                                    "EUR")).all(), name
+            elif fmt.currency is not None:
+                assert (parsed.currency == fmt.currency).all(), name
+            print("{:>14} {:>12.3f} {:>12.3f} {:>7.1f}x".format(
+                name, t_adapter, t_generic, t_generic / t_adapter))
+
+
+if __name__ == "__main__":
+    main()
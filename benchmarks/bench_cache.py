@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of cold (csv parse) vs. warm (on-disk cache) statement loading.
+
+Usage:
+    python benchmarks/bench_cache.py [--sizes 10000 100000 1000000]
+
+A synthetic statement with the five-column schema read by data_extract
+("Date", "Amount", "Merchant", "Total fees", "Category") is written to a
+temporary directory for each size, together with a throw-away cache directory.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_cache import StatementCache
+from monex_mock import write_mock_csv
+from monex_statement import Statement
+
+def timed(func, *args):
+    start = time.perf_counter()
+    out = func(*args)
+    return time.perf_counter() - start, out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args(argv)
+
+    print("{:>10} {:>10} {:>10} {:>10} {:>9}".format(
+        "rows", "csv [s]", "cold [s]", "warm [s]", "speed-up"))
+    for n_rows in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "March.csv")
+            write_mock_csv(path, n_rows, "2021-03-01", "2021-03-31", seed=0)
+            cache = StatementCache(os.path.join(tmp, "cache"))
+
+            t_csv, parsed = timed(Statement.from_csv, path)
+            t_cold, _ = timed(cache.get, path)
+            t_warm, cached = timed(cache.get, path)
+            assert np.array_equal(parsed.amount, cached.amount)
+            assert np.array_equal(parsed.category, cached.category)
+            assert np.array_equal(parsed.merchant, cached.merchant)
+            print("{:>10} {:>10.4f} {:>10.4f} {:>10.4f} {:>8.1f}x".format(
+                n_rows, t_csv, t_cold, t_warm, t_csv / t_warm))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the merchant-to-category classifier (monex_classify).
+
+Usage:
+    python benchmarks/bench_classify.py [--rows 1000000]
+
+The classifier is trained on a labelled synthetic statement and then labels a
+second, unlabelled statement whose merchant strings are mangled the way card
+terminals do (upper case, store numbers), so the normalized lookup is
+exercised. Training and labelling times and the accuracy are reported.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_classify import MerchantClassifier
+from monex_mock import write_mock_csv
+from monex_statement import Statement
+
+
+def unlabelled(statement):
+    # Drops the categories and mangles the merchant strings of a statement
+    merchants = np.array(["{} #{:04d}".format(m.upper(), i) if m else m
+                          for i, m in enumerate(statement.merchants)], dtype=object)
+    no_category = np.zeros(len(statement), dtype=statement.category_codes.dtype)
+    return Statement(statement.ordinals, statement.amount, statement.fees,
+                     no_category, np.array([""], dtype=object),
+                     statement.merchant_codes, merchants)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--train-rows", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        train_path = os.path.join(tmp, "train.csv")
+        test_path = os.path.join(tmp, "test.csv")
+        write_mock_csv(train_path, args.train_rows, "2020-01-01", "2020-12-31", seed=0)
+        write_mock_csv(test_path, args.rows, "2021-01-01", "2021-12-31", seed=1)
+        train, test = Statement.from_csv(train_path), Statement.from_csv(test_path)
+
+    start = time.perf_counter()
+    clf = MerchantClassifier().fit([train])
+    t_fit = time.perf_counter() - start
+
+    query = unlabelled(test)
+    start = time.perf_counter()
+    labelled = clf.classify(query)
+    t_classify = time.perf_counter() - start
+
+    has_merchant = (test.merchant != "")
+    accuracy = np.mean(labelled.category[has_merchant] == test.category[has_merchant])
+    print("trained on {} rows in {:.3f} s".format(len(train), t_fit))
+    print("labelled {} rows ({} merchants) in {:.3f} s, accuracy {:.1%}".format(
+        len(query), len(query.merchants), t_classify, accuracy))
+
+
+if __name__ == "__main__":
+    main()
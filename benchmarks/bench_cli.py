@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the headless command line entry point (monex.py).
+
+Usage:
+    python benchmarks/bench_cli.py [--statements 200] [--rows 2000]
+
+Writes --statements mock monthly statements, runs `monex FOLDER --format json
+csv` on them and reports the throughput in statements per minute. The metrics
+of one statement are checked against range_costs and the statement
+aggregates, and matplotlib must not have been imported.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+import monex
+from monex_mock import write_mock_csv
+from monex_statement import Statement
+from monex_stream import StatementAggregates
+from monex_utils import range_costs
+
+
+def check_metrics(path, metrics):
+    # Comparing the metrics of a statement with the analytics code paths
+    st = Statement.from_csv(path)
+    start, end = metrics["start"], metrics["end"]
+    costs, labels, dates = range_costs(st.amount, st.category_codes, st.dates, start, end,
+                                       categories=st.categories)
+    income, _, _ = range_costs(st.amount, st.category_codes, st.dates, start, end,
+                               income=True, categories=st.categories)
+    cum = metrics["cumulative"]
+    assert cum["category"] == labels.tolist()
+    assert np.allclose(cum["costs"], costs, atol=0.01)
+    assert np.allclose(cum["income"], income[0] * -1, atol=0.01)
+    assert cum["date"] == dates.astype(str).tolist()
+
+    agg = StatementAggregates.from_statement(st)
+    cats, totals, counts, _ = agg.category_totals()
+    assert metrics["categories"]["category"] == cats.tolist()
+    assert metrics["categories"]["count"] == counts.tolist()
+    assert sum(metrics["histogram"]["count"]) == len(st)
+    not_income = (cats != "Income")
+    assert np.isclose(sum(metrics["pie_chart"]["percent"]), 100, atol=0.1)
+    assert np.isclose(sum(metrics["pie_chart"]["total"]), totals[not_income].sum(), atol=0.1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--statements", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder, outdir = os.path.join(tmp, "statements"), os.path.join(tmp, "out")
+        os.makedirs(folder)
+        months = np.datetime64("2010-01") + np.arange(args.statements)
+        for i, month in enumerate(months):
+            first = month.astype("datetime64[D]")
+            last = (month + 1).astype("datetime64[D]") - 1
+            write_mock_csv(os.path.join(folder, "{}.csv".format(month)), args.rows,
+                           first, last, seed=i)
+
+        start = time.perf_counter()
+        monex.main([folder, "--format", "json", "csv", "--outdir", outdir])
+        elapsed = time.perf_counter() - start
+
+        assert "matplotlib" not in sys.modules
+        name = str(months[0])
+        with open(os.path.join(outdir, name + ".json")) as f:
+            check_metrics(os.path.join(folder, name + ".csv"), json.load(f))
+        n_files = len(os.listdir(outdir))
+
+    print("{} statements ({} rows each) -> {} files in {:.2f} s: {:.0f} statements "
+          "per minute".format(args.statements, args.rows, n_files, elapsed,
+                              args.statements / elapsed * 60))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the fee aggregation of StatementAggregates and statement_metrics.
+
+Usage:
+    python benchmarks/bench_fees.py [--rows 1000000] [--chunksize 100000]
+
+The fees, absolute amounts and counts per category, merchant and month are
+aggregated with the costs (StatementAggregates, in one go and chunk by chunk)
+and checked against a pandas groupby of the same statement. The time of the
+aggregation with fees is reported next to the pandas groupby of the fees
+alone.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_metrics import statement_metrics
+from monex_mock import mock_table
+from monex_stream import FEE_GROUPS, StatementAggregates
+
+
+def best_of(f, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def pandas_fees(df, col):
+    # Fees, absolute amounts and counts per group with a pandas groupby
+    return df.groupby(col, sort=False).agg(fees=("fees", "sum"), volume=("volume", "sum"),
+                                           count=("fees", "size"))
+
+
+def check(agg, df, month=None, year=None):
+    # Comparing each fee table of agg with the pandas groupby
+    sub = df
+    if month is not None:
+        sub = sub[(sub.month.dt.month_name() == month) & (sub.month.dt.year == year)]
+    for by, col in zip(FEE_GROUPS, ("category", "merchant", "month")):
+        labels, fees, volume, counts, ratio = agg.fee_table(by, month, year)
+        expected = pandas_fees(sub, col).loc[labels]
+        assert np.allclose(expected.fees, fees), by
+        assert np.allclose(expected.volume, volume), by
+        assert np.array_equal(expected["count"].to_numpy(), counts), by
+        assert np.allclose(ratio, fees / volume, equal_nan=True), by
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    st = mock_table(args.rows, "2015-01-01", "2020-12-31", seed=0)
+    df = pd.DataFrame({"category": st.category, "merchant": st.merchant, "fees": st.fees,
+                       "volume": np.abs(st.amount),
+                       "month": st.dates.astype("datetime64[M]").astype("datetime64[s]")})
+
+    t_agg, agg = best_of(lambda: StatementAggregates.from_statement(st))
+    chunked = StatementAggregates()
+    for lo in range(0, len(st), args.chunksize):
+        chunked.update(st.take(slice(lo, lo + args.chunksize)))
+    t_pandas, _ = best_of(lambda: [pandas_fees(df, col) for col in
+                                   ("category", "merchant", "month")])
+    check(agg, df)
+    check(chunked, df)
+    check(agg, df, "March", 2019)
+    restored = StatementAggregates.from_arrays(agg.to_arrays())
+    check(restored, df)
+
+    # Fees of the metrics of one month
+    month = st.between(np.datetime64("2019-03-01"), np.datetime64("2019-03-31"))
+    metrics = statement_metrics(month)
+    fees = pd.DataFrame(metrics["fees"])
+    labels, month_fees, _, _, _ = agg.fee_table("merchant", "March", 2019)
+    merchants = fees[fees.group == "merchant"].set_index("name").fees
+    assert np.allclose(merchants.loc[labels], month_fees, atol=0.01)
+    assert np.isclose(sum(metrics["histogram"]["fees"]), month.fees.sum(), atol=0.1)
+
+    print("{} rows: aggregates with fees {:.3f} s, pandas fee groupbys {:.3f} s, "
+          "fee_table {:.2f} ms".format(
+              len(st), t_agg, t_pandas,
+              best_of(lambda: agg.fee_table("merchant", "March", 2019))[0] * 1000))
+
+
+if __name__ == "__main__":
+    main()
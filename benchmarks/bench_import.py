@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Startup benchmark of the monex modules, based on python -X importtime.
+
+Usage:
+    python benchmarks/bench_import.py [--module monex_analytics] [--top 10]
+
+Imports the module in a fresh interpreter, prints the total import time and
+the slowest imported packages, and exits with an error if plotting packages
+(matplotlib, jupyterthemes) were imported, since metrics-only runs must not
+pay for them.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+FORBIDDEN = ("matplotlib", "jupyterthemes")
+
+
+def import_times(module):
+    """
+    Returns the cumulative import time (microseconds) of `import module` and a
+    list of (cumulative microseconds, package) of the packages it imports
+    directly, as reported by -X importtime.
+    """
+
+    env = dict(os.environ, PYTHONPATH=SRC)
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                          "import {}".format(module)],
+                         env=env, capture_output=True, text=True, check=True)
+    total, children = 0, []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # The import tree is indented by two spaces per level
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level == 0 and name.strip() == module:
+            total = int(cumulative)
+        elif level == 1:
+            children.append((int(cumulative), name.strip()))
+    return total, children
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="monex_analytics")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    total, children = import_times(args.module)
+    print("import {}: {:.1f} ms".format(args.module, total / 1000))
+    for us, name in sorted(children, reverse=True)[:args.top]:
+        print("{:>10.1f} ms  {}".format(us / 1000, name))
+
+    env = dict(os.environ, PYTHONPATH=SRC)
+    check = ("import sys, {}; print(','.join(m for m in {!r} if m in sys.modules))"
+             .format(args.module, FORBIDDEN))
+    loaded = subprocess.run([sys.executable, "-c", check], env=env,
+                            capture_output=True, text=True,
+                            check=True).stdout.strip()
+    if loaded:
+        sys.exit("{} imported plotting packages: {}".format(args.module, loaded))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of serial vs. concurrent loading of many statement files.
+
+Usage:
+    python benchmarks/bench_loader.py [--files 100] [--rows 5000] [--latency 0.05]
+
+Network-mounted storage is emulated by a read function that waits --latency
+seconds before reading each file. The serial path reads and parses one file at
+a time; the concurrent one uses monex_loader. Both must give the same
+statements.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_loader import iter_statements, load_statements, read_file
+from monex_mock import write_mock_csv
+from monex_statement import Statement
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    def slow_read(path):
+        time.sleep(args.latency)
+        return read_file(path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            paths.append(os.path.join(tmp, "statement{:03d}.csv".format(i)))
+            write_mock_csv(paths[-1], args.rows, "2020-01-01", "2020-12-31", seed=i)
+
+        start = time.perf_counter()
+        serial = [Statement.from_csv_bytes(slow_read(p), p) for p in paths]
+        t_serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = load_statements(paths, concurrency=args.concurrency, read=slow_read)
+        t_concurrent = time.perf_counter() - start
+
+        # Time to the first statement handed to a consumer
+        async def first():
+            async for _ in iter_statements(paths, args.concurrency, slow_read):
+                return time.perf_counter()
+        start = time.perf_counter()
+        t_first = asyncio.run(first()) - start
+
+    for a, b in zip(serial, loaded):
+        assert np.array_equal(a.ordinals, b.ordinals)
+        assert np.array_equal(a.amount, b.amount)
+
+    print("{} files of {} rows, {:.0f} ms latency per file".format(
+        args.files, args.rows, args.latency * 1e3))
+    print("    serial {:8.3f} s".format(t_serial))
+    print("concurrent {:8.3f} s ({:.1f}x), first statement after {:.3f} s".format(
+        t_concurrent, t_serial / t_concurrent, t_first))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the binary transaction log (monex_log) against csv statements.
+
+Usage:
+    python benchmarks/bench_log.py [--rows 1000000]
+
+A synthetic multi-year statement is converted into a log (in two appends, with
+an interrupted third one), which is checked to round-trip to exactly the rows
+of the csv. Then the time to get a year of cumulative costs (range_costs) from
+the csv and from the memory-mapped log is compared.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_log import RECORD_DTYPE, TransactionLog, csv_to_log
+from monex_mock import write_mock_csv
+from monex_statement import Statement
+from monex_utils import range_costs
+
+
+def check_round_trip(expected, statement):
+    assert np.array_equal(statement.ordinals, expected.ordinals)
+    assert np.array_equal(statement.amount, expected.amount, equal_nan=True)
+    assert np.array_equal(statement.fees, expected.fees)
+    assert np.array_equal(statement.category, expected.category)
+    assert np.array_equal(statement.merchant, expected.merchant)
+
+
+def year_costs(statement):
+    return range_costs(statement.amount, statement.category_codes, statement.dates,
+                       "2019-01-01", "2019-12-31", categories=statement.categories)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "statement.csv")
+        log_path = os.path.join(tmp, "statement.mxlog")
+        write_mock_csv(csv_path, args.rows, "2018-01-01", "2020-12-31", seed=0)
+
+        start = time.perf_counter()
+        log = csv_to_log([csv_path], log_path, chunksize=args.rows // 2 + 1)
+        t_convert = time.perf_counter() - start
+
+        # Round trip, also after an append interrupted mid-record
+        start = time.perf_counter()
+        csv_statement = Statement.from_csv(csv_path)
+        t_csv = time.perf_counter() - start
+        check_round_trip(csv_statement, TransactionLog(log_path).statement())
+        with open(log_path, "ab") as f:
+            f.write(b"\0" * (RECORD_DTYPE.itemsize // 2))
+        check_round_trip(csv_statement, TransactionLog(log_path).statement())
+        extra = csv_statement.take(slice(0, 10))
+        log = TransactionLog(log_path)
+        log.append(extra)
+        check_round_trip(Statement.concat([csv_statement, extra]), log.statement())
+
+        start = time.perf_counter()
+        from_csv = year_costs(Statement.from_csv(csv_path))
+        t_csv_costs = time.perf_counter() - start
+        start = time.perf_counter()
+        from_log = year_costs(TransactionLog(log_path).statement().take(
+            slice(0, len(csv_statement))))
+        t_log_costs = time.perf_counter() - start
+        assert np.allclose(from_csv[0], from_log[0])
+        size_csv, size_log = os.path.getsize(csv_path), os.path.getsize(log_path)
+
+    print("{} rows: csv {:.1f} MB, log {:.1f} MB, converted in {:.3f} s".format(
+        args.rows, size_csv / 1024**2, size_log / 1024**2, t_convert))
+    print("parse csv {:8.3f} s".format(t_csv))
+    print("year of costs from csv {:8.3f} s, from log {:8.3f} s ({:.0f}x)".format(
+        t_csv_costs, t_log_costs, t_csv_costs / t_log_costs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of merging overlapping statement exports (monex_merge).
+
+Usage:
+    python benchmarks/bench_merge.py [--rows 1000000] [--files 200]
+
+A synthetic statement is cut into overlapping exports (each one also covers
+half of the next one's rows), which are merged back; the merged statement is
+checked to hold exactly the rows of the original one.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_merge import merge_statements
+from monex_mock import write_mock_csv
+from monex_statement import Statement
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--files", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "statement.csv")
+        write_mock_csv(path, args.rows, "2018-01-01", "2020-12-31", seed=0)
+        full = Statement.from_csv(path).sort_by_date()
+
+    # Overlapping exports: each one runs into the first half of the next one
+    bounds = np.linspace(0, len(full), args.files + 1).astype(int)
+    overlap = np.diff(bounds) // 2
+    exports = [full.take(slice(lo, min(hi + extra, len(full))))
+               for lo, hi, extra in zip(bounds[:-1], bounds[1:], np.r_[overlap[1:], 0])]
+    n_exported = sum(len(st) for st in exports)
+
+    start = time.perf_counter()
+    merged, n_duplicates = merge_statements(exports)
+    elapsed = time.perf_counter() - start
+
+    assert len(merged) == len(full) and n_duplicates == n_exported - len(full)
+    assert np.array_equal(merged.ordinals, full.ordinals)
+    assert np.isclose(merged.amount.sum(), full.amount.sum())
+    print("merged {} exports ({} rows, {} duplicates) in {:.3f} s".format(
+        len(exports), n_exported, n_duplicates, elapsed))
+
+
+if __name__ == "__main__":
+    main()
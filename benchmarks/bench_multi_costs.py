@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of monex_utils.multi_costs against the original nested-loop
+implementation it replaced.
+
+Usage:
+    python benchmarks/bench_multi_costs.py [--sizes 1000 100000 1000000]
+
+Before timing, both paths are run on the same synthetic statement and the
+results are checked to be equivalent (same cumulative series per category) for
+both income=False and income=True.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_utils import days_number, multi_costs, unique_elemts
+
+CATEGORIES = np.array(["Rent", "Groceries", "Income", "Others", "Coffee",
+                       "Drinks Out", "Eating Out", "Transport", "Medical",
+                       "Travel"], dtype=object)
+
+
+def legacy_multi_costs(amount, category, days, month, income=False, year=None):
+    """
+    Original O(n_cat * n_days * N) implementation, kept for reference (and
+    checked against multi_costs in tests/test_multi_costs.py). The day sort is
+    made stable so both paths agree on the category order.
+    """
+    n_days = days_number(month, year)
+    day_arr = np.arange(1, n_days + 1)
+
+    if not income:
+        mask = (category != "Income")
+        amount, category, days = amount[mask], category[mask], days[mask]
+        idx = np.argsort(days, kind="stable")
+        costs, costs_cats, days = amount[idx], category[idx], days[idx]
+        label_categ = unique_elemts(costs_cats)
+        n_cat = len(label_categ)
+
+    if income:
+        costs = amount[category == "Income"]
+        costs_cats = category[category == "Income"]
+        days = days[category == "Income"]
+        label_categ = np.array(["Income"])
+        n_cat = 1
+
+    multi_arr = np.ones((n_cat, n_days))
+    for i in range(n_cat):
+        val = 0
+        curr_cat = label_categ[i]
+        for j in range(n_days):
+            cost_day = np.sum(
+                costs[(days == day_arr[j]) & (costs_cats == curr_cat)]) * -1
+            val += cost_day
+            multi_arr[i][j] = val
+
+    return multi_arr, label_categ
+
+
+def mock_columns(n_rows, month="March", year=None, seed=0):
+    """Object-dtype columns shaped like the output of data_extract."""
+    rng = np.random.default_rng(seed)
+    days = rng.integers(1, days_number(month, year) + 1, size=n_rows)
+    category = CATEGORIES[rng.integers(0, len(CATEGORIES), size=n_rows)]
+    amount = np.round(rng.normal(-20, 10, size=n_rows), 2)
+    amount[category == "Income"] *= -50
+    return amount.astype(object), category, days
+
+
+def check_equivalent(amount, category, days, month):
+    for income in (False, True):
+        new, new_labels = multi_costs(amount, category, days, month, income)
+        old, old_labels = legacy_multi_costs(amount, category, days, month, income)
+        assert list(new_labels) == list(old_labels), (new_labels, old_labels)
+        assert np.allclose(new, old), "multi_costs diverged from legacy path"
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--month", default="March")
+    args = parser.parse_args(argv)
+
+    check_equivalent(*mock_columns(5_000, args.month), args.month)
+
+    print("{:>10} {:>12} {:>12} {:>9}".format("rows", "legacy [s]",
+                                             "vector [s]", "speed-up"))
+    for n_rows in args.sizes:
+        amount, category, days = mock_columns(n_rows, args.month)
+        t_old = timed(legacy_multi_costs, amount, category, days, args.month)
+        t_new = timed(multi_costs, amount, category, days, args.month)
+        print("{:>10} {:>12.4f} {:>12.4f} {:>8.0f}x".format(
+            n_rows, t_old, t_new, t_old / t_new))
+
+
+if __name__ == "__main__":
+    main()
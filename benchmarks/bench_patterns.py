@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the recurring payment and anomaly detection (monex_patterns).
+
+Usage:
+    python benchmarks/bench_patterns.py [--rows 1000000] [--years 5]
+
+A synthetic history (mock_table) is mixed with known recurring payments (rent,
+salary, subscriptions, a gym with jittered dates) and a few anomalous
+purchases. The detector is fitted in one go and month by month, and checked
+to find exactly the injected recurring payments (those occurring at least
+MIN_OCCURRENCES times over --years) and anomalies, with the same category
+medians as pandas.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_classify import normalize_merchant
+from monex_mock import mock_table
+from monex_patterns import PatternDetector
+from monex_statement import Statement
+
+# Merchant -> (category, amount, period in days, date jitter in days)
+RECURRING = {
+    "Landlord Property Ltd": ("Rent", -520.0, "monthly", 0),
+    "NETFLIX.COM 8842": ("Others", -15.99, "monthly", 0),
+    "Employer Payroll": ("Income", 2450.0, "fortnightly", 0),
+    "City Fitness 07": ("Others", -18.5, "weekly", 1),
+    "Insurance Co Annual": ("Others", -640.0, "yearly", 0),
+}
+
+# Occurrences needed to call a payment recurring (PatternDetector.recurring)
+MIN_OCCURRENCES = 3
+
+
+def recurring_rows(start, end, rng):
+    # Transactions of the RECURRING payments between start and end
+    cols = {"dates": [], "amount": [], "merchant": [], "category": []}
+    for merchant, (category, amount, period, jitter) in RECURRING.items():
+        if period == "monthly":
+            dates = np.arange(start.astype("datetime64[M]"), end.astype("datetime64[M]"))
+            dates = dates.astype("datetime64[D]") + 0
+        elif period == "yearly":
+            dates = np.arange(start.astype("datetime64[Y]"), end.astype("datetime64[Y]"))
+            dates = dates.astype("datetime64[D]") + 40
+        else:
+            step = 14 if period == "fortnightly" else 7
+            dates = np.arange(start, end, step)
+        dates = dates + rng.integers(-jitter, jitter + 1, len(dates))
+        cols["dates"].append(dates)
+        cols["amount"].append(np.full(len(dates), amount))
+        cols["merchant"].append(np.full(len(dates), merchant, dtype=object))
+        cols["category"].append(np.full(len(dates), category, dtype=object))
+    cols = {k: np.concatenate(v) for k, v in cols.items()}
+    return Statement.from_columns(cols["dates"], cols["amount"], cols["merchant"],
+                                  np.zeros(len(cols["amount"])), cols["category"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2018-01-01")
+    end = np.datetime64("{}-01-01".format(2018 + args.years))
+    spikes = Statement.from_columns(
+        start + rng.integers(0, (end - start).astype(int), 5),
+        [-900.0, -1250.0, -780.0, -1500.0, -990.0], ["Big Purchase"] * 5,
+        np.zeros(5), ["Groceries"] * 5)
+    injected = recurring_rows(start, end, rng)
+    history = Statement.concat([
+        mock_table(args.rows, start, end - 1, seed=0), injected, spikes]).sort_by_date()
+
+    # Payments occurring often enough over the span to be found as recurring
+    merchants, occurrences = np.unique(injected.merchant, return_counts=True)
+    expected = {normalize_merchant(m): RECURRING[m][2]
+                for m, n in zip(merchants, occurrences) if n >= MIN_OCCURRENCES}
+
+    t0 = time.perf_counter()
+    detector = PatternDetector.from_statement(history)
+    rec = detector.recurring(MIN_OCCURRENCES)
+    flagged = detector.anomalies(history)
+    t_fit = time.perf_counter() - t0
+
+    # Month by month, as statements arrive
+    months = history.dates.astype("datetime64[M]")
+    bounds = np.searchsorted(months, np.unique(months))
+    incremental = PatternDetector()
+    t0 = time.perf_counter()
+    for lo, hi in zip(bounds, np.r_[bounds[1:], len(history)]):
+        incremental.update(history.take(slice(lo, hi)))
+    t_update = (time.perf_counter() - t0) / len(bounds)
+
+    found = dict(zip(rec["merchant"], rec["period"]))
+    assert found == expected, (found, expected)
+    assert (flagged & (history.merchant == "Big Purchase")).sum() == 5
+    assert flagged.sum() < 1e-3 * len(history), flagged.sum()
+
+    # Incremental histograms and per-category medians match the one-shot fit
+    for name in ("group_keys", "group_count", "gap_keys", "gap_counts", "amount_counts"):
+        assert np.array_equal(getattr(incremental, name), getattr(detector, name)), name
+    stats = detector._statistics()
+    medians = pd.Series(history.amount * 100).groupby(history.category).median()
+    for cat_id, median in zip(stats["categories"], stats["median"]):
+        assert np.isclose(median, medians[detector.categories[cat_id]])
+
+    print("{} rows: {} recurring payments, {} anomalies, fitted in {:.3f} s "
+          "({:.1f} ms per monthly update)".format(
+              len(history), len(rec["merchant"]), int(flagged.sum()), t_fit,
+              t_update * 1e3))
+    for i in range(len(rec["merchant"])):
+        print("  {:<25} {:>9.2f}  {:<11} every {:5.1f} days".format(
+            rec["merchant"][i], rec["amount"][i], rec["period"][i], rec["interval"][i]))
+
+
+if __name__ == "__main__":
+    main()
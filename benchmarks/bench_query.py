@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of indexed queries over a transaction history (monex_query).
+
+Usage:
+    python benchmarks/bench_query.py [--rows 10000000]
+
+A synthetic ten-year history is indexed once; then selective queries (a
+category over a quarter, a merchant substring, amount bounds, grouped by week
+or month) are timed and checked against full boolean-mask scans.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_mock import mock_table
+from monex_query import TransactionIndex
+
+
+def timed(func, repeat=5):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args(argv)
+
+    st = mock_table(args.rows, "2015-01-01", "2024-12-31", seed=0)
+    start = time.perf_counter()
+    index = TransactionIndex(st)
+    t_build = time.perf_counter() - start
+    print("indexed {} rows in {:.2f} s".format(len(index), t_build))
+
+    dates, category, merchant = st.dates, st.category, st.merchant
+    queries = {
+        "Coffee, 2019 Q1": (
+            lambda q: q.between("2019-01-01", "2019-03-31").categories(["Coffee"]),
+            (dates >= np.datetime64("2019-01-01")) & (dates <= np.datetime64("2019-03-31"))
+            & (category == "Coffee")),
+        "merchant 'rent merchant 1' in 2020": (
+            lambda q: q.between("2020-01-01", "2020-12-31").merchant("RENT MERCHANT 1"),
+            (dates >= np.datetime64("2020-01-01")) & (dates <= np.datetime64("2020-12-31"))
+            & (np.char.find(merchant.astype(str), "Rent merchant 1") >= 0)),
+        "Groceries < -60, 2016-2017": (
+            lambda q: q.between("2016-01-01", "2017-12-31").categories(["Groceries"])
+                       .amount(high=-60),
+            (dates >= np.datetime64("2016-01-01")) & (dates <= np.datetime64("2017-12-31"))
+            & (category == "Groceries") & (st.amount <= -60)),
+    }
+
+    print("{:>36} {:>9} {:>10} {:>12}".format("query", "rows", "time [ms]", "by week [ms]"))
+    for name, (build, mask) in queries.items():
+        t_rows, rows = timed(lambda: build(index.query()).rows())
+        t_week, (keys, totals, counts, _) = timed(lambda: build(index.query()).group_by("week"))
+        expected = index.statement.amount[build(index.query()).rows()].sum()
+        assert len(rows) == mask.sum() and counts.sum() == len(rows)
+        assert np.isclose(st.amount[mask].sum(), expected) and np.isclose(totals.sum(), expected)
+        print("{:>36} {:>9} {:>10.2f} {:>12.2f}".format(name, len(rows), t_rows * 1e3,
+                                                     t_week * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the rolling statistics engine (monex_rolling) and FX conversion.
+
+Usage:
+    python benchmarks/bench_rolling.py [--years 10] [--categories 50] [--rows 1000000]
+
+Rolling sums, means and percentiles over 7/30/90-day windows of a synthetic
+(categories x days) spending matrix are checked against pandas' rolling and
+timed. Then --rows amounts in several currencies are converted to the
+reporting currency against a daily rate table, and checked against a per-row
+lookup on a sample.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_fx import FXRates
+from monex_rolling import DEFAULT_WINDOWS, RollingStats
+
+
+def check_rolling(stats):
+    # Comparing a few categories against pandas' rolling
+    frame = pd.DataFrame(stats.daily[:5].T)
+    for window in DEFAULT_WINDOWS:
+        roll = frame.rolling(window)
+        assert np.allclose(stats.sum(window)[:5], roll.sum().to_numpy().T, equal_nan=True)
+        for q in (50, 90):
+            expected = roll.quantile(q / 100).to_numpy().T
+            assert np.allclose(stats.percentile(window, q)[:5], expected, equal_nan=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    n_days = 365 * args.years
+    dates = np.arange(np.datetime64("2015-01-01"), np.datetime64("2015-01-01") + n_days)
+    spent = rng.random((args.categories, n_days)) < 0.3
+    daily = np.round(rng.gamma(2.0, 15.0, spent.shape) * spent, 2)
+    stats = RollingStats(daily, dates, ["cat{}".format(i) for i in range(args.categories)],
+                         counts=spent.astype(np.int64))
+    check_rolling(stats)
+
+    start = time.perf_counter()
+    table = stats.table()
+    t_rolling = time.perf_counter() - start
+
+    # FX: a rate table with gaps (weekends) and amounts in four currencies
+    business = dates[np.is_busday(dates)]
+    currencies = ["AUD", "EUR", "GBP", "USD"]
+    rates = rng.uniform(0.5, 2.0, (len(business), len(currencies)))
+    fx = FXRates(business, currencies, rates, currency="NZD")
+    cur = np.array(currencies + ["NZD"], dtype=object)[rng.integers(0, 5, args.rows)]
+    when = dates[rng.integers(5, n_days, args.rows)]
+    amount = rng.normal(-20, 5, args.rows)
+
+    start = time.perf_counter()
+    converted = fx.convert(amount, cur, when)
+    t_fx = time.perf_counter() - start
+
+    # Dictionary-encoded currencies (as statements keep their strings)
+    codes, uniques = pd.factorize(cur)
+    start = time.perf_counter()
+    coded = fx.convert(amount, codes, when, currencies=uniques)
+    t_fx_codes = time.perf_counter() - start
+    assert np.array_equal(coded, converted)
+
+    for i in rng.integers(0, args.rows, 1000):
+        if cur[i] == "NZD":
+            expected = amount[i]
+        else:
+            row = np.flatnonzero(business <= when[i])[-1]
+            expected = amount[i] * rates[row, currencies.index(cur[i])]
+        assert np.isclose(converted[i], expected)
+
+    print("{} years x {} categories: {} rolling statistics in {:.3f} s".format(
+        args.years, args.categories, len(table), t_rolling))
+    print("converted {} amounts in {:.1f} ms ({:.1f} ms from currency codes)".format(
+        args.rows, t_fx * 1e3, t_fx_codes * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of in-memory vs. streamed (chunked) statement aggregation.
+
+Usage:
+    python benchmarks/bench_stream.py [--rows 1000000] [--chunksize 100000]
+
+Both paths aggregate the same synthetic multi-year statement; the streamed
+totals are checked against the in-memory ones, and the peak traced memory of
+each path is reported (the streamed peak should follow the chunk size, not the
+file size).
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_mock import write_mock_csv
+from monex_statement import Statement
+from monex_stream import StatementAggregates, stream_statement
+
+def traced(func, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    out = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, elapsed, peak
+
+
+def in_memory(path):
+    return StatementAggregates.from_statement(Statement.from_csv(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "statement.csv")
+        write_mock_csv(path, args.rows, "2018-01-01", "2020-12-31", seed=0)
+
+        full, t_full, peak_full = traced(in_memory, path)
+        streamed, t_stream, peak_stream = traced(stream_statement, path,
+                                                 chunksize=args.chunksize)
+
+    for a, b in zip(full.category_totals(), streamed.category_totals()):
+        assert np.array_equal(a, b) or np.allclose(a, b)
+    for month in ("January", "February", "December"):
+        for income in (False, True):
+            a, la = full.cost_matrix(month, income)
+            b, lb = streamed.cost_matrix(month, income)
+            assert list(la) == list(lb) and np.allclose(a, b)
+
+    print("{:>10} {:>10} {:>14}".format("path", "time [s]", "peak mem [MB]"))
+    print("{:>10} {:>10.3f} {:>14.1f}".format("in-memory", t_full,
+                                              peak_full / 1024**2))
+    print("{:>10} {:>10.3f} {:>14.1f}".format("streamed", t_stream,
+                                              peak_stream / 1024**2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of monex_utils.unique_elemts / factorize against the original
+list-based unique_elemts, which is O(n * n_unique).
+
+Usage:
+    python benchmarks/bench_unique.py [--sizes 10000 1000000]
+
+Two columns are timed per size: a low-cardinality one (categories) and a
+high-cardinality one (merchants, n / 10 distinct values). The list-based path
+is skipped when it would take more than ~1e9 comparisons.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_utils import factorize, unique_elemts
+
+
+def legacy_unique_elemts(x):
+    """Original list-based implementation, kept for reference."""
+    uni_x = []
+    for element in x:
+        if element not in uni_x:
+            uni_x.append(element)
+    return np.array(uni_x)
+
+
+def column(n_rows, n_unique, seed=0):
+    rng = np.random.default_rng(seed)
+    names = np.array(["Merchant {}".format(i) for i in range(n_unique)],
+                     dtype=object)
+    return names[rng.integers(0, n_unique, size=n_rows)]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    out = func(*args)
+    return time.perf_counter() - start, out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10_000, 1_000_000])
+    args = parser.parse_args(argv)
+
+    print("{:>10} {:>9} {:>12} {:>12} {:>12}".format(
+        "rows", "uniques", "legacy [s]", "unique [s]", "factorize [s]"))
+    for n_rows in args.sizes:
+        for n_unique in (10, max(n_rows // 10, 1)):
+            x = column(n_rows, n_unique)
+            t_new, uniques = timed(unique_elemts, x)
+            t_codes, (labels, codes) = timed(factorize, x)
+            assert np.array_equal(labels[codes], x)
+
+            if n_rows * n_unique <= 1e9:
+                t_old, old = timed(legacy_unique_elemts, x)
+                assert list(old) == list(uniques)
+                legacy = "{:>12.4f}".format(t_old)
+            else:
+                legacy = "{:>12}".format("skipped")
+            print("{:>10} {:>9} {} {:>12.4f} {:>12.4f}".format(
+                n_rows, n_unique, legacy, t_new, t_codes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite of the statement-to-report pipeline.
+
+Usage:
+    python benchmarks/run.py run [--sizes 10000 100000 1000000] [--repeat 5]
+    python benchmarks/run.py compare [BASE HEAD] [--threshold 0.10]
+
+'run' generates mock statements locally (monex_mock) for each size, times every
+stage (csv load, date parsing, multi_costs, unique_elemts, filt_income/sort_ind
+and the data preparation of each chart) and appends the results to a JSON
+history file. 'compare' diffs two runs of the history (by default the last
+two) and exits with status 1 if any benchmark got slower than the threshold.
+Everything runs offline.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from monex_mock import write_mock_csv
+from monex_statement import COLUMNS, Statement
+from monex_stream import StatementAggregates
+from monex_utils import filt_income, multi_costs, sort_ind, unique_elemts
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(__file__), "history.json")
+
+# name -> function(fixture) returning the callable to be timed
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a benchmark; the decorated function prepares and returns the
+    zero-argument callable that is timed."""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+class Fixture:
+    """Mock statement of a given size, with its stages precomputed once."""
+
+    def __init__(self, folder, n_rows):
+        self.path = os.path.join(folder, "March.csv")
+        write_mock_csv(self.path, n_rows, "2021-03-01", "2021-03-31", seed=0)
+        self.frame = pd.read_csv(self.path, usecols=COLUMNS)
+        self.statement = Statement.from_csv(self.path)
+        self.aggregates = StatementAggregates.from_statement(self.statement)
+        self.category = self.statement.category
+
+
+@benchmark("csv_load")
+def bench_csv_load(fx):
+    return lambda: pd.read_csv(fx.path, sep=',', usecols=COLUMNS)
+
+
+@benchmark("date_parse")
+def bench_date_parse(fx):
+    return lambda: pd.to_datetime(fx.frame["Date"], dayfirst=True)
+
+
+@benchmark("statement")
+def bench_statement(fx):
+    return lambda: Statement.from_frame(fx.frame)
+
+
+@benchmark("multi_costs")
+def bench_multi_costs(fx):
+    st = fx.statement
+    return lambda: multi_costs(st.amount, fx.category, st.days, "March")
+
+
+@benchmark("unique_elemts")
+def bench_unique_elemts(fx):
+    return lambda: unique_elemts(fx.category)
+
+
+@benchmark("filt_income_sort_ind")
+def bench_filt_income_sort_ind(fx):
+    return lambda: sort_ind(*filt_income(fx.statement.amount, fx.category))
+
+
+@benchmark("aggregates")
+def bench_aggregates(fx):
+    return lambda: StatementAggregates.from_statement(fx.statement)
+
+
+@benchmark("pie_chart_data")
+def bench_pie_chart_data(fx):
+    return lambda: fx.aggregates.category_totals("March")
+
+
+@benchmark("histogram_data")
+def bench_histogram_data(fx):
+    agg = fx.aggregates
+    return lambda: (agg.day_counts("March"), agg.category_totals("March"))
+
+
+@benchmark("cost_plot_data")
+def bench_cost_plot_data(fx):
+    agg = fx.aggregates
+    return lambda: (agg.cost_matrix("March"), agg.cost_matrix("March", income=True))
+
+
+def best_of(func, repeat):
+    """Best wall time in seconds of `repeat` calls (nanosecond timer)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func()
+        elapsed = (time.perf_counter_ns() - start) / 1e9
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))
+                              ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def run(sizes, repeat, names=None):
+    """
+    Times the selected benchmarks at every size.
+
+    Returns:
+    -------
+    results: dict
+             "name@size" -> best wall time in seconds.
+    """
+
+    results = {}
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            fx = Fixture(tmp, n_rows)
+            for name, setup in BENCHMARKS.items():
+                if names and name not in names:
+                    continue
+                key = "{}@{}".format(name, n_rows)
+                results[key] = best_of(setup(fx), repeat)
+                print("{:>32} {:>10.4f} s".format(key, results[key]))
+    return results
+
+
+def compare(base, head, threshold):
+    """
+    Prints the ratio head/base of every benchmark present in both runs and
+    returns the list of benchmarks slower than 1 + threshold.
+    """
+
+    regressions = []
+    print("{:>32} {:>10} {:>10} {:>7}".format("benchmark", "base [s]",
+                                              "head [s]", "ratio"))
+    for key in sorted(set(base["results"]) & set(head["results"])):
+        old, new = base["results"][key], head["results"][key]
+        ratio = new / old if old > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print("{:>32} {:>10.4f} {:>10.4f} {:>7.2f}{}".format(key, old, new,
+                                                           ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="run the benchmarks and record them")
+    p_run.add_argument("--sizes", type=int, nargs="+",
+                       default=[10_000, 100_000, 1_000_000])
+    p_run.add_argument("--repeat", type=int, default=5)
+    p_run.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    p_run.add_argument("--label", default=None)
+
+    p_cmp = sub.add_parser("compare", help="compare two recorded runs")
+    p_cmp.add_argument("runs", nargs="*", type=int,
+                       help="indices of the base and head runs (default -2 -1)")
+    p_cmp.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    if args.command == "run":
+        history.append({
+            "label": args.label,
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "results": run(args.sizes, args.repeat, args.only),
+        })
+        with open(args.history, "w") as f:
+            json.dump(history, f, indent=1)
+    else:
+        base, head = args.runs or [-2, -1]
+        if len(history) < 2:
+            sys.exit("Need at least two recorded runs in {}".format(args.history))
+        if compare(history[base], history[head], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Command line entry point of monex: computes the metrics of the reports (see
+monex_metrics) of csv bank statements and writes them as JSON and/or CSV,
+headless and without blocking, e.g. from a cron job:
+    python -m monex STATEMENT_OR_FOLDER [...] [--start DATE] [--end DATE]
+                    [--format json csv] [--outdir OUTDIR] [--merge]
+                    [--charts {png,svg}] [--cache DIR]
+Each statement gets its own metrics ({outdir}/{name}.json, ...), or a single
+"merged" report with --merge (overlapping exports counted once, see
+monex_merge). matplotlib is only imported if --charts is given.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import numpy as np
+from monex_loader import load_statements
+from monex_metrics import save_metrics, statement_metrics
+
+FORMATS = ("json", "csv")
+
+
+def statement_paths(inputs):
+    """
+    Expands the input paths: folders are replaced by the csv files they hold
+    (sorted), files are kept as given.
+    """
+
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths += sorted(glob.glob(os.path.join(path, "*.csv")))
+        else:
+            paths.append(path)
+    return paths
+
+
+def save_charts(metrics, outdir, name, fmt="png", renderer=None):
+    """
+    Renders the pie chart, histogram, cost plot and fee plot of metrics
+    headless (Agg, see monex_render) into outdir. Returns the paths written.
+    """
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import monex_analytics as ma
+    from monex_render import Renderer
+
+    ma._pyplot()
+    renderer = renderer or Renderer(fmt=fmt)
+    pie, hist = metrics["pie_chart"], metrics["histogram"]
+    cats, cum = metrics["categories"], metrics["cumulative"]
+    fees = {key: np.array(values) for key, values in metrics["fees"].items()}
+    by_category, by_merchant = fees["group"] == "category", fees["group"] == "merchant"
+    title = "{} to {}".format(metrics["start"], metrics["end"])
+
+    paths = [os.path.join(outdir, "{}__{}.{}".format(name, kind, renderer.fmt))
+             for kind in ("PieChart", "Histogram", "Plot", "Fees")]
+    renderer.render("pie_chart", paths[0], ma._draw_pie_chart, dict(figsize=(13, 9)),
+                    labels=np.array(pie["category"], dtype=object),
+                    perc_costs=np.array(pie["percent"]), explode=np.array(pie["explode"]),
+                    title="Expenses from {} per category: Total of {:.2f} {}".format(
+                        title, -sum(pie["total"]), metrics["currency"]))
+    renderer.render("histogram", paths[1], ma._draw_histogram,
+                    dict(nrows=1, ncols=2, figsize=(16, 9), sharey=True),
+                    day_counts=np.array(hist["count"]),
+                    labels=np.array(cats["category"], dtype=object),
+                    cat_counts=np.array(cats["count"]))
+    renderer.render("range_cost_plot", paths[2], ma._draw_range_cost_plot,
+                    dict(nrows=2, ncols=1, figsize=(9, 14), sharex=True),
+                    day_arr=np.array(cum["date"], dtype="datetime64[D]"),
+                    costs=np.array(cum["costs"]).reshape(len(cum["category"]), -1),
+                    cost_labels=np.array(cum["category"], dtype=object),
+                    income=np.array(cum["income"]),
+                    total_costs=np.array(cum["total_costs"]),
+                    title="Detailed costs from {}".format(title),
+                    currency=metrics["currency"])
+    renderer.render("fee_plot", paths[3], ma._draw_fee_plot,
+                    dict(nrows=2, ncols=1, figsize=(12, 12)),
+                    labels=fees["name"][by_category].astype(object),
+                    fees=fees["fees"][by_category].astype(float),
+                    ratio=fees["ratio"][by_category].astype(float),
+                    merchants=fees["name"][by_merchant][:10].astype(object),
+                    merchant_fees=fees["fees"][by_merchant][:10].astype(float),
+                    title="Fees from {} per category: Total of {:.2f} {}".format(
+                        title, fees["fees"][by_category].sum(), metrics["currency"]),
+                    currency=metrics["currency"])
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="monex",
+        description="Compute the expense metrics of csv bank statements.")
+    parser.add_argument("inputs", nargs="+", metavar="PATH",
+                        help="csv statements or folders of csv statements")
+    parser.add_argument("--start", default=None,
+                        help="first day of the range, e.g. 2021-03-01 "
+                             "(default: first date of each statement)")
+    parser.add_argument("--end", default=None,
+                        help="last day of the range (default: last date)")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=["json"],
+                        dest="formats", help="output formats (default: json)")
+    parser.add_argument("--outdir", default=".")
+    parser.add_argument("--merge", action="store_true",
+                        help="a single report of all the statements")
+    parser.add_argument("--charts", nargs="?", const="png", choices=("png", "svg"),
+                        default=None, help="also render the charts (png or svg)")
+    parser.add_argument("--cache", default=None,
+                        help="cache folder of parsed statements")
+    args = parser.parse_args(argv)
+
+    paths = statement_paths(args.inputs)
+    if not paths:
+        parser.error("no csv statements found in {}".format(" ".join(args.inputs)))
+
+    start = time.perf_counter()
+    cache = None
+    if args.cache:
+        from monex_cache import StatementCache
+        cache = StatementCache(args.cache)
+    statements = load_statements(paths, cache=cache)
+
+    if args.merge:
+        from monex_merge import merge_statements
+        reports = [("merged", merge_statements(statements)[0])]
+    else:
+        reports = [(os.path.splitext(os.path.basename(p))[0], st)
+                   for p, st in zip(paths, statements)]
+
+    renderer = None
+    for name, st in reports:
+        metrics = statement_metrics(st, args.start, args.end)
+        metrics["sources"] = paths if args.merge else [st.path]
+        save_metrics(metrics, args.outdir, name, args.formats)
+        if args.charts:
+            if renderer is None:
+                from monex_render import Renderer
+                renderer = Renderer(fmt=args.charts)
+            save_charts(metrics, args.outdir, name, renderer=renderer)
+
+    print("{} reports of {} statements written to {} in {:.2f} s".format(
+        len(reports), len(paths), args.outdir, time.perf_counter() - start),
+        file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
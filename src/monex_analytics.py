@@ -24,27 +24,192 @@ OUTPUT: Analytics of the costs, including:
 
 # Importing all neccesary modules and plot settings
 #%config InlineBackend.figure_format = 'retina'   # to see plots in HD
+import glob
 import os
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
 import time
 from monex_utils import *
-from jupyterthemes import jtplot
-jtplot.style(theme='monokai', context='notebook', ticks=True, grid=False)
+from monex_statement import Statement
+from monex_merge import merge_statements
+from monex_stream import StatementAggregates
+from monex_instrument import span
+from monex_fx import REPORTING_CURRENCY
 
-plt.rc('axes', titlesize=20)  # fontsize of the axes title
-plt.rc('axes', labelsize=20)  # fontsize of the x and y labels
-plt.rc('xtick', labelsize=20)  # fontsize of the tick labels
-plt.rc('ytick', labelsize=20)  # fontsize of the tick labels
-plt.rc('legend', fontsize=18)  # legend fontsize
-plt.rc('figure', titlesize=20)  # fontsize of the figure title
-colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
 
-PATH_TO_FOLDER = r"C:\Users\rbv\OneDrive\Escritorio\Side__Projects\Monthly_Expenses\my-expenses"
+def jupyterthemes_style():
+    """
+    Default theme hook: the monokai jupyterthemes style, if that (optional)
+    package is installed.
+    """
+    try:
+        from jupyterthemes import jtplot
+    except ImportError:
+        return
+    jtplot.style(theme='monokai', context='notebook', ticks=True, grid=False)
+
+
+# Plotting (matplotlib and the theme) is only set up the first time a plot
+# method is called, so metrics-only runs never import it. THEME_HOOK can be
+# replaced by any callable (or None) before plotting.
+THEME_HOOK = jupyterthemes_style
+colors = None
+_plt = None
+
+
+def _pyplot():
+    """
+    Imports matplotlib.pyplot, applies the theme hook and plot settings on
+    first use and returns pyplot.
+    """
+    global _plt, colors
+    if _plt is None:
+        import matplotlib.pyplot as plt
+        if THEME_HOOK is not None:
+            THEME_HOOK()
+
+        plt.rc('axes', titlesize=20)  # fontsize of the axes title
+        plt.rc('axes', labelsize=20)  # fontsize of the x and y labels
+        plt.rc('xtick', labelsize=20)  # fontsize of the tick labels
+        plt.rc('ytick', labelsize=20)  # fontsize of the tick labels
+        plt.rc('legend', fontsize=18)  # legend fontsize
+        plt.rc('figure', titlesize=20)  # fontsize of the figure title
+        # Repeating the color cycle so there is a color for every category
+        cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        colors = cycle * (64 // len(cycle) + 1)
+        _plt = plt
+    return _plt
+
+def _draw_pie_chart(fig, ax, labels, perc_costs, explode, title):
+    # Pie chart of the costs per category (see pie_chart)
+    pie = ax[0].pie(perc_costs,
+                    colors=colors[7:],
+                    explode=explode,
+                    shadow=True,
+                    startangle=0)
+
+    # Creating independent legend with labels so text nor percentage overlaps
+    ax[0].axis("equal")
+    new_label = [
+        "{} - {:.1f}%".format(labels[i], perc_costs[i])
+        for i in range(len(labels))
+    ]
+    ax[0].legend(pie[0],
+                 new_label,
+                 bbox_to_anchor=(0.75, 0.85),
+                 loc=0,
+                 bbox_transform=fig.transFigure)
+
+    ax[0].set_title(title)
+    fig.tight_layout()
+
+
+def _draw_cost_plot(fig, ax, day_arr, costs, cost_labels, income, total_costs,
+                    title, currency):
+    # Cumulative costs per category, income, costs and savings (see cost_plot)
+    for i in range(len(cost_labels)):
+        ax[0].plot(day_arr, costs[i], label=cost_labels[i], color=colors[i+7])
+
+    # Plotting overall costs and incomes
+    ax[1].plot(day_arr, income,
+               label="Income: {}{:.2f}".format(currency, income[-1]), color=colors[0])
+    ax[1].plot(day_arr, total_costs,
+               label="Total Costs: {}{:.2f}".format(currency, total_costs[-1]), color=colors[2])
+    ax[1].plot(day_arr, income - total_costs,
+               label="Savings: {}{:.2f}".format(currency, (income - total_costs)[-1]),
+               color=colors[1])
+
+    for i in range(2):
+        ax[i].grid(True)
+        ax[i].legend(loc=0)
+        ax[i].set_ylabel('Amount [{}]'.format(currency))
+
+    # Setting up aesthetical features
+    ax[1].set_xlabel('Day of the month')
+    ax[0].set_title(title)
+    fig.tight_layout()
+
+
+def _draw_range_cost_plot(fig, ax, **data):
+    # Cost plot over calendar dates, with tilted date ticks (see
+    # RangeExpenses_Analytics.cost_plot)
+    _draw_cost_plot(fig, ax, **data)
+    ax[1].set_xlabel('Date')
+    fig.autofmt_xdate()
+    fig.tight_layout()
+
+
+def _draw_histogram(fig, ax, day_counts, labels, cat_counts):
+    # Transactions per day and per category (see histogram)
+    ax[0].bar(np.arange(1, len(day_counts) + 1), day_counts, width=1)
+    ax[1].bar(np.arange(len(cat_counts)), cat_counts)
+
+    ax[0].set_ylabel("Counts")
+    ax[0].set_xlabel("Days")
+    ax[0].set_title("# of transactions per day of the month")
+
+    ax[1].set_title("# of transactions per category")
+    # Tilting x-labels so they don't overlap
+    ax[1].set_xticks(np.arange(len(cat_counts)))
+    ax[1].set_xticklabels(labels, rotation=60)
+    fig.tight_layout()
+
+
+def _draw_fee_plot(fig, ax, labels, fees, ratio, merchants, merchant_fees, title,
+                   currency):
+    # Fees per category (with their fee-to-amount ratio) and top merchants
+    # by fees (see fee_plot)
+    ax[0].bar(np.arange(len(fees)), fees, color=colors[7])
+    for i in range(len(fees)):
+        if np.isfinite(ratio[i]):
+            ax[0].annotate("{:.2f}%".format(ratio[i] * 100), (i, fees[i]),
+                           ha="center", va="bottom")
+    ax[1].barh(np.arange(len(merchant_fees)), merchant_fees, color=colors[8])
+
+    ax[0].set_title(title)
+    ax[0].set_ylabel("Fees [{}]".format(currency))
+    ax[0].set_xticks(np.arange(len(fees)))
+    ax[0].set_xticklabels(labels, rotation=60)
+    ax[1].set_title("Merchants with the highest fees")
+    ax[1].set_xlabel("Fees [{}]".format(currency))
+    ax[1].set_yticks(np.arange(len(merchant_fees)))
+    ax[1].set_yticklabels(merchants)
+    ax[1].invert_yaxis()
+    fig.tight_layout()
+
+def _render_figure(renderer, path, kind, savefig, draw, layout, **data):
+    # Draws a figure: through the renderer (headless, reused figures and
+    # cached images) when saving with one, with pyplot otherwise
+    plt = _pyplot()
+    if savefig and renderer is not None:
+        renderer.render(kind, path, draw, layout, **data)
+        return
+
+    layout = dict(layout)
+    fig, ax = plt.subplots(layout.pop("nrows", 1), layout.pop("ncols", 1),
+                           **layout)
+    draw(fig, np.atleast_1d(ax).flatten(), **data)
+    if savefig:
+        plt.savefig(path,
+                    format='png',
+                    dpi=200,
+                    pad_inches=0.1,
+                    bbox_inches='tight')
+    plt.show()
+
+# Currency of the reports (see monex_fx to convert multi-currency statements)
+CURRENCY = REPORTING_CURRENCY
+
+# Folder of the csv statements, which can be set with the MONEX_FOLDER
+# environment variable
+PATH_TO_FOLDER = os.environ.get(
+    "MONEX_FOLDER",
+    r"C:\Users\rbv\OneDrive\Escritorio\Side__Projects\Monthly_Expenses\my-expenses")
 
 class MonthlyExpenses_Dataset:
-    "Document class later"
+    """
+    Mock bank statements of a given month, see monex_mock for statements of
+    arbitrary size and date range.
+    """
     
     def __init__(self, month, year):
         """
@@ -63,7 +228,7 @@ class MonthlyExpenses_Dataset:
         self.month = month
         self.year = year
     
-    def create_mock_data(save_csv=False):
+    def create_mock_data(self, save_csv=False, n_rows=200, seed=None):
         """
         Creates a pandas.DataFrame representing a mock bank statement. 
 
@@ -71,6 +236,10 @@ class MonthlyExpenses_Dataset:
         ----------
         save_csv: bool
                   If True, mock data will be saved into current directory.
+        n_rows: (optional) int
+                Number of transactions of the mock statement.
+        seed: (optional) int
+              Seed of the random generator, for reproducible data.
         Returns:
         -------
         df: pandas.DataFrame
@@ -82,110 +251,134 @@ class MonthlyExpenses_Dataset:
         to the public.
         """
 
-        # Initialize some data
-        month_number = np.random.randint(1,12)
-        monthName = month_name(month_number)
-        n_days = days_number(monthName)
-        year = 2021
-
-        # Define some (arbitrary) average weekly expenses
-        AVERAGE_RENT = 260
-        AVERAGE_GROCERIES = 100
-        AVERAGE_OTHERS = 20
-        AVERAGE_INCOME = 1000
-
-        # DEfine some daily expenses
-        AVERAGE_COFFEE = 4.5
-        AVERAGE_DRINK = 11
-        AVERAGE_MEAL_OUT = 14
-
-
-        # Define fixed weekly payments
-        rent = np.random.normal(AVERAGE_RENT, scale=AVERAGE_RENT//10)
-        groceries = np.random.normal(AVERAGE_GROCERIES, scale=AVERAGE_GROCERIES//10)
-        income = np.random.normal(AVERAGE_INCOME, scale=AVERAGE_INCOME//100)
-        others = np.random.normal(AVERAGE_OTHERS, scale=AVERAGE_OTHERS/5)
-
-        dummy_merch = "Dummy merchant"
-        dummy_fees = 0
-
-        # Initialize pd.DataFrame with a coffee
-        init_data = {"Date": f"01/{month_number}/{year}", 
-                     "Amount": AVERAGE_COFFEE, 
-                     "Merchant": dummy_merch, 
-                     "Total fees": dummy_fees, 
-                     "Category": "Coffee"}
-        df = pd.DataFrame(init_data, index=[0])
-
-        # Constructing cost array
-        for i, day in enumerate(range(1,n_days+1)):
-            day_noise = np.random.randint(0,2)
-            # First append 
-            if i%7 == 0:
-                # Generate random values for inconsistent expenses and put all costs into list
-                weekend_eating = np.random.normal(AVERAGE_MEAL_OUT, scale=AVERAGE_MEAL_OUT//10)
-                weekend_drinking = np.random.normal(AVERAGE_DRINK, scale=AVERAGE_DRINK//10)
-                weekend_coffee = np.random.normal(AVERAGE_COFFEE, scale=AVERAGE_COFFEE//10)
-
-                weekend_amount = [rent, groceries, income, others, weekend_coffee, weekend_drinking, weekend_eating]
-                weekend_dates = [f"{day}/{month_number}/{year}", f"{day+day_noise}/{month_number}/{year}", 
-                                 f"{day+1}/{month_number}/{year}", f"{day+day_noise}/{month_number}/{year}", 
-                                 f"{day+day_noise}/{month_number}/{year}", f"{day+day_noise}/{month_number}/{year}", 
-                                 f"{day+day_noise}/{month_number}/{year}"]
-                weekend_merch = [dummy_merch for _ in range(len(weekend_amount))]
-                weekend_fees = [dummy_merch for _ in range(len(weekend_amount))]
-                weekend_categories = ["Rent", "Groceries", "Income", "Others", "Coffee", "Drinks Out", "Eating Out"]
-                weekly_expenses = {"Date": weekend_dates, "Amount": weekend_amount, "Merchant": weekend_merch, 
-                                   "Total fees": weekend_fees, "Category": weekend_categories}
-
-                df.append(weekly_expenses, ignore_index=True)
-
-            # Add some random daily expenses
-            else:
-                daily_expenses = {"Date": [f"{day+day_noise}/{month_number}/{year}"], 
-                                  "Amount": [np.random.normal(AVERAGE_COFFEE, scale=AVERAGE_COFFEE//10)], 
-                                  "Merchant": [dummy_merch],  "Total fees": [dummy_fees], "Category": ["Coffee"]}
-                # Adding some other random arbitary cost for every few days
-                rand = np.random.randint(0,2)
-                if rand == 1:
-                    daily_dates = [f"{day}/{month_number}/{year}", f"{day}/{month_number}/{year}",f"{day+day_noise}/{month_number}/{year}"]
-                    daily_amounts = [np.random.normal(AVERAGE_COFFEE, scale=AVERAGE_COFFEE//10), 
-                                     np.random.normal(AVERAGE_MEAL_OUT, scale=AVERAGE_MEAL_OUT//10),
-                                     np.random.normal(AVERAGE_DRINK, scale=AVERAGE_MEAL_OUT//10)]
-                    daily_merch = [dummy_merch for _ in range(len(daily_amounts))]
-                    daily_fees = [dummy_merch for _ in range(len(daily_amounts))]
-                    daily_categories = ["Coffee", "Eating Out", "Drinks Out"]
-
-                    daily_expenses = {"Date": daily_dates, "Amount": daily_amounts, "Merchant": daily_merch, 
-                                   "Total fees": daily_fees, "Category": daily_categories}
-
-                df.append(daily_expenses, ignore_index=True)
+        from monex_mock import mock_statement
+
+        # The statement covers every day of the instantiated month
+        n_days = days_number(month_name(self.month), self.year)
+        start = np.datetime64("{:04d}-{:02d}-01".format(self.year, self.month))
+        df = mock_statement(n_rows, start, start + n_days - 1, seed=seed)
 
         # Saving the pd.DataFrame if required
         if save_csv is True:
             df.to_csv("Mock_BankStatement.csv", index=False)
 
         return df
-                
-                
-            
-    # Generating random data
-    #for i in range(1, n_days+1):
+
 
 class MonthlyExpenses_Analytics:
 
-    def __init__(self, month):
+    def __init__(self, month, cache=None, year=None, folder=None, outdir=".",
+                 store=None, classifier=None, renderer=None):
         """
         Initiaties class by inputting the month to perform the data analysis of
         costs.
+
+        Parameters:
+        ----------
+        month: str
+               Month of the bank statement, read from {PATH_TO_FOLDER}/{month}.csv
+        cache: (optional) monex_cache.StatementCache
+               On-disk cache of parsed statements. If given, the statement is
+               loaded from the cache instead of parsing the csv when possible.
+        year: (optional) int
+              Year of the statement, so that leap years are taken into account.
+        folder: (optional) str
+                Folder containing the csv statements. Defaults to PATH_TO_FOLDER.
+        outdir: (optional) str
+                Folder where figures are saved when savefig=True.
+        store: (optional) monex_store.AggregateStore
+               Store of precomputed aggregates the plot methods read from. Rows
+               appended to the csv are ingested incrementally, and if the csv
+               is no longer available the stored month is used as is.
+        classifier: (optional) monex_classify.MerchantClassifier
+                    Labels the transactions with no "Category" from their
+                    merchant when the statement is read or its rows are
+                    ingested by the store.
+        renderer: (optional) monex_render.Renderer
+                  Renders the saved figures (savefig=True) headless, reusing
+                  the figures and serving unchanged months from its cache.
         """
         self.month = month
-        self.PATH_TO_FOLDER = PATH_TO_FOLDER
+        self.year = year
+        self.PATH_TO_FOLDER = folder or PATH_TO_FOLDER
+        self.outdir = outdir
+        self.cache = cache
+        self.store = store
+        self.classifier = classifier
+        self.renderer = renderer
+        self._statement = None
+        self._aggregates = None
+
+    def statement(self):
+        """
+        Returns the parsed bank statement of the instantiated month. The csv
+        file is only parsed the first time and again if it has changed on disk
+        (different modification time or size), so all methods share one parse.
+
+        Returns:
+        -------
+        statement: monex_statement.Statement
+                   Statement with typed columns (see monex_statement).
+        """
+
+        if self._statement is None or self._statement.is_stale():
+            loc = os.path.join(self.PATH_TO_FOLDER, f"{self.month}.csv")
+            if self.cache is not None:
+                self._statement = self.cache.get(loc)
+            else:
+                self._statement = Statement.from_csv(loc)
+            if self.classifier is not None:
+                with span("classify"):
+                    self._statement = self.classifier.classify(self._statement)
+        return self._statement
+
+    def aggregates(self, print_time=False):
+        """
+        Returns the aggregates (per category and date sums, counts and fees)
+        the plot methods are drawn from: read from the store (after ingesting
+        any new rows of the csv) if there is one, and computed once from the
+        statement otherwise.
+
+        Parameters:
+        ----------
+        print_time: (optional) boolean
+                    Prints how much time it takes to load the aggregates.
+
+        Returns:
+        -------
+        agg: monex_stream.StatementAggregates
+        """
+
+        start = time.time()
+        with span("aggregate"):
+            agg = self._load_aggregates()
+        end = time.time()
+
+        if print_time:
+            print("The Bankstatement aggregates took {:.3f} s to load.".format(
+                end - start))
+        return agg
+
+    def _load_aggregates(self):
+        # Aggregates from the store or from the (parsed once) statement
+        if self.store is not None:
+            # Folding in any rows appended to the csv since the last ingestion
+            loc = os.path.join(self.PATH_TO_FOLDER, f"{self.month}.csv")
+            if os.path.exists(loc) or not self.store.has_month(self.month, self.year):
+                self.store.ingest_file(loc, classifier=self.classifier)
+            agg = self.store.aggregates
+        else:
+            st = self.statement()
+            if self._aggregates is None or self._aggregates[0] is not st:
+                self._aggregates = (st, StatementAggregates.from_statement(st))
+            agg = self._aggregates[1]
+        return agg
 
     def data_extract(self, print_time=False, df_display=False):
         """
         Reads csv bank statement from instantiated month and extracts relevant
-        data into arrays.
+        data into arrays. The csv file is parsed only once per instance (see
+        statement method).
         
         Parameters:
         ----------
@@ -213,13 +406,9 @@ class MonthlyExpenses_Analytics:
                   for each transaction.  
         """
         
-        # Loading the file with pandas
-        loc = os.path.join(self.PATH_TO_FOLDER, f"{self.month}.csv")
-        
+        # Loading the (cached) statement
         start = time.time()
-        df = pd.read_csv(loc,sep=',',
-                         usecols=["Date", "Amount", "Merchant", "Total fees", "Category"])
-        timestamp, amount, merchant, fees, category = df.values.T
+        st = self.statement()
         end = time.time()
 
         if print_time:
@@ -227,13 +416,17 @@ class MonthlyExpenses_Analytics:
                 end - start))
             
         if df_display:
-            pd.display(df)
+            print(st.to_frame().head())
 
-        # Now turning the timestamp into a day array
-        timestamp, amount, merchant, fees, category = df.values.T
-        days = pd.to_datetime(timestamp, dayfirst=True).day.values
         # Return the extracted arrays
-        return days, amount, merchant, fees, category
+        return st.days, st.amount, st.merchant, st.fees, st.category
+
+    def _render(self, kind, name, savefig, draw, layout, **data):
+        # Draws a figure of the month (see _render_figure)
+        ext = self.renderer.fmt if self.renderer is not None else "png"
+        path = os.path.join(self.outdir, "Expenses__{}__{}.{}".format(
+            name, self.month, ext))
+        _render_figure(self.renderer, path, kind, savefig, draw, layout, **data)
 
     # Now creating a set of methods to display each of the required listed graphics above:
 
@@ -253,122 +446,74 @@ class MonthlyExpenses_Analytics:
         
         """
 
-        # First extract the data to be used i.e. category and amount
-        days, amount, merchant, fees, category = self.data_extract(
-            print_time=True)
-        
-        start1 = time.time()
-        # Setting the labels, colors and explode for piechart:
-        labels = np.sort(unique_elemts(category[category != "Income"]))
-        n_cat = len(labels)
-        color = colors[8:n_cat+9]
-
-        # Now , we need to mask the income and sort the categories and costs via index sorting
-        costs, pie_cat = sort_ind(*filt_income(amount, category))
-
-        # Finding total costs and percentage spent in each category
-        total = np.sum(costs)
-        perc_costs = np.zeros(n_cat)
-        for i in range(n_cat):
-            perc_costs[i] = np.sum(costs[pie_cat == labels[i]]) / total * 100
-
-        perc_costs = np.abs(perc_costs)
-        # Creating explode so some categories are highlighted
-        explode = np.zeros(n_cat)
-        explode[labels == 'Drinks Out'] = 0.15
-        explode[labels == 'Eating Out'] = 0.15
-        explode[labels == 'Groceries'] = 0.15
-
-        # Creating the piechart
-        plt.figure(figsize=(13, 9))
-        pie = plt.pie(perc_costs,
-                      colors=colors[7:],
-                      explode=explode,
-                      shadow=True,
-                      startangle=0)
-
-        # Creating independent legend with labels so text nor percentage overlaps
-        plt.gca().axis("equal")
-        new_label = [
-            "{} - {:.1f}%".format(labels[i], perc_costs[i])
-            for i in range(len(labels))
-        ]
-        plt.legend(pie[0],
-                   new_label,
-                   bbox_to_anchor=(0.75, 0.85),
-                   loc=0,
-                   bbox_transform=plt.gcf().transFigure)
-
-        plt.title("Expenses of {} per category: Total of {:.2f} NZD".format(
-            self.month, -1 * total))
-        plt.tight_layout()
-        if savefig:
-            plt.savefig("Expenses__PieChart__{}.png".format(self.month),
-                        format='png',
-                        dpi=200,
-                        pad_inches=0.1,
-                        bbox_inches='tight')
-        plt.show()
-        end1 = time.time()
-        print("The data processing and pie-chart plotting took {:.2f} s".format(end1-start1))
+        # First extract the aggregates to be used i.e. total cost per category
+        agg = self.aggregates()
+
+        with span("prepare.pie_chart"):
+            labels, cat_costs, _, _ = agg.category_totals(self.month, self.year)
+
+            # Setting the labels (sorted, without income), colors and explode for piechart:
+            not_income = (labels != "Income")
+            order = np.argsort(labels[not_income])
+            labels = labels[not_income][order]
+            cat_costs = cat_costs[not_income][order]
+            n_cat = len(labels)
+
+            # Finding total costs and percentage spent in each category
+            total = np.sum(cat_costs)
+            perc_costs = np.abs(cat_costs / total * 100)
+
+            # Creating explode so some categories are highlighted
+            explode = np.zeros(n_cat)
+            explode[labels == 'Drinks Out'] = 0.15
+            explode[labels == 'Eating Out'] = 0.15
+            explode[labels == 'Groceries'] = 0.15
+
+        with span("render.pie_chart"):
+            self._render("pie_chart", "PieChart", savefig, _draw_pie_chart,
+                         dict(figsize=(13, 9)), labels=labels,
+                         perc_costs=perc_costs, explode=explode,
+                         title="Expenses of {} per category: Total of {:.2f} {}".format(
+                             self.month, -1 * total, CURRENCY))
 
     def cost_plot(self, savefig=False):
-        """String-doc method later"""
+        """
+        Produces and displays the cumulative costs of each category for each
+        day of the month, together with the cumulative income, total costs
+        and savings of the month.
 
-        # Extracting the data
-        days, amount, merchant, fees, category = self.data_extract()
-        
-        start1 = time.time()
-        # We need to crate a multidimensional array (n_cat x n_days) s.t. it contains the cumulative amount of costs per category
-        costs, cost_labels = multi_costs(amount, category, days, self.month)
-        daily_costs = costs.T
-        total_costs = [np.sum(daily_costs[i]) for i in range(np.shape(daily_costs)[0])] 
-
-        # Finding the income values and total cumulative costs
-        income, dummy_label = multi_costs(amount,category,days,self.month,income=True)
-        
-        # Creating an array with the number of days in the week
-        n_days = days_number(self.month)
-        day_arr = np.arange(1, n_days + 1)
+        Parameters:
+        ----------
+        savefig: (optional) boolean
+                 saves displayed plot in current directory.
 
-        # Displaying the costs, income and fees as a function of time
-        fig, ax = plt.subplots(2, 1, figsize=(9, 14), sharex=True)
-        ax = ax.flatten()
-        
-        # Plotting specific costs 
-        for i in range(len(cost_labels)):
-            ax[0].plot(day_arr, costs[i], label=cost_labels[i], color=colors[i+7])
-        
-        # Plotting overall costs and incomes
-        ax[1].plot(day_arr, income[0] * -1, 
-                   label="Income: NZD{:.2f}".format(income[0][-1] * -1), color=colors[0])
-        ax[1].plot(day_arr, total_costs, 
-                   label="Total Costs: NZD{:.2f}".format(total_costs[-1]), color=colors[2])
-        ax[1].plot(day_arr, (income[0] * -1) - total_costs, 
-                   label="Savings: NZD{:.2f}".format(((income[0] * -1) - total_costs)[-1]),color=colors[1])
-        
-        
-        for i in range(2):
-            ax[i].grid(True)
-            ax[i].legend(loc=0)
-            ax[i].set_ylabel('Amount [NZD]')
-
-        # Setting up aesthetical features
-        ax[1].set_xlabel('Day of the month')
-        ax[0].set_title("Detailed costs of {} as a function of time".format(self.month))
-        #ax[1].set_title("Income of {} as a function of time".format(self.month))
-        plt.tight_layout()
+        Returns:
+        -------
+        None: plot is produced but axis are not returned.
+        """
+
+        # Extracting the aggregates
+        agg = self.aggregates()
         
-        if savefig:
-            plt.savefig("Expenses__Plot__{}.png".format(self.month),
-                format='png',
-                dpi=200,
-                pad_inches=0.1,
-                bbox_inches='tight')
+        with span("prepare.cost_plot"):
+            # We need to crate a multidimensional array (n_cat x n_days) s.t. it contains the cumulative amount of costs per category
+            costs, cost_labels = agg.cost_matrix(self.month, year=self.year)
+            total_costs = np.sum(costs, axis=0)
+
+            # Finding the income values and total cumulative costs
+            income, dummy_label = agg.cost_matrix(self.month, income=True, year=self.year)
         
-        plt.show()
-        end1 = time.time()
-        print("The data processing and detailed cost plotting took {:.2f} s".format(end1-start1))
+            # Creating an array with the number of days in the week
+            n_days = days_number(self.month, self.year)
+            day_arr = np.arange(1, n_days + 1)
+
+        with span("render.cost_plot"):
+            self._render("cost_plot", "Plot", savefig, _draw_cost_plot,
+                         dict(nrows=2, ncols=1, figsize=(9, 14), sharex=True),
+                         day_arr=day_arr, costs=costs, cost_labels=cost_labels,
+                         income=income[0] * -1, total_costs=total_costs,
+                         title="Detailed costs of {} as a function of time".format(
+                             self.month), currency=CURRENCY)
 
         
     def histogram(self, savefig=False):
@@ -386,37 +531,55 @@ class MonthlyExpenses_Analytics:
         None: It plots the histgrams without returning axes.
         """
 
-        # Extracting the data
-        days, amount, merchant, fees, category = self.data_extract()
-        
-        start1 = time.time()
-        # We want to create two histograms: one tracking the amount of transactions
-        # per day of the month and the amount of transactions per category
-        fig, ax = plt.subplots(1, 2, figsize=(16, 9), sharey=True)
-        ax = ax.flatten()
-
-        ax[0].hist(days, bins=days_number(self.month))
-        ax[1].hist(category, bins=len(unique_elemts(category)))
-
-        ax[0].set_ylabel("Counts")
-        ax[0].set_xlabel("Days")
-        ax[0].set_title("# of transactions per day of the month")
-
-        ax[1].set_title("# of transactions per category")
-        # Tilting x-labels so they don't overlap
-        ax[1].set_xticklabels(unique_elemts(category), rotation=60)
-        plt.tight_layout()
+        # Extracting the aggregates
+        agg = self.aggregates()
         
-        # Giving the option to save the figure:
-        if savefig:
-            plt.savefig("Expenses__Histogram__{}.png".format(self.month),
-                        format='png',
-                        dpi=200,
-                        pad_inches=0.1,
-                        bbox_inches='tight')
-        plt.show()
-        end1 = time.time()
-        print("The data processing and histogram displaying took {:.2f} s".format(end1-start1))
+        with span("prepare.histogram"):
+            # We want to create two histograms: one tracking the amount of transactions
+            # per day of the month and the amount of transactions per category
+            day_counts = agg.day_counts(self.month, self.year)
+            labels, _, cat_counts, _ = agg.category_totals(self.month, self.year)
+
+        with span("render.histogram"):
+            self._render("histogram", "Histogram", savefig, _draw_histogram,
+                         dict(nrows=1, ncols=2, figsize=(16, 9), sharey=True),
+                         day_counts=day_counts, labels=labels,
+                         cat_counts=cat_counts)
+
+    def fee_plot(self, savefig=False, top=10):
+        """
+        Produces and displays the fees paid in each category (annotated with
+        the fee-to-amount ratio) and by the merchants with the highest fees.
+        The fees come from the aggregates, no extra pass over the statement.
+
+        Parameters:
+        ----------
+        savefig: (optional) boolean
+                 saves the fee plot in current directory.
+        top: (optional) int
+             Number of merchants displayed.
+
+        Returns:
+        -------
+        None: It plots the fees without returning axes.
+        """
+
+        agg = self.aggregates()
+
+        with span("prepare.fee_plot"):
+            labels, fees, _, _, ratio = agg.fee_table("category", self.month, self.year)
+            merchants, merchant_fees, _, _, _ = agg.fee_table("merchant", self.month,
+                                                              self.year)
+            order = np.argsort(-merchant_fees, kind="stable")[:top]
+
+        with span("render.fee_plot"):
+            self._render("fee_plot", "Fees", savefig, _draw_fee_plot,
+                         dict(nrows=2, ncols=1, figsize=(12, 12)),
+                         labels=labels, fees=fees, ratio=ratio,
+                         merchants=merchants[order], merchant_fees=merchant_fees[order],
+                         title="Fees of {} per category: Total of {:.2f} {}".format(
+                             self.month, fees.sum(), CURRENCY),
+                         currency=CURRENCY)
 
     """
        TO DO:
@@ -435,3 +598,108 @@ class MonthlyExpenses_Analytics:
             (b) Use AI (PyTorch) to identify merchant and put in given category (?) - Long term idea
             (c) Create GUI to display improve layman's user experience (?) - Long term idea
     """
+
+
+class RangeExpenses_Analytics:
+
+    def __init__(self, start, end, paths=None, cache=None, folder=None, outdir=".",
+                 renderer=None):
+        """
+        Initiaties class by inputting an arbitrary date range (which may span
+        several months or years) to perform the data analysis of costs.
+
+        Parameters:
+        ----------
+        start, end: str or datetime64
+                    First and last day (both included) of the analysis,
+                    e.g. "2020-07-01".
+        paths: (optional) list of str
+               csv bank statements covering the range. By default every csv
+               file in folder is read (including files added later on).
+        cache: (optional) monex_cache.StatementCache
+               On-disk cache of parsed statements.
+        folder: (optional) str
+                Folder containing the csv statements. Defaults to PATH_TO_FOLDER.
+        outdir: (optional) str
+                Folder where figures are saved when savefig=True.
+        renderer: (optional) monex_render.Renderer
+                  Renders the saved figures (savefig=True) headless, reusing
+                  the figures and serving unchanged ranges from its cache.
+        """
+        self.start = np.datetime64(start, "D")
+        self.end = np.datetime64(end, "D")
+        self.paths = paths
+        self.cache = cache
+        self.PATH_TO_FOLDER = folder or PATH_TO_FOLDER
+        self.outdir = outdir
+        self.renderer = renderer
+        self._paths = None
+        self._statements = None
+        self._merged = None
+
+    def statement(self):
+        """
+        Returns all the statements of the range merged into a single
+        monex_statement.Statement, sorted by date and with the transactions of
+        overlapping exports counted once (see monex_merge). The csv files are
+        loaded concurrently (see monex_loader), once and again only if one of
+        them has changed on disk or a file was added to (or removed from) the
+        folder.
+        """
+
+        paths = self.paths
+        if paths is None:
+            paths = sorted(glob.glob(os.path.join(self.PATH_TO_FOLDER, "*.csv")))
+
+        if (self._statements is None or paths != self._paths
+                or any(st.is_stale() for st in self._statements)):
+            # Reading and parsing the files concurrently (the loader, with
+            # asyncio and the executors, is only imported here)
+            from monex_loader import load_statements
+            self._statements = load_statements(paths, cache=self.cache)
+            self._merged = merge_statements(self._statements)[0]
+            self._paths = list(paths)
+        return self._merged
+
+    def _render(self, kind, name, savefig, draw, layout, **data):
+        # Draws a figure of the range (see _render_figure)
+        ext = self.renderer.fmt if self.renderer is not None else "png"
+        path = os.path.join(self.outdir, "Expenses__{}__{}__{}.{}".format(
+            name, self.start, self.end, ext))
+        _render_figure(self.renderer, path, kind, savefig, draw, layout, **data)
+
+    def cost_plot(self, savefig=False):
+        """
+        Produces and displays the cumulative costs per category and the overall
+        income, costs and savings for each day of the date range.
+
+        Parameters:
+        ----------
+        savefig: (optional) boolean
+                 saves displayed plot in current directory.
+
+        Returns:
+        -------
+        None: plot is produced but axis are not returned.
+        """
+
+        st = self.statement()
+
+        with span("prepare.range_cost_plot"):
+            # Cumulative costs and income over the whole range in one pass each
+            dates = st.dates
+            costs, cost_labels, date_arr = range_costs(
+                st.amount, st.category_codes, dates, self.start, self.end,
+                categories=st.categories)
+            income, _, _ = range_costs(st.amount, st.category_codes, dates,
+                                       self.start, self.end, income=True,
+                                       categories=st.categories)
+            total_costs = np.sum(costs, axis=0)
+
+        with span("render.range_cost_plot"):
+            self._render("range_cost_plot", "Plot", savefig, _draw_range_cost_plot,
+                         dict(nrows=2, ncols=1, figsize=(9, 14), sharex=True),
+                         day_arr=date_arr, costs=costs, cost_labels=cost_labels,
+                         income=income[0] * -1, total_costs=total_costs,
+                         title="Detailed costs from {} to {}".format(
+                             self.start, self.end), currency=CURRENCY)
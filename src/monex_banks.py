@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+Adapters for the csv exports of different banks. Each BankFormat declares
+    - the mapping from the columns of monex_statement.Statement ("date",
+      "amount", "merchant", "fees", "category", "currency", "account", or
+      "debit"/"credit" for banks exporting two amount columns) to the columns
+      of the export
+    - the exact date format of the export (e.g. "%d/%m/%Y")
+    - the sign convention of its amounts
+    - the currency of its amounts, for exports without a currency column
+so pandas reads the columns with explicit dtypes (floats and categoricals, no
+type inference) and parses the dates with a fixed format (no per-row format
+guessing), which is several times faster than the generic parse. Every adapter
+produces the same typed Statement.
+
+The format of a file is detected from its header (see detect_format), and new
+formats are added with register:
+    register(BankFormat("mybank", {"date": "Posted", "amount": "Value",
+                                   "merchant": "Payee"}, date_format="%Y-%m-%d"))
+The built-in column mappings follow sample exports of each bank; a bank that
+changes its export only needs a new (or re-registered) BankFormat.
+"""
+
+import csv
+import io
+import numpy as np
+import pandas as pd
+from monex_instrument import span
+from monex_statement import (Statement, code_dtype, file_stamp, intern_dictionary,
+                             to_ordinals)
+
+# Fields of a Statement an adapter can map ("debit"/"credit" replace "amount")
+FIELDS = ("date", "amount", "merchant", "fees", "category", "currency", "account",
+          "debit", "credit")
+
+# Number of leading lines searched for the header (some exports start with
+# account details)
+HEADER_LINES = 10
+
+# Registered formats, by name
+BANK_FORMATS = {}
+
+
+def _dictionary(values):
+    # Codes (in order of first appearance) and interned dictionary of a string
+    # column, read as a pandas categorical (missing values, code -1, -> "")
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Renumbering the (few) categorical codes instead of the strings; -1
+        # indexes the "" appended to the labels
+        codes, uniques = pd.factorize(values.cat.codes.to_numpy())
+        labels = np.append(values.cat.categories.to_numpy(dtype=object), "")
+        dictionary = labels[uniques]
+    else:
+        codes, dictionary = pd.factorize(values.fillna("").to_numpy(dtype=object))
+    return codes.astype(code_dtype(len(dictionary))), intern_dictionary(dictionary)
+
+
+class BankFormat:
+    """
+    csv export format of a bank, see module docstring.
+    """
+
+    def __init__(self, name, columns, date_format, sign=1, optional=(), currency=None,
+                 sep=",", decimal=".", thousands=None, encoding="utf-8-sig"):
+        """
+        Constructor of BankFormat.
+
+        Parameters:
+        ----------
+        name: str
+              Name of the format (key of BANK_FORMATS).
+        columns: dict
+                 Column of the export of each field in FIELDS. Needs "date"
+                 and either "amount" or "debit" and "credit".
+        date_format: str
+                     strftime format of the dates (e.g. "%d/%m/%Y"). Dates not
+                     in this format fall back to a day-first parse.
+        sign: (optional) int
+              1 if costs are negative in the export, -1 if they are positive.
+              With "debit"/"credit" columns the amount is |credit| - |debit|.
+        optional: (optional) tuple of str
+                  Fields that may be missing from a file ("" merchant and
+                  category, 0 fees, no currency nor account).
+        currency: (optional) str
+                  Currency of every amount of an export without a "currency"
+                  column (e.g. "NZD" for a single-currency account), so the
+                  statements can be converted with monex_fx.
+        sep, decimal, thousands, encoding: (optional)
+                                           Passed on to pandas.read_csv.
+        """
+
+        unknown = set(columns) - set(FIELDS)
+        if unknown:
+            raise ValueError("Unknown fields {} in bank format {}".format(
+                sorted(unknown), name))
+        if "date" not in columns or not ("amount" in columns
+                                         or {"debit", "credit"} <= set(columns)):
+            raise ValueError("Bank format {} needs a date and an amount (or debit "
+                             "and credit) column".format(name))
+        self.name = name
+        self.columns = dict(columns)
+        self.date_format = date_format
+        self.sign = sign
+        self.optional = tuple(optional)
+        self.currency = currency
+        self.sep = sep
+        self.decimal = decimal
+        self.thousands = thousands
+        self.encoding = encoding
+
+    def __repr__(self):
+        return "BankFormat({!r})".format(self.name)
+
+    @property
+    def required(self):
+        """Columns every export of the format has."""
+        return [col for field, col in self.columns.items() if field not in self.optional]
+
+    def matches(self, header):
+        """
+        Returns the number of columns of the format found in a header, or 0 if
+        a required column is missing.
+        """
+
+        header = set(header)
+        if not set(self.required) <= header:
+            return 0
+        return len(set(self.columns.values()) & header)
+
+    def _dtypes(self, numeric=True):
+        # Explicit dtypes of the columns: no type inference by read_csv
+        dtypes = {}
+        for field, col in self.columns.items():
+            if field in ("amount", "fees", "debit", "credit"):
+                dtypes[col] = np.float64 if numeric else object
+            elif field == "date" and any("%" + d in self.date_format for d in "HIMSf"):
+                # Timestamps are nearly all distinct
+                dtypes[col] = object
+            else:
+                # Strings (and dates: a statement has few distinct ones) as
+                # categoricals, so each distinct value is handled once
+                dtypes[col] = "category"
+        return dtypes
+
+    def _read_csv(self, source, skiprows, numeric, **kwargs):
+        # pandas.read_csv of the mapped columns with explicit dtypes
+        wanted = set(self.columns.values())
+        data = io.BytesIO(source) if isinstance(source, bytes) else source
+        return pd.read_csv(data, sep=self.sep, usecols=lambda c: c in wanted,
+                           dtype=self._dtypes(numeric), skiprows=skiprows,
+                           decimal=self.decimal, thousands=self.thousands,
+                           encoding=self.encoding, **kwargs)
+
+    def read_frame(self, source, skiprows=0, **kwargs):
+        """
+        Reads the mapped columns of an export into a pandas.DataFrame.
+
+        Parameters:
+        ----------
+        source: str or bytes
+                Path to the csv file, or its contents.
+        skiprows: (optional) int
+                  Lines before the header (see detect_format).
+        kwargs: keyword arguments of pandas.read_csv (see read_chunks for
+                chunked reads).
+        """
+
+        for numeric in (True, False):
+            try:
+                # Reading with explicit dtypes, and again without parsing the
+                # numbers if a value is not numeric (coerced in from_frame)
+                return self._read_csv(source, skiprows, numeric, **kwargs)
+            except ValueError:
+                if not numeric:
+                    raise
+
+    def read_chunks(self, source, chunksize, skiprows=0):
+        """
+        Reads and parses an export chunksize rows at a time, so files larger
+        than memory can be aggregated.
+
+        Parameters:
+        ----------
+        source: str or bytes
+                Path to the csv file, or its contents.
+        chunksize: int
+                   Number of rows parsed at a time.
+        skiprows: (optional) int
+                  Lines before the header.
+
+        Yields:
+        ------
+        statement: monex_statement.Statement
+                   Rows of each chunk (no source file).
+        """
+
+        Statement.n_parses += 1
+        done = 0
+        for numeric in (True, False):
+            try:
+                with self._read_csv(source, skiprows, numeric,
+                                    chunksize=chunksize) as reader:
+                    for i, df in enumerate(reader):
+                        # After a non-numeric value, starting over without
+                        # number parsing from the first chunk not yielded
+                        if i < done:
+                            continue
+                        statement = self.from_frame(df)
+                        done += 1
+                        yield statement
+                return
+            except ValueError:
+                if not numeric:
+                    raise
+
+    def _dates(self, values):
+        # Parsing each distinct date once, with the exact format (dates in
+        # another format get a day-first parse)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, values = values.cat.codes.to_numpy(), values.cat.categories.to_series()
+        else:
+            codes = None
+        dates = pd.to_datetime(values, format=self.date_format, errors="coerce")
+        dates = dates.to_numpy(dtype="datetime64[D]")
+        failed = np.isnat(dates) & values.notna().to_numpy()
+        if failed.any():
+            dates[failed] = pd.to_datetime(values[failed], dayfirst=True, format="mixed",
+                                           errors="coerce").to_numpy(dtype="datetime64[D]")
+        if codes is not None:
+            # Missing dates (code -1) index the NaT appended at the end
+            dates = np.append(dates, np.datetime64("NaT", "D"))[codes]
+        return dates
+
+    def _numbers(self, field, df):
+        # Float column of a field (0 if missing, NaN for non-numeric values)
+        if field not in self.columns or self.columns[field] not in df:
+            return np.zeros(len(df))
+        values = df[self.columns[field]]
+        if values.dtype != np.float64:
+            values = pd.to_numeric(values, errors="coerce")
+        return values.to_numpy(dtype=np.float64)
+
+    def from_frame(self, df):
+        """
+        Builds a Statement from a DataFrame read with read_frame.
+        """
+
+        with span("parse"):
+            ordinals = to_ordinals(self._dates(df[self.columns["date"]]))
+            if "amount" in self.columns:
+                amount = self._numbers("amount", df) * self.sign
+            else:
+                amount = (np.abs(np.nan_to_num(self._numbers("credit", df)))
+                          - np.abs(np.nan_to_num(self._numbers("debit", df))))
+            fees = np.nan_to_num(self._numbers("fees", df), nan=0.0)
+
+            dictionaries = []
+            for field in ("category", "merchant"):
+                col = self.columns.get(field)
+                if col in df:
+                    dictionaries.append(_dictionary(df[col]))
+                else:
+                    dictionaries.append((np.zeros(len(df), dtype=np.int16),
+                                         intern_dictionary([""])))
+            (category_codes, categories), (merchant_codes, merchants) = dictionaries
+
+            # Currency and account of each transaction, when the export has them
+            optional = {}
+            for field, codes, dictionary in (("currency", "currency_codes", "currencies"),
+                                             ("account", "account_codes", "accounts")):
+                col = self.columns.get(field)
+                if col in df:
+                    optional[codes], optional[dictionary] = _dictionary(df[col])
+                elif field == "currency" and self.currency is not None:
+                    optional[codes] = np.zeros(len(df), dtype=np.int16)
+                    optional[dictionary] = intern_dictionary([self.currency])
+            return Statement(ordinals, amount, fees, category_codes, categories,
+                             merchant_codes, merchants, **optional)
+
+    def read(self, source, skiprows=0, path=None, stamp=None):
+        """
+        Reads and parses an export into a Statement.
+
+        Parameters:
+        ----------
+        source: str or bytes
+                Path to the csv file, or its contents.
+        skiprows: (optional) int
+                  Lines before the header.
+        path, stamp: (optional)
+                     Source file and its file_stamp (see Statement.from_csv).
+        """
+
+        with span("load"):
+            df = self.read_frame(source, skiprows)
+        Statement.n_parses += 1
+        statement = self.from_frame(df)
+        statement.path, statement.stamp = path, stamp
+        return statement
+
+
+def register(bank_format):
+    """Adds (or replaces) a format in BANK_FORMATS and returns it."""
+    BANK_FORMATS[bank_format.name] = bank_format
+    return bank_format
+
+
+def _head(source):
+    # First lines of a file or of its contents
+    if isinstance(source, bytes):
+        text = source[:64 * 1024].decode("utf-8-sig", errors="replace")
+        return text.splitlines()[:HEADER_LINES]
+    with open(source, encoding="utf-8-sig", errors="replace") as f:
+        return [line for line, _ in zip(f, range(HEADER_LINES))]
+
+
+def _find_header(source, formats):
+    # (format, skiprows) of the best matching header line among formats
+    best, best_score = None, 0
+    for skiprows, line in enumerate(_head(source)):
+        for fmt in formats:
+            header = [c.strip() for c in next(csv.reader([line], delimiter=fmt.sep), [])]
+            score = fmt.matches(header)
+            if score > best_score:
+                best, best_score = (fmt, skiprows), score
+        if best is not None:
+            return best
+    raise ValueError("Unknown bank statement format (no {} matches the header "
+                     "of {})".format(
+                         "registered format" if len(formats) > 1 else formats[0],
+                         "the data" if isinstance(source, bytes) else source))
+
+
+def detect_format(source):
+    """
+    Detects the format of an export from its header: the registered format
+    with the most columns in the header, among those whose required columns
+    are all there.
+
+    Parameters:
+    ----------
+    source: str or bytes
+            Path to the csv file, or its contents.
+
+    Returns:
+    -------
+    bank_format: BankFormat
+    skiprows: int
+              Number of lines before the header.
+    """
+
+    return _find_header(source, list(BANK_FORMATS.values()))
+
+
+def find_format(source, bank=None):
+    """
+    Returns the (BankFormat, skiprows) of an export: the given bank (a name
+    of BANK_FORMATS or a BankFormat), or the format detected from its header
+    (see detect_format).
+    """
+
+    if bank is None:
+        return detect_format(source)
+    fmt = BANK_FORMATS[bank] if isinstance(bank, str) else bank
+    return fmt, _find_header(source, [fmt])[1]
+
+
+def read_statement(source, bank=None, path=None, stamp=None):
+    """
+    Reads a bank export of any registered format into a Statement.
+
+    Parameters:
+    ----------
+    source: str or bytes
+            Path to the csv file, or its contents.
+    bank: (optional) str or BankFormat
+          Format of the export. Detected from the header by default.
+    path, stamp: (optional)
+                 Source file and its file_stamp, if source is bytes.
+
+    Returns:
+    -------
+    statement: monex_statement.Statement
+    """
+
+    if isinstance(source, str) and path is None:
+        # Taking the stamp before reading so a concurrent write invalidates it
+        path, stamp = source, file_stamp(source)
+    fmt, skiprows = find_format(source, bank)
+    return fmt.read(source, skiprows, path=path, stamp=stamp)
+
+
+def read_statement_chunks(source, chunksize, bank=None):
+    """
+    Reads a bank export of any registered format chunksize rows at a time
+    (see BankFormat.read_chunks).
+
+    Parameters:
+    ----------
+    source: str or bytes
+            Path to the csv file, or its contents.
+    chunksize: int
+               Number of rows parsed at a time.
+    bank: (optional) str or BankFormat
+          Format of the export. Detected from the header by default.
+
+    Yields:
+    ------
+    statement: monex_statement.Statement
+    """
+
+    fmt, skiprows = find_format(source, bank)
+    yield from fmt.read_chunks(source, chunksize, skiprows)
+
+
+# Transferwise (the format of the README), with optional Category and Currency
+# (of the balance) columns
+TRANSFERWISE = register(BankFormat(
+    "transferwise",
+    {"date": "Date", "amount": "Amount", "merchant": "Merchant",
+     "fees": "Total fees", "category": "Category", "currency": "Currency"},
+    date_format="%d/%m/%Y", optional=("category", "currency")))
+
+# ANZ (New Zealand) account export, in NZD
+ANZ = register(BankFormat(
+    "anz",
+    {"date": "Date", "amount": "Amount", "merchant": "Details"},
+    date_format="%d/%m/%Y", currency="NZD"))
+
+# Revolut account statement (Product is the account, e.g. Current or Savings)
+REVOLUT = register(BankFormat(
+    "revolut",
+    {"date": "Completed Date", "amount": "Amount", "merchant": "Description",
+     "fees": "Fee", "currency": "Currency", "account": "Product"},
+    date_format="%Y-%m-%d %H:%M:%S", optional=("currency", "account")))
+
+# Chase credit card export, in USD
+CHASE = register(BankFormat(
+    "chase",
+    {"date": "Transaction Date", "amount": "Amount", "merchant": "Description",
+     "category": "Category"},
+    date_format="%m/%d/%Y", currency="USD"))
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Batch generation of the monthly reports (pie chart, histogram, cost plot and
+fee plot) for a whole folder of statements. Each month is rendered headless
+(Agg backend) in a pool of worker processes, and months whose data has not
+changed are served from the render cache (see monex_render). The year of each
+month (e.g. for leap Februaries) is read from its statement unless given:
+    python monex_batch.py FOLDER [--outdir OUTDIR] [--workers N] [--render-dir DIR] [--year YEAR]
+"""
+
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from monex_utils import month_number
+
+
+def _init_worker():
+    # Selecting the non-interactive backend before pyplot is imported
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+# Renderer of the worker process, so figures are reused across its months
+_renderer = None
+
+
+def statement_year(statement, month):
+    """
+    Returns the year of the transactions of a statement in the month name
+    (the most frequent one), or None if it has none.
+    """
+
+    dates = statement.dates[~np.isnat(statement.dates)]
+    dates = dates[dates.astype("datetime64[M]").astype(int) % 12 + 1
+                  == month_number(month)]
+    if not len(dates):
+        return None
+    years, counts = np.unique(dates.astype("datetime64[Y]"), return_counts=True)
+    return int(years[np.argmax(counts)].astype(int)) + 1970
+
+
+def render_month(path, outdir, render_dir=None, year=None):
+    """
+    Renders and saves the four reports of one monthly statement.
+
+    Parameters:
+    ----------
+    path: str
+          Path to the csv statement, named after its month (e.g. March.csv).
+    outdir: str
+            Folder where the figures are saved.
+    render_dir: (optional) str
+                Cache folder of rendered images (see monex_render). Months
+                whose data has not changed are copied from it.
+    year: (optional) int
+          Year of the statement. Read from its dates by default (see
+          statement_year).
+
+    Returns:
+    -------
+    month: str
+           Month of the statement.
+    elapsed: float
+             Wall time in seconds spent loading and rendering the month.
+    """
+
+    global _renderer
+    _init_worker()
+    from monex_analytics import MonthlyExpenses_Analytics
+    from monex_render import Renderer, RenderCache
+
+    start = time.perf_counter()
+    cache = RenderCache(render_dir)
+    if _renderer is None or _renderer.cache.cache_dir != cache.cache_dir:
+        _renderer = Renderer(cache)
+    month = os.path.splitext(os.path.basename(path))[0]
+    analytics = MonthlyExpenses_Analytics(month, folder=os.path.dirname(path),
+                                          outdir=outdir, renderer=_renderer)
+    if year is None:
+        # The statement is parsed once and shared by the plots
+        year = statement_year(analytics.statement(), month)
+    analytics.year = year
+    for plot in (analytics.pie_chart, analytics.histogram, analytics.cost_plot,
+                 analytics.fee_plot):
+        plot(savefig=True)
+    return month, time.perf_counter() - start
+
+
+def monthly_statements(folder):
+    """
+    Returns the csv statements in a folder whose file name is a month name.
+    """
+
+    paths = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.csv"))):
+        try:
+            month_number(os.path.splitext(os.path.basename(path))[0])
+        except KeyError:
+            continue
+        paths.append(path)
+    return paths
+
+
+def batch_reports(folder, outdir=".", workers=None, render_dir=None, year=None):
+    """
+    Renders the reports of every monthly statement in a folder, spreading the
+    months over a pool of worker processes.
+
+    Parameters:
+    ----------
+    folder: str
+            Folder containing the monthly csv statements.
+    outdir: (optional) str
+            Folder where the figures are saved (created if needed).
+    workers: (optional) int
+             Number of worker processes. Defaults to the number of CPUs.
+    render_dir: (optional) str
+                Cache folder of rendered images (see render_month).
+    year: (optional) int
+          Year of every statement. Read from each statement by default.
+
+    Returns:
+    -------
+    timings: dict
+             Wall time in seconds of each month, in calendar order.
+    """
+
+    os.makedirs(outdir, exist_ok=True)
+    paths = monthly_statements(folder)
+    timings = {}
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker) as pool:
+        futures = [pool.submit(render_month, path, outdir, render_dir, year)
+                   for path in paths]
+        for future in as_completed(futures):
+            month, elapsed = future.result()
+            timings[month] = elapsed
+    return {month: timings[month]
+            for month in sorted(timings, key=month_number)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render the reports of every monthly statement in a folder.")
+    parser.add_argument("folder")
+    parser.add_argument("--outdir", default=".")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--render-dir", default=None,
+                        help="cache folder of rendered images")
+    parser.add_argument("--year", type=int, default=None,
+                        help="year of the statements (read from them by default)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    timings = batch_reports(args.folder, args.outdir, args.workers,
+                            args.render_dir, args.year)
+    total = time.perf_counter() - start
+
+    for month, elapsed in timings.items():
+        print("{:>10}: {:.2f} s".format(month, elapsed))
+    print("Rendered {} months in {:.2f} s (sum of months {:.2f} s)".format(
+        len(timings), total, sum(timings.values())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent on-disk cache of parsed bank statements. Each entry stores the typed
+columns of a monex_statement.Statement in an uncompressed .npz file, keyed by
+the path, size, modification time and content hash of the source csv, so later
+runs load the binary columns instead of parsing the csv again.
+
+The cache directory defaults to $MONEX_CACHE_DIR (or ~/.cache/monex) and can be
+cleared from the command line:
+    python monex_cache.py clear [--cache-dir DIR]
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import numpy as np
+from monex_instrument import span
+from monex_statement import Statement, file_stamp
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "MONEX_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "monex"))
+DEFAULT_MAX_BYTES = 512 * 1024**2
+
+# Bumped whenever the layout of the cached columns changes
+CACHE_VERSION = 3
+
+
+def content_hash(path, block_size=1024**2):
+    """
+    Returns the hex SHA-1 digest of the contents of a file, read in blocks.
+    """
+
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _remove(path):
+    # Deletes a cache entry, False if another loader already deleted it
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+class StatementCache:
+    """
+    Cache of parsed statements with least-recently-used eviction once the
+    total size of the entries exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Constructor of StatementCache.
+
+        Parameters:
+        ----------
+        cache_dir: (optional) str
+                   Directory holding the cache entries. Defaults to
+                   DEFAULT_CACHE_DIR.
+        max_bytes: (optional) int
+                   Maximum total size of the entries before the least recently
+                   used ones are evicted.
+        """
+
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+
+    def key(self, path):
+        """
+        Returns the cache key of a csv statement: a digest of its absolute
+        path, size, modification time and content hash.
+        """
+
+        mtime_ns, size = file_stamp(path)
+        ident = "{}|{}|{}|{}|{}".format(CACHE_VERSION, os.path.abspath(path),
+                                        size, mtime_ns, content_hash(path))
+        return hashlib.sha1(ident.encode()).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def get(self, path):
+        """
+        Returns the parsed statement of a csv file, loading it from the cache
+        when possible and parsing (and caching) it otherwise.
+
+        Parameters:
+        ----------
+        path: str
+              Path to the csv bank statement.
+
+        Returns:
+        -------
+        statement: monex_statement.Statement
+        """
+
+        with span("cache.get"):
+            key = self.key(path)
+            statement = self.load(key, path)
+        if statement is None:
+            statement = Statement.from_csv(path)
+            self.store(key, statement)
+        return statement
+
+    def load(self, key, path):
+        """
+        Loads a cache entry, returning None if it does not exist (or can not be
+        read). A successful load marks the entry as recently used.
+        """
+
+        entry = self._entry(key)
+        try:
+            with np.load(entry, allow_pickle=False) as npz:
+                cols = {name: npz[name] for name in npz.files}
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            # Evicted by another loader since it was read
+            pass
+
+        return Statement.from_arrays(cols, path=path)
+
+    def store(self, key, statement):
+        """
+        Writes the columns of a statement into the cache and evicts the least
+        recently used entries if the cache grew beyond max_bytes.
+        """
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cols = statement.to_arrays()
+
+        # Writing to a temporary file first so readers never see partial entries
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **cols)
+        os.replace(tmp, self._entry(key))
+        self.evict()
+
+    def entries(self):
+        """
+        Returns a list of (last use, size, path) of the cache entries, least
+        recently used first. Entries deleted meanwhile (e.g. evicted by a
+        concurrent loader, see monex_loader) are skipped.
+        """
+
+        if not os.path.isdir(self.cache_dir):
+            return []
+        out = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                entry = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(entry)
+                except FileNotFoundError:
+                    continue
+                out.append((st.st_mtime_ns, st.st_size, entry))
+        return sorted(out)
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            _remove(entry)
+            total -= size
+
+    def clear(self):
+        """Deletes every entry of the cache. Returns the number of bytes freed."""
+        freed = 0
+        for _, size, entry in self.entries():
+            freed += size if _remove(entry) else 0
+        return freed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Manage the monex parsed-statement cache.")
+    parser.add_argument("command", choices=["clear", "info"])
+    parser.add_argument("--cache-dir", default=None,
+                        help="cache directory (default: {})".format(
+                            DEFAULT_CACHE_DIR))
+    args = parser.parse_args(argv)
+
+    cache = StatementCache(args.cache_dir)
+    if args.command == "clear":
+        freed = cache.clear()
+        print("Cleared {:.1f} MB from {}".format(freed / 1024**2,
+                                                 cache.cache_dir))
+    else:
+        entries = cache.entries()
+        total = sum(size for _, size, _ in entries)
+        print("{} entries, {:.1f} MB in {}".format(len(entries),
+                                                   total / 1024**2,
+                                                   cache.cache_dir))
+
+
+if __name__ == "__main__":
+    main()
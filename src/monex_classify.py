@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Offline classification of transactions into categories from their "Merchant"
+string, so statements do not have to be labelled by hand. A merchant is looked
+up, in order, in:
+    (1) an exact table of the merchants seen in labelled statements
+    (2) a table of normalized merchant names (lower case, no digits or
+        punctuation, e.g. "COUNTDOWN #123 WLG" -> "countdown wlg")
+    (3) a table of normalized name prefixes (first word that is not a
+        stopword and has at least MIN_PREFIX_LENGTH letters, e.g. "countdown";
+        "The Coffee Co" -> "coffee")
+    (4) a multinomial naive Bayes model over the word uni/bigrams and character
+        trigrams of the normalized name
+and is left unlabelled ("") if none of them knows about it. Each distinct
+merchant is classified once (statements keep merchants as a dictionary and
+results are memoized), so labelling is independent of the number of rows.
+
+The lookup tables and the model are saved into a .npz index:
+    python monex_classify.py train LABELLED_CSV [LABELLED_CSV ...] [--index INDEX]
+    python monex_classify.py label CSV -o OUT_CSV [--index INDEX]
+Labelling writes a copy of the statement with its category column filled in
+(see label_csv), every other column left as exported. The index defaults to merchants.npz in the monex cache directory.
+"""
+
+import argparse
+import os
+import re
+import tempfile
+import numpy as np
+import pandas as pd
+from monex_banks import find_format
+from monex_cache import DEFAULT_CACHE_DIR
+from monex_statement import Statement, code_dtype, intern_dictionary
+
+DEFAULT_INDEX = os.path.join(DEFAULT_CACHE_DIR, "merchants.npz")
+
+# Laplace smoothing of the naive Bayes token counts
+ALPHA = 1.0
+
+_NOT_LETTERS = re.compile(r"[^a-z]+")
+
+# Words that do not identify a merchant on their own, and the shortest word
+# used as a prefix
+STOPWORDS = frozenset(["the", "and", "of", "at", "my", "your", "los", "las",
+                       "les", "der", "die", "das"])
+MIN_PREFIX_LENGTH = 3
+
+
+def normalize_merchant(name):
+    """
+    Normalizes a merchant string: lower case, with digits and punctuation
+    dropped and whitespace collapsed.
+
+    Parameters:
+    ----------
+    name: str
+          Merchant string as found in the statement.
+
+    Returns:
+    -------
+    normalized: str
+                Normalized merchant name ("" if nothing is left).
+    """
+
+    return " ".join(_NOT_LETTERS.sub(" ", str(name).lower()).split())
+
+
+def merchant_prefix(normalized):
+    """
+    Returns the prefix of a normalized merchant name: its first word that is
+    not in STOPWORDS and has at least MIN_PREFIX_LENGTH letters ("" if none).
+    """
+
+    for word in normalized.split():
+        if len(word) >= MIN_PREFIX_LENGTH and word not in STOPWORDS:
+            return word
+    return ""
+
+
+def merchant_tokens(normalized):
+    """
+    Returns the tokens of a normalized merchant name used by the naive Bayes
+    model: words, word bigrams and character trigrams of each word.
+    """
+
+    words = normalized.split()
+    tokens = ["w:" + w for w in words]
+    tokens += ["b:" + a + " " + b for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = "^" + w + "$"
+        tokens += ["c:" + padded[i:i + 3] for i in range(len(padded) - 2)]
+    return tokens
+
+
+def _majority(keys, labels, weights):
+    # Most frequent (weighted) label of each key, as a dict
+    df = pd.DataFrame({"key": keys, "label": labels, "weight": weights})
+    totals = df.groupby(["key", "label"], sort=False)["weight"].sum()
+    best = totals.groupby(level=0, sort=False).idxmax()
+    return {key: label for key, label in best.tolist()}
+
+
+class MerchantClassifier:
+    """
+    Merchant-to-category classifier trained on labelled statements: exact,
+    normalized and prefix lookup tables backed by a naive Bayes model (see
+    module docstring). Call fit (or load an index) before classify.
+    """
+
+    def __init__(self):
+        """
+        Constructor of MerchantClassifier (untrained: labels nothing).
+        """
+
+        self.exact = {}
+        self.normalized = {}
+        self.prefix = {}
+        self.categories = np.array([], dtype=object)
+        self.vocabulary = {}
+        self.log_prior = np.zeros(0)
+        self.log_likelihood = np.zeros((0, 0))
+        self._memo = {}
+
+    def fit(self, statements):
+        """
+        Trains the lookup tables and the model on labelled statements. Rows
+        with no merchant or no category are ignored.
+
+        Parameters:
+        ----------
+        statements: list of monex_statement.Statement
+                    Labelled statements (e.g. previous months).
+
+        Returns:
+        -------
+        self: MerchantClassifier
+        """
+
+        # Distinct (merchant, category) pairs and their number of transactions
+        st = Statement.concat(list(statements))
+        keep = (st.merchant != "") & (st.category != "")
+        pairs = pd.DataFrame({"merchant": st.merchant[keep],
+                              "category": st.category[keep]})
+        pairs = pairs.value_counts(sort=False).reset_index(name="count")
+        merchants = pairs["merchant"].to_numpy(dtype=object)
+        labels = pairs["category"].to_numpy(dtype=object)
+        counts = pairs["count"].to_numpy()
+
+        normalized = np.array([normalize_merchant(m) for m in merchants],
+                              dtype=object)
+        prefixes = np.array([merchant_prefix(n) for n in normalized], dtype=object)
+        named = (normalized != "")
+        has_prefix = (prefixes != "")
+
+        # Lookup tables (weighted by transactions) ...
+        self.exact = _majority(merchants, labels, counts)
+        self.normalized = _majority(normalized[named], labels[named], counts[named])
+        # ... and prefixes, where each distinct merchant gets a single vote
+        self.prefix = _majority(prefixes[has_prefix], labels[has_prefix],
+                                np.ones(has_prefix.sum()))
+
+        # Naive Bayes token counts (one document per distinct merchant)
+        cat_codes, self.categories = pd.factorize(labels[named])
+        self.categories = np.asarray(self.categories, dtype=object)
+        self.vocabulary, doc, tok = {}, [], []
+        for i, name in enumerate(normalized[named]):
+            for t in merchant_tokens(name):
+                tok.append(self.vocabulary.setdefault(t, len(self.vocabulary)))
+                doc.append(cat_codes[i])
+        n_cat, n_tok = len(self.categories), len(self.vocabulary)
+        tok_counts = np.bincount(np.asarray(doc, dtype=np.int64) * n_tok
+                                 + np.asarray(tok, dtype=np.int64),
+                                 minlength=n_cat * n_tok).reshape(n_cat, n_tok)
+        n_docs = np.bincount(cat_codes, minlength=n_cat)
+        self.log_prior = np.log(n_docs / max(n_docs.sum(), 1))
+        smoothed = tok_counts + ALPHA
+        self.log_likelihood = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+
+        self._memo = {}
+        return self
+
+    def predict_one(self, merchant):
+        """
+        Returns the category of a single merchant string ("" if unknown).
+        """
+
+        if merchant in self._memo:
+            return self._memo[merchant]
+
+        normalized = normalize_merchant(merchant)
+        label = (self.exact.get(merchant) or self.normalized.get(normalized)
+                 or self.prefix.get(merchant_prefix(normalized)))
+        if label is None:
+            idx = [self.vocabulary[t] for t in merchant_tokens(normalized)
+                   if t in self.vocabulary]
+            if idx:
+                scores = self.log_prior + self.log_likelihood[:, idx].sum(axis=1)
+                label = self.categories[np.argmax(scores)]
+            else:
+                label = ""
+
+        self._memo[merchant] = label
+        return label
+
+    def predict(self, merchants):
+        """
+        Classifies an array of merchant strings. Each distinct merchant is only
+        classified once.
+
+        Parameters:
+        ----------
+        merchants: (1-d) array-like
+                   Merchant strings.
+
+        Returns:
+        -------
+        labels: (1-d) array-like
+                Category of each merchant ("" when unknown).
+        """
+
+        codes, uniques = pd.factorize(np.asarray(merchants, dtype=object))
+        labels = np.array([self.predict_one(m) for m in uniques], dtype=object)
+        return labels[codes]
+
+    def classify(self, statement, overwrite=False):
+        """
+        Labels the transactions of a statement from their merchant.
+
+        Parameters:
+        ----------
+        statement: monex_statement.Statement
+                   Statement to be labelled.
+        overwrite: (optional) boolean
+                   If False (default), only the unlabelled transactions
+                   (category "") are classified and hand labels are kept.
+
+        Returns:
+        -------
+        statement: monex_statement.Statement
+                   Labelled statement (same rows, path and stamp).
+        """
+
+        # One prediction per entry of the merchant dictionary
+        predicted = np.array([self.predict_one(m) for m in statement.merchants],
+                             dtype=object)
+
+        # Row codes into [statement categories, predicted categories]
+        n_cat = len(statement.categories)
+        codes = statement.category_codes.astype(np.int64)
+        replace = (np.ones(len(codes), dtype=bool) if overwrite
+                   else codes == statement.category_code(""))
+        codes[replace] = n_cat + statement.merchant_codes[replace]
+        merged_codes, merged = pd.factorize(np.concatenate([statement.categories,
+                                                            predicted]))
+
+        # Compacting the dictionary to the categories in use
+        row_codes, used = pd.factorize(merged_codes[codes])
+        categories = intern_dictionary(np.asarray(merged, dtype=object)[used])
+        return statement.replace(
+            category_codes=row_codes.astype(code_dtype(len(categories))),
+            categories=categories)
+
+    def save(self, path):
+        """
+        Saves the lookup tables and the model into a .npz index (written
+        atomically, so a concurrent reader never sees a partial index).
+        """
+
+        arrays = {}
+        for name in ("exact", "normalized", "prefix"):
+            table = getattr(self, name)
+            arrays[name + "_keys"] = np.asarray(list(table), dtype=str)
+            arrays[name + "_labels"] = np.asarray(list(table.values()), dtype=str)
+        arrays["categories"] = np.asarray(self.categories, dtype=str)
+        arrays["vocabulary"] = np.asarray(list(self.vocabulary), dtype=str)
+        arrays["log_prior"] = self.log_prior
+        arrays["log_likelihood"] = self.log_likelihood
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a classifier saved with save.
+        """
+
+        clf = cls()
+        with np.load(path, allow_pickle=False) as npz:
+            for name in ("exact", "normalized", "prefix"):
+                setattr(clf, name, dict(zip(npz[name + "_keys"].tolist(),
+                                            npz[name + "_labels"].tolist())))
+            clf.categories = npz["categories"].astype(object)
+            clf.vocabulary = {t: i for i, t in enumerate(npz["vocabulary"].tolist())}
+            clf.log_prior = npz["log_prior"]
+            clf.log_likelihood = npz["log_likelihood"]
+        return clf
+
+
+def label_csv(classifier, path, output, overwrite=False, bank=None):
+    """
+    Writes a copy of a csv statement with its category column filled in by a
+    classifier. The other columns (and any lines before the header) are
+    written back as read, in the format of the bank export; statements
+    without a category column get a "Category" column.
+
+    Parameters:
+    ----------
+    classifier: MerchantClassifier
+    path: str
+          Path to the csv bank statement.
+    output: str
+            Path to the labelled csv, which must not be the input file.
+    overwrite: (optional) boolean
+               Also relabel the rows that already have a category.
+    bank: (optional) str or monex_banks.BankFormat
+          Format of the statement. Detected from its header by default.
+
+    Returns:
+    -------
+    statement: monex_statement.Statement
+               Labelled statement.
+    """
+
+    if os.path.exists(output) and os.path.samefile(path, output):
+        raise ValueError("label_csv would overwrite its input {}; write the "
+                         "labelled statement to another file".format(path))
+    fmt, skiprows = find_format(path, bank)
+    st = classifier.classify(Statement.from_csv(path, bank=fmt), overwrite=overwrite)
+
+    # Every column as text, so the values are written back unchanged
+    with open(path, encoding=fmt.encoding) as f:
+        preamble = [f.readline() for _ in range(skiprows)]
+    df = pd.read_csv(path, sep=fmt.sep, skiprows=skiprows, dtype=str,
+                     keep_default_na=False, encoding=fmt.encoding)
+    if len(df) != len(st):
+        raise ValueError("{} has {} rows but {} transactions were parsed".format(
+            path, len(df), len(st)))
+    df[fmt.columns.get("category", "Category")] = st.category
+
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        f.writelines(preamble)
+        df.to_csv(f, sep=fmt.sep, index=False)
+    return st
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Train or apply the monex merchant-to-category classifier.")
+    parser.add_argument("--index", default=DEFAULT_INDEX,
+                        help="classifier index (default: {})".format(DEFAULT_INDEX))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="train an index on labelled statements")
+    train.add_argument("csv", nargs="+", help="labelled csv bank statements")
+
+    label = sub.add_parser("label", help="fill in the Category of a statement")
+    label.add_argument("csv")
+    label.add_argument("-o", "--output", required=True,
+                       help="labelled csv (a new file, the input is kept)")
+    label.add_argument("--overwrite", action="store_true",
+                       help="also relabel the rows that already have a category")
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        clf = MerchantClassifier().fit([Statement.from_csv(p) for p in args.csv])
+        clf.save(args.index)
+        print("Trained on {} merchants ({} categories) -> {}".format(
+            len(clf.exact), len(clf.categories), args.index))
+    else:
+        clf = MerchantClassifier.load(args.index)
+        st = label_csv(clf, args.csv, args.output, overwrite=args.overwrite)
+        print("{} of {} transactions labelled".format(
+            int((st.category != "").sum()), len(st)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Conversion of multi-currency (and multi-account) statements into a single
+reporting currency, against a local table of daily FX rates. Each amount is
+converted at the rate of its currency on its date (or the last earlier date
+with a rate), looked up with np.searchsorted in one vectorized pass. The
+currency and account of each transaction come from the statement (read from
+the export by its monex_banks adapter):
+    rates = FXRates.from_csv("rates.csv")
+    consolidated = rates.convert_statement(Statement.from_csv("revolut.csv"))
+    per_account = split_accounts(consolidated)
+"""
+
+import numpy as np
+import pandas as pd
+from monex_statement import intern_dictionary
+
+REPORTING_CURRENCY = "NZD"
+
+
+class FXRates:
+    """
+    Daily FX rates: rates[i, j] is the value in self.currency of one unit of
+    currencies[j] on dates[i] (dates sorted, not necessarily consecutive).
+    """
+
+    def __init__(self, dates, currencies, rates, currency=REPORTING_CURRENCY):
+        """
+        Constructor of FXRates.
+
+        Parameters:
+        ----------
+        dates: (1-d) array-like
+               Dates of the rates (convertible to datetime64[D]).
+        currencies: (1-d) array-like
+                    Currency codes of the columns of rates.
+        rates: (N-d) array-like
+               Shape (n_dates x n_currencies). NaN where there is no rate, which
+               is filled with the last earlier rate of that currency.
+        currency: (optional) str
+                  Reporting currency the rates convert into.
+        """
+
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        order = np.argsort(dates, kind="stable")
+        self.dates = dates[order]
+        self.currencies = [str(c) for c in currencies]
+        rates = np.asarray(rates, dtype=float)[order]
+
+        # Forward-filling each currency: row of its last rate on or before
+        # each date (leading NaNs stay NaN)
+        rows = np.where(np.isnan(rates), 0, np.arange(len(rates))[:, None])
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        self.rates = rates[rows, np.arange(rates.shape[1])]
+        self.currency = currency
+
+    @classmethod
+    def from_csv(cls, path, currency=REPORTING_CURRENCY):
+        """
+        Reads a rate table with a "Date" column (day first, like the
+        statements) and one column of rates per currency.
+        """
+
+        df = pd.read_csv(path)
+        dates = pd.to_datetime(df.pop("Date"), dayfirst=True).to_numpy(
+            dtype="datetime64[D]")
+        return cls(dates, df.columns, df.to_numpy(dtype=float), currency)
+
+    def rate(self, currency, dates, currencies=None):
+        """
+        Returns the rate of each (currency, date) pair: the rate of the last
+        date of the table on or before the date, 1 for the reporting currency
+        and NaN for an unknown currency or a date before the table.
+
+        Parameters:
+        ----------
+        currency: (1-d) array-like
+                  Currency code of each amount.
+        dates: (1-d) array-like
+               Date of each amount (convertible to datetime64[D]).
+        currencies: (optional) (1-d) array-like
+                    If given, currency holds integer codes into currencies
+                    and the strings are not factorized again.
+
+        Returns:
+        -------
+        rates: (1-d) array-like
+        """
+
+        # Column of each currency, mapping each distinct code only once
+        if currencies is None:
+            codes, currencies = pd.factorize(np.asarray(currency, dtype=object),
+                                             use_na_sentinel=False)
+        else:
+            codes = np.asarray(currency)
+        column = {c: j for j, c in enumerate(self.currencies)}
+        cols = np.array([column.get(c, -1) for c in currencies], dtype=np.int64)[codes]
+        is_base = np.array([c == self.currency for c in currencies], dtype=bool)[codes]
+
+        # As-of lookup of the row of each date, through a dense day -> row
+        # index of the table span (searchsorted once per day, not per amount)
+        days = np.asarray(dates, dtype="datetime64[D]").view(np.int64)
+        rows = np.full(len(days), -1, dtype=np.int64)
+        if len(self.dates):
+            first = self.dates[0].astype(np.int64)
+            span = np.arange(self.dates[0], self.dates[-1] + 1)
+            row_of_day = np.searchsorted(self.dates, span, side="right") - 1
+            offset = np.minimum(days - first, len(span) - 1)
+            after = (offset >= 0)
+            rows[after] = row_of_day[offset[after]]
+
+        known = (rows >= 0) & (cols >= 0)
+        rates = np.full(len(rows), np.nan)
+        rates[known] = self.rates[rows[known], cols[known]]
+        rates[is_base] = 1.0
+        return rates
+
+    def convert(self, amount, currency, dates, currencies=None):
+        """
+        Converts amounts into the reporting currency (see rate).
+        """
+
+        return np.asarray(amount, dtype=float) * self.rate(currency, dates, currencies)
+
+    def convert_statement(self, statement, currency=None):
+        """
+        Returns a statement with its amounts and fees converted into the
+        reporting currency (its accounts are kept).
+
+        Parameters:
+        ----------
+        statement: monex_statement.Statement
+        currency: (optional) (1-d) array-like
+                  Currency code of each transaction. Defaults to the
+                  currencies of the statement (see monex_banks).
+        """
+
+        if currency is not None:
+            rates = self.rate(currency, statement.dates)
+        elif statement.currencies is not None:
+            rates = self.rate(statement.currency_codes, statement.dates,
+                              statement.currencies)
+        else:
+            raise ValueError("The statement has no currencies (its bank format has "
+                             "no currency column); pass the currency of each "
+                             "transaction")
+        return statement.replace(
+            amount=statement.amount * rates, fees=statement.fees * rates,
+            currency_codes=np.zeros(len(statement), dtype=np.int16),
+            currencies=intern_dictionary([self.currency]))
+
+
+def split_accounts(statement, account=None):
+    """
+    Splits a statement into one statement per account, so every aggregation
+    can be computed per account as well as consolidated.
+
+    Parameters:
+    ----------
+    statement: monex_statement.Statement
+    account: (optional) (1-d) array-like
+             Account of each transaction. Defaults to the accounts of the
+             statement, or to its currencies (the currency balances of a
+             Transferwise export) if it has no accounts.
+
+    Returns:
+    -------
+    statements: dict
+                Statement of each account, in order of first appearance.
+    """
+
+    if account is not None:
+        codes, accounts = pd.factorize(np.asarray(account, dtype=object),
+                                       use_na_sentinel=False)
+    else:
+        for codes, dictionary in ((statement.account_codes, statement.accounts),
+                                  (statement.currency_codes, statement.currencies)):
+            if dictionary is not None:
+                break
+        else:
+            raise ValueError("The statement has neither accounts nor currencies; "
+                             "pass the account of each transaction")
+        # Renumbering the codes in use (no string comparisons)
+        codes, used = pd.factorize(np.asarray(codes))
+        accounts = dictionary[used]
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(accounts) + 1))
+    return {acc: statement.take(order[bounds[i]:bounds[i + 1]])
+            for i, acc in enumerate(accounts)}
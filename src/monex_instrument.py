@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight instrumentation of the pipeline stages. Code is wrapped in named
+spans:
+    with span("load"):
+        ...
+and, when instrumentation is enabled, each span records its number of calls,
+wall time (nanosecond timer) and the memory high-water mark. Optionally every
+top-level span is also captured with cProfile and/or tracemalloc and written to
+disk. When disabled (the default) a span is a shared no-op context manager.
+
+Instrumentation can be switched on from the environment:
+    MONEX_INSTRUMENT=1          record spans
+    MONEX_TRACE_MEMORY=1        per-span traced memory peaks (tracemalloc)
+    MONEX_PROFILE_DIR=DIR       write cProfile (and tracemalloc) captures to DIR
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def _max_rss():
+    # Process memory high-water mark in bytes (ru_maxrss is in kB on Linux)
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Instrumentation:
+    """
+    Collector of span timings. Use the module-level span() and INSTRUMENTATION
+    rather than creating instances, unless a separate collector is needed.
+    """
+
+    def __init__(self, enabled=False, trace_memory=False, profile_dir=None):
+        """
+        Constructor of Instrumentation.
+
+        Parameters:
+        ----------
+        enabled: (optional) boolean
+                 Whether spans are recorded at all.
+        trace_memory: (optional) boolean
+                      Records the peak traced memory (tracemalloc) of each span.
+        profile_dir: (optional) str
+                     If given, each top-level span is run under cProfile and the
+                     profile (plus a tracemalloc snapshot if trace_memory) is
+                     written to this folder.
+        """
+
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.stats = {}
+        self._stack = []
+
+    def span(self, name):
+        """Returns a context manager timing the enclosed block as `name`."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name)
+
+    @contextlib.contextmanager
+    def _span(self, name):
+        tracing = self.trace_memory
+        if tracing:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # The peak is reset for this span, so carry it over to the parents
+            peak = tracemalloc.get_traced_memory()[1]
+            for frame in self._stack:
+                frame[0] = max(frame[0], peak)
+            tracemalloc.reset_peak()
+        frame = [0]
+        self._stack.append(frame)
+
+        profiler = None
+        if self.profile_dir is not None and len(self._stack) == 1:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            if profiler is not None:
+                profiler.disable()
+            self._stack.pop()
+
+            stat = self.stats.setdefault(name, {
+                "calls": 0, "total_ns": 0, "max_ns": 0, "max_rss_bytes": 0})
+            stat["calls"] += 1
+            stat["total_ns"] += elapsed
+            stat["max_ns"] = max(stat["max_ns"], elapsed)
+            stat["max_rss_bytes"] = _max_rss()
+            if tracing:
+                peak = max(frame[0], tracemalloc.get_traced_memory()[1])
+                for parent in self._stack:
+                    parent[0] = max(parent[0], peak)
+                stat["peak_traced_bytes"] = max(
+                    stat.get("peak_traced_bytes", 0), peak)
+            if profiler is not None:
+                self._dump(name, stat["calls"], profiler)
+
+    def _dump(self, name, call, profiler):
+        # Writing the captures of a top-level span to profile_dir
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base = os.path.join(self.profile_dir, "{}-{}".format(name, call))
+        profiler.dump_stats(base + ".prof")
+        if self.trace_memory:
+            tracemalloc.take_snapshot().dump(base + ".tracemalloc")
+
+    def to_dict(self):
+        """
+        Returns the collected timings:
+            name -> {"calls", "total_ns", "max_ns", "max_rss_bytes"
+                     [, "peak_traced_bytes"]}
+        """
+        return {name: dict(stat) for name, stat in self.stats.items()}
+
+    def to_json(self, path=None):
+        """Returns the collected timings as JSON, also written to path if given."""
+        text = json.dumps(self.to_dict(), indent=1)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+    def reset(self):
+        """Discards the collected timings."""
+        self.stats = {}
+
+
+INSTRUMENTATION = Instrumentation(
+    enabled=os.environ.get("MONEX_INSTRUMENT", "") not in ("", "0"),
+    trace_memory=os.environ.get("MONEX_TRACE_MEMORY", "") not in ("", "0"),
+    profile_dir=os.environ.get("MONEX_PROFILE_DIR") or None)
+
+
+def span(name):
+    """
+    Context manager timing the enclosed block as `name` in INSTRUMENTATION
+    (a no-op when instrumentation is disabled).
+    """
+    if not INSTRUMENTATION.enabled:
+        return _NULL_SPAN
+    return INSTRUMENTATION._span(name)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent loading of many statement files (e.g. a year of statements, or
+several accounts, on network-mounted storage). Files are read by a pool of
+threads driven from asyncio and parsed in a thread (or process) pool, with at
+most `concurrency` files in flight: when the consumer falls behind, finished
+statements wait in a bounded queue and no new reads are started. The total
+load time then follows the slowest files rather than the sum of all of them.
+
+    async for path, statement in iter_statements(paths):
+        agg.update(statement)
+
+or, from synchronous code, load_statements(paths) returns the statements in
+the order of paths.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from monex_statement import Statement, file_stamp
+
+DEFAULT_CONCURRENCY = 8
+
+
+def read_file(path):
+    """Returns the contents of a file."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _stamp(path):
+    # file_stamp of a local file, None if read fetches it from elsewhere
+    try:
+        return file_stamp(path)
+    except OSError:
+        return None
+
+
+async def iter_statements(paths, concurrency=DEFAULT_CONCURRENCY, read=read_file,
+                          processes=False, cache=None):
+    """
+    Loads csv bank statements concurrently, yielding them as they complete.
+
+    Parameters:
+    ----------
+    paths: list of str
+           Paths to the csv bank statements.
+    concurrency: (optional) int
+                 Maximum number of files being read, parsed or waiting to be
+                 consumed at any time.
+    read: (optional) callable
+          Function returning the bytes of a path (run in a thread), e.g. to
+          fetch statements from remote storage. Defaults to read_file.
+    processes: (optional) boolean
+               Parses in a pool of worker processes instead of threads.
+    cache: (optional) monex_cache.StatementCache
+           On-disk cache of parsed statements. If given, each file is loaded
+           with cache.get (and read is not used).
+
+    Yields:
+    -------
+    path: str
+          Path of the loaded statement.
+    statement: monex_statement.Statement
+               Parsed statement, with its path and file stamp.
+    """
+
+    paths = list(paths)
+    if not paths:
+        return
+
+    loop = asyncio.get_running_loop()
+    io_pool = ThreadPoolExecutor(max_workers=concurrency)
+    parse_pool = (ProcessPoolExecutor(max_workers=min(concurrency, os.cpu_count() or 1))
+                  if processes else io_pool)
+    slots = asyncio.Semaphore(concurrency)
+    done = asyncio.Queue(maxsize=concurrency)
+
+    async def fetch(path):
+        # The slot is released by the consumer once it takes the result, so
+        # at most concurrency files are in flight or waiting (backpressure)
+        await slots.acquire()
+        try:
+            if cache is not None:
+                statement = await loop.run_in_executor(io_pool, cache.get, path)
+            else:
+                # Taking the stamp before reading so a concurrent write
+                # invalidates it
+                stamp = await loop.run_in_executor(io_pool, _stamp, path)
+                data = await loop.run_in_executor(io_pool, read, path)
+                statement = await loop.run_in_executor(
+                    parse_pool, Statement.from_csv_bytes, data, path, stamp)
+                if processes:
+                    Statement.n_parses += 1
+            result = (path, statement, None)
+        except Exception as exc:
+            result = (path, None, exc)
+        await done.put(result)
+
+    tasks = [asyncio.create_task(fetch(path)) for path in paths]
+    try:
+        for _ in range(len(paths)):
+            path, statement, exc = await done.get()
+            slots.release()
+            if exc is not None:
+                raise exc
+            yield path, statement
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        io_pool.shutdown(wait=False, cancel_futures=True)
+        if processes:
+            parse_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def load_statements(paths, concurrency=DEFAULT_CONCURRENCY, read=read_file,
+                    processes=False, cache=None):
+    """
+    Loads csv bank statements concurrently (see iter_statements) from
+    synchronous code.
+
+    Returns:
+    -------
+    statements: list of monex_statement.Statement
+                Parsed statements, in the order of paths.
+    """
+
+    paths = list(paths)
+
+    async def collect():
+        loaded = {}
+        async for path, statement in iter_statements(paths, concurrency, read,
+                                                     processes, cache):
+            loaded[path] = statement
+        return [loaded[path] for path in paths]
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(collect())
+
+    # Already inside an event loop (e.g. a Jupyter notebook): running the
+    # loader on its own loop in a helper thread
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, collect()).result()
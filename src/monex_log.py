@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only binary transaction log, for long-running histories that would be
+wasteful to keep re-reading from csv. The log is a file of fixed-width records
+(RECORD_DTYPE: day ordinal, amount, fees, category code and merchant code)
+after a 16 byte header, plus a json sidecar ({log}.json) with the category and
+merchant string dictionaries the codes index into, the currency of the log and
+the number of records the dictionaries cover. The sidecar is written once per
+flush (not per appended chunk) and commits the records: records appended after
+the last flush are ignored by readers, like a record cut short. A log holds a
+single currency; convert multi-currency statements with monex_fx first.
+
+Readers memory-map the records (np.memmap with the structured dtype), so the
+columns of TransactionLog.statement() are views into the file: aggregations
+(multi_costs, range_costs, StatementAggregates, ...) only touch the pages they
+read and nothing is copied up front.
+
+Converting csv statements (of any format registered in monex_banks) into a
+log:
+    python monex_log.py LOG CSV [CSV ...] [--chunksize N] [--bank NAME]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import numpy as np
+from monex_banks import BANK_FORMATS, read_statement_chunks
+from monex_statement import Statement, intern_dictionary
+
+MAGIC = b"MONEXLOG"
+LOG_VERSION = 1
+
+# Little-endian, packed records (28 bytes per transaction)
+RECORD_DTYPE = np.dtype([("ordinal", "<i4"), ("amount", "<f8"), ("fees", "<f8"),
+                         ("category", "<i4"), ("merchant", "<i4")])
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"),
+                         ("record_size", "<u4")])
+
+
+class TransactionLog:
+    """
+    Append-only binary log of transactions stored at self.path, with its
+    string dictionaries in self.path + ".json". The file is created on the
+    first append. Appends without flush=True are committed by flush() (or on
+    leaving a with block).
+    """
+
+    def __init__(self, path):
+        """
+        Constructor of TransactionLog. Reads the dictionaries of an existing
+        log.
+
+        Parameters:
+        ----------
+        path: str
+              Path to the binary log file.
+        """
+
+        self.path = path
+        self.categories = []
+        self.merchants = []
+        self.currency = None
+        # Number of records covered by the dictionaries (None: every record,
+        # for sidecars written before it was recorded)
+        self._committed = 0
+        self._flushed = True
+        if os.path.exists(self.sidecar):
+            with open(self.sidecar) as f:
+                dictionaries = json.load(f)
+            self.categories = dictionaries["categories"]
+            self.merchants = dictionaries["merchants"]
+            self.currency = dictionaries.get("currency")
+            self._committed = dictionaries.get("records")
+        if os.path.exists(path):
+            self._check_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    @property
+    def sidecar(self):
+        """Path to the json file with the string dictionaries."""
+        return self.path + ".json"
+
+    def _check_header(self):
+        header = np.fromfile(self.path, dtype=HEADER_DTYPE, count=1)
+        if (len(header) == 0 or header["magic"][0] != MAGIC
+                or header["version"][0] != LOG_VERSION
+                or header["record_size"][0] != RECORD_DTYPE.itemsize):
+            raise ValueError("{} is not a version {} monex transaction log".format(
+                self.path, LOG_VERSION))
+
+    def __len__(self):
+        if not os.path.exists(self.path):
+            return 0
+        # A record cut short by an interrupted append, or records appended
+        # after the last flush of another session, are not counted
+        size = os.path.getsize(self.path) - HEADER_DTYPE.itemsize
+        n = max(size, 0) // RECORD_DTYPE.itemsize
+        return n if self._committed is None else min(n, self._committed)
+
+    def records(self):
+        """
+        Returns the records of the log as a read-only memory-mapped structured
+        array (see RECORD_DTYPE).
+        """
+
+        n = len(self)
+        if n == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.memmap(self.path, dtype=RECORD_DTYPE, mode="r",
+                         offset=HEADER_DTYPE.itemsize, shape=(n,))
+
+    def statement(self):
+        """
+        Returns the transactions of the log as a monex_statement.Statement
+        whose numeric columns are views into the memory-mapped records.
+        """
+
+        rec = self.records()
+        currency = {}
+        if self.currency is not None:
+            currency = {"currency_codes": np.zeros(len(rec), dtype=np.int8),
+                        "currencies": intern_dictionary([self.currency])}
+        return Statement(rec["ordinal"], rec["amount"], rec["fees"],
+                         rec["category"], intern_dictionary(self.categories),
+                         rec["merchant"], intern_dictionary(self.merchants),
+                         **currency)
+
+    def _codes(self, dictionary, values):
+        # Codes of values into a log dictionary, extending it with new strings
+        index = {v: i for i, v in enumerate(dictionary)}
+        for v in values:
+            if v not in index:
+                index[v] = len(dictionary)
+                dictionary.append(str(v))
+        return np.array([index[v] for v in values], dtype=np.int32)
+
+    def _check_currency(self, statement):
+        # The single (non-blank) currency of the statement, which must be the
+        # one of the log
+        if statement.currencies is None:
+            return self.currency
+        used = statement.currencies[np.unique(statement.currency_codes)]
+        used = sorted(set(used.tolist()) - {""} | ({self.currency} - {None}))
+        if len(used) > 1:
+            raise ValueError(
+                "A transaction log holds a single currency, got {}; convert the "
+                "statement with monex_fx first".format(", ".join(used)))
+        return used[0] if used else None
+
+    def append(self, statement, flush=True):
+        """
+        Appends the transactions of a statement to the log.
+
+        Parameters:
+        ----------
+        statement: monex_statement.Statement
+                   Transactions in a single currency (or without currencies).
+        flush: (optional) boolean
+               If False, the dictionaries are only written (and the records
+               committed) by flush(), e.g. once after appending many chunks.
+
+        Returns:
+        -------
+        n_rows: int
+                Number of transactions appended.
+        """
+
+        currency = self._check_currency(statement)
+
+        # Remapping the codes of the statement onto the log dictionaries
+        category_map = self._codes(self.categories, statement.categories.tolist())
+        merchant_map = self._codes(self.merchants, statement.merchants.tolist())
+
+        records = np.empty(len(statement), dtype=RECORD_DTYPE)
+        records["ordinal"] = statement.ordinals
+        records["amount"] = statement.amount
+        records["fees"] = statement.fees
+        records["category"] = category_map[statement.category_codes]
+        records["merchant"] = merchant_map[statement.merchant_codes]
+
+        n = len(self)
+        with open(self.path, "ab") as f:
+            if f.tell() == 0:
+                header = np.array([(MAGIC, LOG_VERSION, RECORD_DTYPE.itemsize)],
+                                  dtype=HEADER_DTYPE)
+                f.write(header.tobytes())
+            else:
+                # Dropping a partial (or uncommitted) record left by an
+                # interrupted append
+                f.truncate(HEADER_DTYPE.itemsize + n * RECORD_DTYPE.itemsize)
+                f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+        self.currency = currency
+        self._committed = n + len(records)
+        self._flushed = False
+        if flush:
+            self.flush()
+        return len(records)
+
+    def flush(self):
+        """
+        Writes the dictionaries (atomically), committing the records appended
+        so far.
+        """
+
+        if self._flushed:
+            return
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"categories": self.categories,
+                       "merchants": self.merchants, "currency": self.currency,
+                       "records": len(self)}, f)
+        os.replace(tmp, self.sidecar)
+        self._flushed = True
+
+
+def csv_to_log(paths, log_path, chunksize=None, bank=None):
+    """
+    Converts csv bank statements into (or appends them to) a binary log.
+
+    Parameters:
+    ----------
+    paths: list of str
+           Paths to the csv bank statements.
+    log_path: str
+              Path to the binary log.
+    chunksize: (optional) int
+               If given, each csv is read and appended this many rows at a
+               time, so files larger than memory can be converted.
+    bank: (optional) str or monex_banks.BankFormat
+          Format of the statements. Detected from the header of each file by
+          default.
+
+    Returns:
+    -------
+    log: TransactionLog
+    """
+
+    # The dictionaries are written once, when leaving the with block
+    with TransactionLog(log_path) as log:
+        for path in paths:
+            if chunksize is None:
+                log.append(Statement.from_csv(path, bank=bank), flush=False)
+                continue
+            for chunk in read_statement_chunks(path, chunksize, bank):
+                log.append(chunk, flush=False)
+    return log
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Append csv bank statements to a binary transaction log.")
+    parser.add_argument("log", help="binary transaction log")
+    parser.add_argument("csv", nargs="*", help="csv bank statements")
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--bank", choices=sorted(BANK_FORMATS), default=None,
+                        help="format of the statements (default: detected)")
+    args = parser.parse_args(argv)
+
+    log = csv_to_log(args.csv, args.log, chunksize=args.chunksize, bank=args.bank)
+    print("{} transactions, {} categories, {} merchants in {}".format(
+        len(log), len(log.categories), len(log.merchants), args.log))
+
+
+if __name__ == "__main__":
+    main()
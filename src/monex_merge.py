@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Merging of bank statements whose date ranges overlap (e.g. a monthly export
+and an ad-hoc export of the same week) into one canonical transaction table,
+sorted by date, in which every transaction appears once.
+
+Transactions are identified by a 64-bit hash of (date, amount, merchant, fees)
+and of how many identical transactions precede them in the same file, so two
+identical coffees bought the same day are both kept, while the copy of a
+transaction exported in another file is dropped. Duplicates are found by
+sorting the keys (np.unique), i.e. in O(n log n) for any number of files.
+
+    python monex_merge.py OUT.npz CSV [CSV ...]
+merges csv files (and the rows of OUT.npz, if it exists) into OUT.npz.
+"""
+
+import argparse
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from monex_statement import Statement
+
+
+def merge_keys(statement):
+    """
+    Returns the deduplication key of each transaction: a 64-bit hash of its
+    (date, amount, merchant, fees) and of its occurrence number among the
+    identical transactions of the statement.
+
+    Parameters:
+    ----------
+    statement: monex_statement.Statement
+
+    Returns:
+    -------
+    keys: (1-d) uint64 array
+          Has the same shape as statement.amount.
+    """
+
+    # Hashing each merchant string once and looking the hashes up by code
+    merchant_hash = pd.util.hash_array(np.asarray(statement.merchants, dtype=object))
+    frame = pd.DataFrame({"ordinals": statement.ordinals,
+                          "amount": statement.amount, "fees": statement.fees,
+                          "merchant": merchant_hash[statement.merchant_codes]})
+    keys = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+    # Numbering the repetitions of each key (0 for the first one, 1, ...)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    rank = np.arange(len(keys))
+    new_key = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+    group_start = np.maximum.accumulate(np.where(new_key, rank, 0))
+    occurrence = np.empty(len(keys), dtype=np.int64)
+    occurrence[order] = rank - group_start
+
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({"key": keys, "occurrence": occurrence}), index=False).to_numpy()
+
+
+def merge_statements(statements):
+    """
+    Merges statements into one, dropping the transactions already present in
+    an earlier statement.
+
+    Parameters:
+    ----------
+    statements: list of monex_statement.Statement
+                Statements to be merged. When a transaction appears in several
+                of them, the first copy is kept.
+
+    Returns:
+    -------
+    merged: monex_statement.Statement
+            Distinct transactions sorted by date (ties keep input order).
+    n_duplicates: int
+                  Number of transactions dropped.
+    """
+
+    statements = list(statements)
+    if not statements:
+        raise ValueError("No statements to merge")
+    keys = np.concatenate([merge_keys(st) for st in statements])
+    _, first = np.unique(keys, return_index=True)
+    first.sort()
+
+    merged = Statement.concat(statements).take(first).sort_by_date()
+    return merged, len(keys) - len(first)
+
+
+def load_merged(path):
+    """
+    Loads a merged statement saved with save_merged.
+    """
+
+    with np.load(path, allow_pickle=False) as npz:
+        return Statement.from_arrays({name: npz[name] for name in npz.files})
+
+
+def save_merged(path, statement):
+    """
+    Saves a merged statement into a .npz file (written atomically, so readers
+    never see a partial file).
+    """
+
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, **statement.to_arrays())
+    os.replace(tmp, path)
+
+
+def merge_files(paths, out=None, cache=None):
+    """
+    Reads and merges csv bank statements.
+
+    Parameters:
+    ----------
+    paths: list of str
+           Paths to the csv bank statements.
+    out: (optional) str
+         .npz file of a merged statement. If it exists its transactions are
+         merged first (so only new transactions are added), and the result is
+         saved back into it.
+    cache: (optional) monex_cache.StatementCache
+           On-disk cache of parsed statements.
+
+    Returns:
+    -------
+    merged: monex_statement.Statement
+            Distinct transactions sorted by date.
+    n_duplicates: int
+                  Number of transactions dropped.
+    """
+
+    statements = [cache.get(p) if cache is not None else Statement.from_csv(p)
+                  for p in paths]
+    if out is not None and os.path.exists(out):
+        statements.insert(0, load_merged(out))
+
+    merged, n_duplicates = merge_statements(statements)
+    if out is not None:
+        save_merged(out, merged)
+    return merged, n_duplicates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Merge overlapping csv bank statements.")
+    parser.add_argument("out", help=".npz file of the merged statement")
+    parser.add_argument("csv", nargs="+", help="csv bank statements")
+    args = parser.parse_args(argv)
+
+    merged, n_duplicates = merge_files(args.csv, out=args.out)
+    print("{} transactions ({} duplicates dropped) -> {}".format(
+        len(merged), n_duplicates, args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Metrics behind the reports, as plain data instead of figures: the pie chart
+percentages, the number of transactions per day and per category (histogram)
+the cumulative costs per category, income, costs and savings (cost plot)
+and the fees per category, merchant and day (fee chart) of a statement over a
+date range. They are read from the (category x day) grid and merchant table
+of monex_stream.StatementAggregates, filled in one pass over the rows, without
+importing matplotlib, and can be written as JSON or CSV (see monex.py for the
+command line). Non-finite values are written as null.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from monex_fx import REPORTING_CURRENCY
+from monex_statement import NAT_ORDINAL
+from monex_stream import StatementAggregates
+
+# Categories highlighted (exploded) in the pie chart
+EXPLODED = ("Drinks Out", "Eating Out", "Groceries")
+
+
+def statement_metrics(statement, start=None, end=None, currency=REPORTING_CURRENCY):
+    """
+    Computes the metrics of the reports of a statement over a date range.
+
+    Parameters:
+    ----------
+    statement: monex_statement.Statement
+               Statement to be summarized (in any order).
+    start, end: (optional) str or datetime64
+                First and last day (both included) of the range. Default to
+                the first and last date of the statement.
+    currency: (optional) str
+              Currency of the amounts.
+
+    Returns:
+    -------
+    metrics: dict
+             JSON-serializable metrics:
+                 "pie_chart": costs and percentage of the total costs of each
+                              category (sorted, without income)
+                 "histogram": number of transactions on each day of the range
+                 "categories": number of transactions and total of each
+                               category, in order of first appearance
+                 "cumulative": cumulative costs of each category (in order of
+                               first appearance), income, costs and savings on
+                               each day of the range
+                 "fees": fees, absolute amounts, number of transactions and
+                         fee-to-amount ratio (None without amounts) of each
+                         category (order of first appearance), then of each
+                         merchant (by decreasing fees); "group" tells which
+                 The fees of each day are in "histogram" ("fees").
+    """
+
+    st = statement.sort_by_date()
+    valid = st.ordinals[st.ordinals != NAT_ORDINAL]
+    if start is None:
+        start = valid[0].astype("datetime64[D]") if len(valid) else np.datetime64("today")
+    if end is None:
+        end = valid[-1].astype("datetime64[D]") if len(valid) else np.datetime64(start, "D")
+    start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+    st = st.between(start, end)
+
+    # Sums, counts and fees of every (category, day) cell of the range and the
+    # merchant table, in one pass (see monex_stream)
+    agg = StatementAggregates.from_statement(st)
+    dates = np.arange(start, end + 1)
+    sums, counts, fees = (agg.range_grid(name, start, end)
+                          for name in ("sums", "counts", "fees"))
+    totals, cat_counts = sums.sum(axis=1), counts.sum(axis=1)
+    is_income = (agg.categories == "Income")
+
+    # Categories in order of first appearance (the statement is sorted by date)
+    first_row = agg.first_row.min(axis=1, initial=np.iinfo(np.int64).max)
+    present = np.flatnonzero(agg.counts.sum(axis=1))
+    appearance = present[np.argsort(first_row[present], kind="stable")]
+    costs = appearance[~is_income[appearance]]
+
+    # Pie chart: costs sorted by category name
+    pie = costs[np.argsort(agg.categories[costs], kind="stable")]
+    total_costs = totals[pie].sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.abs(totals[pie] / total_costs * 100)
+
+    cumulative = np.cumsum(sums[costs], axis=1) * -1
+    income = np.cumsum(sums[is_income].sum(axis=0))
+    cost_total = cumulative.sum(axis=0)
+
+    # Fees per category (order of first appearance) and per merchant (by
+    # decreasing fees)
+    labels, cat_fees, cat_volume, _, _ = agg.fee_table("category")
+    order = {cat: i for i, cat in enumerate(labels)}
+    by_category = [order[cat] for cat in agg.categories[appearance]]
+    merchants, merchant_fees, merchant_volume, merchant_counts, _ = agg.fee_table("merchant")
+    by_merchant = np.argsort(-np.round(merchant_fees, 2), kind="stable")
+    fee_fees = np.concatenate([cat_fees[by_category], merchant_fees[by_merchant]])
+    fee_volume = np.concatenate([cat_volume[by_category], merchant_volume[by_merchant]])
+
+    def amounts(x):
+        # Non-finite values (e.g. unparseable amounts) are written as null
+        x = np.round(np.asarray(x, dtype=float), 2)
+        return np.where(np.isfinite(x), x, None).tolist()
+
+    def ratios(num, den):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.round(num / den, 6)
+        return [float(r) if d > 0 and np.isfinite(r) else None
+                for r, d in zip(ratio, den)]
+
+    return {
+        "start": str(start), "end": str(end), "currency": currency,
+        "n_transactions": int(len(st)),
+        "pie_chart": {"category": agg.categories[pie].tolist(),
+                      "total": amounts(totals[pie]),
+                      "percent": amounts(percent),
+                      "explode": [0.15 if c in EXPLODED else 0.0
+                                  for c in agg.categories[pie]]},
+        "histogram": {"date": dates.astype(str).tolist(),
+                      "count": counts.sum(axis=0).tolist(),
+                      "fees": amounts(fees.sum(axis=0))},
+        "categories": {"category": agg.categories[appearance].tolist(),
+                       "count": cat_counts[appearance].tolist(),
+                       "total": amounts(totals[appearance])},
+        "cumulative": {"date": dates.astype(str).tolist(),
+                       "category": agg.categories[costs].tolist(),
+                       "costs": [amounts(row) for row in cumulative],
+                       "income": amounts(income),
+                       "total_costs": amounts(cost_total),
+                       "savings": amounts(income - cost_total)},
+        "fees": {"group": ["category"] * len(appearance) + ["merchant"] * len(by_merchant),
+                 "name": (agg.categories[appearance].tolist()
+                          + merchants[by_merchant].tolist()),
+                 "fees": amounts(fee_fees),
+                 "amount": amounts(fee_volume),
+                 "count": (cat_counts[appearance].tolist()
+                           + merchant_counts[by_merchant].tolist()),
+                 "ratio": ratios(fee_fees, fee_volume)},
+    }
+
+
+def write_json(metrics, path):
+    """Writes metrics (see statement_metrics) into a JSON file."""
+    with open(path, "w") as f:
+        json.dump(metrics, f, separators=(",", ":"), allow_nan=False)
+
+
+def metric_tables(metrics):
+    """
+    Returns the metrics (see statement_metrics) as flat tables.
+
+    Returns:
+    -------
+    tables: dict
+            pandas.DataFrame of each of "pie_chart", "histogram",
+            "categories", "cumulative" (one column per category) and "fees".
+    """
+
+    cum = metrics["cumulative"]
+    cumulative = pd.DataFrame({"date": cum["date"], "income": cum["income"],
+                               "total_costs": cum["total_costs"],
+                               "savings": cum["savings"]})
+    for category, costs in zip(cum["category"], cum["costs"]):
+        cumulative[category] = costs
+    return {"pie_chart": pd.DataFrame(metrics["pie_chart"]),
+            "histogram": pd.DataFrame(metrics["histogram"]),
+            "categories": pd.DataFrame(metrics["categories"]),
+            "cumulative": cumulative,
+            "fees": pd.DataFrame(metrics["fees"])}
+
+
+def write_csv(metrics, prefix):
+    """
+    Writes the metric tables (see metric_tables) into {prefix}__{table}.csv
+    files and returns their paths.
+    """
+
+    paths = []
+    for name, table in metric_tables(metrics).items():
+        path = "{}__{}.csv".format(prefix, name)
+        table.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def save_metrics(metrics, outdir, name, formats=("json",)):
+    """
+    Writes metrics in each of formats ("json", "csv") into outdir, named
+    after name. Returns the paths written.
+    """
+
+    os.makedirs(outdir, exist_ok=True)
+    prefix = os.path.join(outdir, name)
+    paths = []
+    if "json" in formats:
+        write_json(metrics, prefix + ".json")
+        paths.append(prefix + ".json")
+    if "csv" in formats:
+        paths += write_csv(metrics, prefix)
+    return paths
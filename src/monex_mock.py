@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized generator of mock bank statements with the five-column schema read
+by data_extract ("Date", "Amount", "Merchant", "Total fees", "Category"). Rows
+are drawn in bulk with NumPy from a seeded generator, so statements of millions
+of rows spanning many months or years can be produced (or streamed to csv in
+chunks) in seconds, e.g. as fixtures for the benchmarks:
+    python monex_mock.py OUT.csv --rows 10000000 --start 2015-01-01 --end 2024-12-31
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+from monex_statement import Statement, code_dtype, intern_dictionary, to_ordinals
+
+# Category -> (relative frequency, mean amount, standard deviation). Costs are
+# negative and income positive, as in a Transferwise statement.
+DEFAULT_CATEGORIES = {
+    "Rent": (1, -260, 26),
+    "Groceries": (4, -25, 8),
+    "Income": (1, 1000, 10),
+    "Others": (3, -20, 4),
+    "Coffee": (20, -4.5, 0.5),
+    "Drinks Out": (5, -11, 1.5),
+    "Eating Out": (7, -14, 2),
+}
+
+DEFAULT_CHUNKSIZE = 1_000_000
+
+# Share of the transactions that are charged a fee, and the fee rate
+FEE_PROBABILITY = 0.05
+FEE_RATE = 0.005
+
+
+def _mock_chunks(n_rows, start, end, categories, n_merchants, seed, chunksize):
+    # Yields dicts of typed columns (dates sorted across chunks)
+    rng = np.random.default_rng(seed)
+    names = list(categories)
+    weights, means, stds = (np.array(v, dtype=float)
+                            for v in zip(*categories.values()))
+
+    # Spreading the rows uniformly over the days of the range, already sorted
+    start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+    n_days = int((end - start).astype(int)) + 1
+    day_offsets = np.repeat(np.arange(n_days, dtype=np.int32),
+                            rng.multinomial(n_rows, np.full(n_days, 1 / n_days)))
+
+    merchants = np.array(["{} merchant {}".format(cat, i)
+                          for cat in names for i in range(n_merchants)],
+                         dtype=object)
+    for lo in range(0, n_rows, chunksize):
+        n = min(chunksize, n_rows - lo)
+        cats = rng.choice(len(names), size=n, p=weights / weights.sum())
+        amount = np.round(rng.normal(means[cats], stds[cats]), 2)
+        charged = rng.random(n) < FEE_PROBABILITY
+        fees = np.where(charged, np.round(np.abs(amount) * FEE_RATE, 2), 0.0)
+        yield {
+            "dates": start + day_offsets[lo:lo + n],
+            "amount": amount,
+            "fees": fees,
+            "category_codes": cats,
+            "merchant_codes": cats * n_merchants + rng.integers(0, n_merchants, n),
+            "categories": np.array(names, dtype=object),
+            "merchants": merchants,
+        }
+
+
+def mock_statement(n_rows, start="2021-01-01", end="2021-12-31", categories=None,
+                   n_merchants=20, seed=None):
+    """
+    Creates a pandas.DataFrame representing a mock bank statement.
+
+    Parameters:
+    ----------
+    n_rows: int
+            Number of transactions.
+    start, end: (optional) str or datetime64
+                First and last day (both included) of the statement.
+    categories: (optional) dict
+                Category -> (relative frequency, mean amount, standard
+                deviation). Defaults to DEFAULT_CATEGORIES.
+    n_merchants: (optional) int
+                 Number of distinct merchants per category.
+    seed: (optional) int
+          Seed of the random generator, for reproducible statements.
+
+    Returns:
+    -------
+    df: pandas.DataFrame
+        Contains the mock statement, sorted by date.
+    """
+
+    chunks = list(_mock_chunks(n_rows, start, end, categories or DEFAULT_CATEGORIES,
+                               n_merchants, seed, max(n_rows, 1)))
+    if not chunks:
+        return pd.DataFrame(columns=["Date", "Amount", "Merchant", "Total fees",
+                                     "Category"])
+    cols = chunks[0]
+    return pd.DataFrame({
+        "Date": pd.DatetimeIndex(cols["dates"]).strftime("%d/%m/%Y"),
+        "Amount": cols["amount"],
+        "Merchant": cols["merchants"][cols["merchant_codes"]],
+        "Total fees": cols["fees"],
+        "Category": cols["categories"][cols["category_codes"]],
+    })
+
+
+def mock_table(n_rows, start="2021-01-01", end="2021-12-31", categories=None,
+               n_merchants=20, seed=None):
+    """
+    Creates a mock bank statement directly as a monex_statement.Statement
+    (same rows as mock_statement, without going through strings), e.g. to
+    benchmark the analytics on tens of millions of rows.
+
+    Parameters:
+    ----------
+    See mock_statement.
+
+    Returns:
+    -------
+    statement: monex_statement.Statement
+               Mock statement, sorted by date.
+    """
+
+    chunks = list(_mock_chunks(n_rows, start, end, categories or DEFAULT_CATEGORIES,
+                               n_merchants, seed, max(n_rows, 1)))
+    if not chunks:
+        return Statement.from_columns([], [], [], [], [])
+    cols = chunks[0]
+    return Statement(to_ordinals(cols["dates"]), cols["amount"], cols["fees"],
+                     cols["category_codes"].astype(code_dtype(len(cols["categories"]))),
+                     intern_dictionary(cols["categories"]),
+                     cols["merchant_codes"].astype(code_dtype(len(cols["merchants"]))),
+                     intern_dictionary(cols["merchants"]))
+
+
+def _byte_table(strings):
+    # Padded (k x max_len) uint8 table of encoded strings and their lengths
+    encoded = [s.encode() for s in strings]
+    lens = np.array([len(b) for b in encoded], dtype=np.int64)
+    width = max(lens.max(initial=0), 1)
+    table = np.array(encoded, dtype="S{}".format(width)).view(np.uint8)
+    return table.reshape(len(encoded), width), lens
+
+
+def _csv_bytes(pieces):
+    """
+    Renders rows from a list of (strings, codes) pieces: row i is the
+    concatenation of strings[codes[i]] over the pieces. The rows are assembled
+    as a padded byte matrix and compressed with a mask of the valid bytes, so
+    no Python object is created per row.
+    """
+
+    blocks, masks = [], []
+    for strings, codes in pieces:
+        table, lens = _byte_table(strings)
+        blocks.append(table[codes])
+        masks.append(np.arange(table.shape[1]) < lens[codes][:, None])
+    return np.concatenate(blocks, axis=1)[np.concatenate(masks, axis=1)].tobytes()
+
+
+def _amount_pieces(values, end):
+    # Formats values with two decimals as sign + integer part + cents pieces
+    cents = np.round(values * 100).astype(np.int64)
+    whole, frac = np.divmod(np.abs(cents), 100)
+    ints = [str(i) for i in range(int(whole.max(initial=0)) + 1)]
+    return [(["", "-"], (cents < 0).astype(np.int64)),
+            (ints, whole),
+            ([".{:02d}{}".format(c, end) for c in range(100)], frac)]
+
+
+def write_mock_csv(path, n_rows, start="2021-01-01", end="2021-12-31",
+                   categories=None, n_merchants=20, seed=None,
+                   chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Writes a mock bank statement straight to a csv file, chunk by chunk, so the
+    memory used is bounded by the chunk size. Takes the same parameters as
+    mock_statement (a given seed and chunksize always give the same file).
+
+    Returns:
+    -------
+    path: str
+          Path of the written csv file.
+    """
+
+    with open(path, "wb") as f:
+        f.write(b"Date,Amount,Merchant,Total fees,Category\n")
+        for cols in _mock_chunks(n_rows, start, end, categories or DEFAULT_CATEGORIES,
+                                 n_merchants, seed, chunksize):
+            udates, date_codes = np.unique(cols["dates"], return_inverse=True)
+            date_strings = pd.DatetimeIndex(udates).strftime("%d/%m/%Y,")
+            f.write(_csv_bytes(
+                [(list(date_strings), date_codes.ravel())]
+                + _amount_pieces(cols["amount"], ",")
+                + [([m + "," for m in cols["merchants"]], cols["merchant_codes"])]
+                + _amount_pieces(cols["fees"], ",")
+                + [([c + "\n" for c in cols["categories"]], cols["category_codes"])]))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a mock bank statement.")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--start", default="2021-01-01")
+    parser.add_argument("--end", default="2021-12-31")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args(argv)
+    write_mock_csv(args.path, args.rows, args.start, args.end, seed=args.seed,
+                   chunksize=args.chunksize)
+
+
+if __name__ == "__main__":
+    main()
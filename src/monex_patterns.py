@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""
+Detection of recurring payments (rent, subscriptions, salary...) and of
+anomalous transactions, so one-off spikes can be told apart from regular
+charges in the cost curves.
+
+    - Recurring payments: transactions are grouped by normalized merchant and
+      amount band (amounts within ~10% of each other, on a log scale) and the
+      gaps in days between consecutive transactions of each group are
+      counted. A group whose median gap matches a known period (weekly,
+      fortnightly, monthly, quarterly, yearly) with a small median absolute
+      deviation (MAD) is recurring.
+    - Anomalies: each transaction is scored against the median and MAD of the
+      amounts of its category (robust z-score, 0.6745 * (x - median) / MAD) and
+      flagged above a threshold (3.5 by default).
+
+PatternDetector keeps only histograms (group x gap in days, category x amount
+in cents), updated with grouped NumPy operations (sort, unique, bincount) as
+statements arrive, and the medians and MADs are computed exactly from them. It
+can be saved and loaded between runs:
+    python monex_patterns.py [--state STATE] CSV [CSV ...]
+folds statements into STATE and prints the recurring payments and anomalies.
+"""
+
+import argparse
+import os
+import tempfile
+import numpy as np
+from monex_cache import DEFAULT_CACHE_DIR
+from monex_classify import normalize_merchant
+from monex_statement import Statement
+
+DEFAULT_STATE = os.path.join(DEFAULT_CACHE_DIR, "patterns.npz")
+
+# Period name -> length in days
+PERIODS = {"weekly": 7, "fortnightly": 14, "monthly": 30.44,
+           "quarterly": 91.31, "yearly": 365.25}
+
+# Relative width of the amount bands
+BAND_WIDTH = 0.1
+
+# A group is periodic if its median gap is within PERIOD_TOLERANCE (relative,
+# at least MIN_TOLERANCE days) of a period and the MAD of its gaps is at most
+# MAX_JITTER days and JITTER_TOLERANCE of the median gap (random purchases
+# have a MAD of about half their median gap)
+PERIOD_TOLERANCE = 0.1
+MIN_TOLERANCE = 2
+MAX_JITTER = 2
+JITTER_TOLERANCE = 0.2
+
+# Gaps are counted up to MAX_GAP days (longer gaps are clipped)
+MAX_GAP = (1 << 10) - 1
+
+# Bit layout of the histogram keys: (merchant, band) groups and gaps, and
+# (category, cents) amounts
+_BAND_BITS = 16
+_GAP_BITS = 10
+_CENTS_BITS = 40
+
+
+def amount_band(amount, tolerance=BAND_WIDTH):
+    """
+    Returns the amount band of each amount: bands are tolerance wide on a log
+    scale, signed (costs and income fall in different bands) and 0 for 0 (or
+    NaN).
+
+    Parameters:
+    ----------
+    amount: (1-d) array-like
+    tolerance: (optional) float
+               Relative width of the bands.
+
+    Returns:
+    -------
+    bands: (1-d) int64 array
+    """
+
+    amount = np.asarray(amount, dtype=float)
+    cents = np.abs(np.rint(amount * 100))
+    bands = np.zeros(len(cents), dtype=np.int64)
+    nonzero = (cents > 0)
+    bands[nonzero] = np.floor(np.log(cents[nonzero]) / np.log1p(tolerance)) + 1
+    # NaN amounts fall in band 0
+    return np.where(amount < 0, -bands, bands)
+
+
+def _merge_counts(keys, counts, new_keys, new_counts):
+    # Adding a (sorted keys, counts) histogram to another one
+    keys, inverse = np.unique(np.concatenate([keys, new_keys]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([counts, new_counts]),
+                         minlength=len(keys)).astype(np.int64)
+    return keys, counts
+
+
+def _grouped_median(groups, values, weights):
+    # Weighted median of the values of each group, from entries sorted by
+    # (group, value) with positive integer weights (the mean of the two middle
+    # values for an even total, as np.median)
+    uniq, start = np.unique(groups, return_index=True)
+    if not len(uniq):
+        return uniq, np.zeros(0), np.zeros(0, dtype=np.int64)
+    total = np.add.reduceat(weights, start)
+    cumulative = np.cumsum(weights)
+    before = cumulative[start] - weights[start]
+    lo = np.searchsorted(cumulative, before + (total - 1) // 2, side="right")
+    hi = np.searchsorted(cumulative, before + total // 2, side="right")
+    return uniq, (values[lo] + values[hi]) / 2, total
+
+
+def _median_mad(groups, values, weights):
+    # Weighted median and MAD of each group, entries sorted by (group, value)
+    uniq, median, total = _grouped_median(groups, values, weights)
+    deviation = np.abs(values - median[np.searchsorted(uniq, groups)])
+    order = np.lexsort((deviation, groups))
+    _, mad, _ = _grouped_median(groups[order], deviation[order], weights[order])
+    return uniq, median, mad, total
+
+
+class PatternDetector:
+    """
+    Incremental recurring payment and anomaly detector:
+        merchants, categories: names of the merchant and category ids
+        group_keys: sorted (merchant id, amount band) keys of the groups, with
+                    their group_count, group_first/group_last date (ordinal)
+                    and group_amount (sum)
+        gap_keys/gap_counts: histogram of the gaps of each group
+        amount_keys/amount_counts: histogram of the amounts (in cents) of each
+                                   category
+    """
+
+    def __init__(self, tolerance=BAND_WIDTH):
+        """
+        Constructor of PatternDetector (empty history).
+
+        Parameters:
+        ----------
+        tolerance: (optional) float
+                   Relative width of the amount bands (see amount_band).
+        """
+
+        self.tolerance = tolerance
+        self.merchants = []
+        self.categories = []
+        self._merchant_ids = {}
+        self._category_ids = {}
+        self.group_keys = np.zeros(0, dtype=np.int64)
+        self.group_count = np.zeros(0, dtype=np.int64)
+        self.group_first = np.zeros(0, dtype=np.int64)
+        self.group_last = np.zeros(0, dtype=np.int64)
+        self.group_amount = np.zeros(0)
+        self.gap_keys = np.zeros(0, dtype=np.int64)
+        self.gap_counts = np.zeros(0, dtype=np.int64)
+        self.amount_keys = np.zeros(0, dtype=np.int64)
+        self.amount_counts = np.zeros(0, dtype=np.int64)
+        self._stats = None
+
+    @classmethod
+    def from_statement(cls, statement, tolerance=BAND_WIDTH):
+        """Detector fitted on an in-memory monex_statement.Statement."""
+        detector = cls(tolerance)
+        detector.update(statement)
+        return detector
+
+    @staticmethod
+    def _ids(table, names, values):
+        # Id of each value in an (append-only) dictionary of names
+        ids = np.empty(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            if value not in table:
+                table[value] = len(names)
+                names.append(value)
+            ids[i] = table[value]
+        return ids
+
+    def _group_keys(self, statement, add=False):
+        # (merchant id, amount band) key of each row (-1 for a missing
+        # merchant, or an unknown one unless add)
+        names = [normalize_merchant(m) or str(m).strip() for m in statement.merchants]
+        if add:
+            ids = self._ids(self._merchant_ids, self.merchants, names)
+        else:
+            ids = np.array([self._merchant_ids.get(n, -1) for n in names],
+                           dtype=np.int64)
+        ids[[not n for n in names]] = -1
+        ids = ids[statement.merchant_codes]
+        bands = amount_band(statement.amount, self.tolerance)
+        keys = (ids << _BAND_BITS) | (bands + (1 << (_BAND_BITS - 1)))
+        return np.where(ids >= 0, keys, -1)
+
+    def update(self, statement):
+        """
+        Folds the transactions of a statement into the history. Statements
+        are expected in chronological order (and without the duplicates of
+        overlapping exports, see monex_merge): a transaction older than the
+        last one of its group does not add a gap.
+
+        Parameters:
+        ----------
+        statement: monex_statement.Statement
+                   Rows to be added. Rows with an unparseable date or amount
+                   are skipped.
+        """
+
+        self._stats = None
+        valid = ~np.isnat(statement.dates) & np.isfinite(statement.amount)
+        keys = self._group_keys(statement, add=True)[valid]
+        ordinals = statement.ordinals[valid].astype(np.int64)
+        amount = statement.amount[valid]
+        category_ids = self._ids(self._category_ids, self.categories,
+                                 list(statement.categories))
+        if not len(keys):
+            return
+
+        # Amount histogram of each category
+        cents = np.rint(amount * 100).astype(np.int64) + (1 << (_CENTS_BITS - 1))
+        amount_keys = (category_ids[statement.category_codes[valid]] << _CENTS_BITS) | cents
+        self.amount_keys, self.amount_counts = _merge_counts(
+            self.amount_keys, self.amount_counts,
+            *np.unique(amount_keys, return_counts=True))
+
+        # Per-group counts, dates and gaps of the statement
+        order = np.lexsort((ordinals, keys))
+        order = order[keys[order] >= 0]
+        if not len(order):
+            return
+        keys, ordinals, amount = keys[order], ordinals[order], amount[order]
+        uniq, start = np.unique(keys, return_index=True)
+        end = np.r_[start[1:], len(keys)]
+        same = (keys[1:] == keys[:-1])
+        gap_groups = [keys[1:][same]]
+        gaps = [np.diff(ordinals)[same]]
+
+        # Gaps between the last transaction seen of each group and its first
+        # transaction in the statement
+        first, last = ordinals[start], ordinals[end - 1]
+        known = np.zeros(len(uniq), dtype=bool)
+        pos = np.zeros(len(uniq), dtype=np.int64)
+        if len(self.group_keys):
+            pos = np.minimum(np.searchsorted(self.group_keys, uniq),
+                             len(self.group_keys) - 1)
+            known = (self.group_keys[pos] == uniq)
+        connect = first[known] - self.group_last[pos[known]]
+        gap_groups.append(uniq[known][connect >= 0])
+        gaps.append(connect[connect >= 0])
+
+        gap_keys = (np.concatenate(gap_groups) << _GAP_BITS) | np.minimum(
+            np.concatenate(gaps), MAX_GAP)
+        self.gap_keys, self.gap_counts = _merge_counts(
+            self.gap_keys, self.gap_counts, *np.unique(gap_keys, return_counts=True))
+
+        # Merging the group table
+        merged = np.union1d(self.group_keys, uniq)
+        old, new = (np.searchsorted(merged, self.group_keys),
+                    np.searchsorted(merged, uniq))
+        count = np.zeros(len(merged), dtype=np.int64)
+        total = np.zeros(len(merged))
+        group_first = np.full(len(merged), np.iinfo(np.int64).max)
+        group_last = np.full(len(merged), np.iinfo(np.int64).min)
+        count[old], total[old] = self.group_count, self.group_amount
+        group_first[old], group_last[old] = self.group_first, self.group_last
+        count[new] += end - start
+        total[new] += np.add.reduceat(amount, start)
+        group_first[new] = np.minimum(group_first[new], first)
+        group_last[new] = np.maximum(group_last[new], last)
+        self.group_keys, self.group_count, self.group_amount = merged, count, total
+        self.group_first, self.group_last = group_first, group_last
+
+    def _statistics(self):
+        # Recurring group keys (with their period) and per-category amount
+        # medians/MADs, recomputed after each update
+        if self._stats is not None:
+            return self._stats
+
+        groups, median_gap, mad_gap, _ = _median_mad(
+            self.gap_keys >> _GAP_BITS, self.gap_keys & MAX_GAP, self.gap_counts)
+        period = np.full(len(groups), -1)
+        for i, days in enumerate(PERIODS.values()):
+            match = (np.abs(median_gap - days) <= max(MIN_TOLERANCE, PERIOD_TOLERANCE * days))
+            period[match & (period < 0)] = i
+        periodic = (period >= 0) & (mad_gap <= np.minimum(
+            MAX_JITTER, JITTER_TOLERANCE * median_gap))
+
+        categories, median, mad, total = _median_mad(
+            self.amount_keys >> _CENTS_BITS,
+            (self.amount_keys & ((1 << _CENTS_BITS) - 1)) - (1 << (_CENTS_BITS - 1)),
+            self.amount_counts)
+
+        self._stats = {"groups": groups[periodic], "period": period[periodic],
+                       "interval": median_gap[periodic],
+                       "categories": categories, "median": median, "mad": mad,
+                       "count": total}
+        return self._stats
+
+    def recurring(self, min_occurrences=3):
+        """
+        Returns the recurring payments of the history.
+
+        Parameters:
+        ----------
+        min_occurrences: (optional) int
+                         Minimum number of transactions of a recurring group.
+
+        Returns:
+        -------
+        recurring: dict
+                   Arrays (one entry per recurring payment, sorted by merchant)
+                   "merchant" (normalized name), "amount" (mean), "period"
+                   (name in PERIODS), "interval" (median gap in days), "count",
+                   "first", "last" and "next" (expected) datetime64[D] dates.
+        """
+
+        stats = self._statistics()
+        pos = np.searchsorted(self.group_keys, stats["groups"])
+        keep = (self.group_count[pos] >= min_occurrences)
+        pos = pos[keep]
+        interval = stats["interval"][keep]
+
+        merchants = np.array(self.merchants, dtype=object)[
+            self.group_keys[pos] >> _BAND_BITS]
+        order = np.argsort(merchants, kind="stable")
+        last = self.group_last[pos]
+        return {"merchant": merchants[order],
+                "amount": (self.group_amount[pos] / self.group_count[pos])[order],
+                "period": np.array(list(PERIODS), dtype=object)[stats["period"][keep]][order],
+                "interval": interval[order],
+                "count": self.group_count[pos][order],
+                "first": self.group_first[pos][order].astype("datetime64[D]"),
+                "last": last[order].astype("datetime64[D]"),
+                "next": (last + np.rint(interval).astype(np.int64))[order].astype(
+                    "datetime64[D]")}
+
+    def is_recurring(self, statement, min_occurrences=3):
+        """
+        Returns a boolean mask of the transactions of a statement that belong
+        to a recurring payment of the history (e.g. to plot the one-off costs
+        apart from rent and subscriptions).
+        """
+
+        stats = self._statistics()
+        pos = np.searchsorted(self.group_keys, stats["groups"])
+        groups = stats["groups"][self.group_count[pos] >= min_occurrences]
+        return np.isin(self._group_keys(statement), groups)
+
+    def anomaly_scores(self, statement, min_count=10):
+        """
+        Returns the robust z-score of each transaction of a statement against
+        the amounts of its category in the history (MADs below one cent count
+        as one cent).
+
+        Parameters:
+        ----------
+        statement: monex_statement.Statement
+        min_count: (optional) int
+                   Categories with fewer transactions are not scored.
+
+        Returns:
+        -------
+        scores: (1-d) array-like
+                0.6745 * (amount - median) / MAD, NaN for the transactions of
+                unknown or too small categories.
+        """
+
+        stats = self._statistics()
+        median = np.full(len(self.categories), np.nan)
+        mad = np.ones(len(self.categories))
+        scored = stats["count"] >= min_count
+        median[stats["categories"][scored]] = stats["median"][scored]
+        mad[stats["categories"]] = np.maximum(stats["mad"], 1)
+
+        # Category id of each category of the statement (-1 if unknown)
+        ids = np.array([self._category_ids.get(c, -1) for c in statement.categories],
+                       dtype=np.int64)
+        median, mad = np.append(median, np.nan), np.append(mad, 1)
+        rows = ids[statement.category_codes]
+        cents = np.rint(statement.amount * 100)
+        return 0.6745 * (cents - median[rows]) / mad[rows]
+
+    def anomalies(self, statement, threshold=3.5, min_count=10,
+                  include_recurring=False):
+        """
+        Returns a boolean mask of the anomalous transactions of a statement:
+        robust z-score (see anomaly_scores) above threshold in absolute value.
+        Recurring payments (e.g. a rent well above the other costs of its
+        category) are not flagged unless include_recurring=True.
+        """
+
+        scores = self.anomaly_scores(statement, min_count)
+        flagged = np.abs(np.nan_to_num(scores)) > threshold
+        if not include_recurring:
+            flagged &= ~self.is_recurring(statement)
+        return flagged
+
+    def to_arrays(self):
+        """
+        Returns the history as a dict of plain NumPy arrays (no Python
+        objects), e.g. to be saved with np.savez.
+        """
+
+        return {"tolerance": np.asarray(self.tolerance),
+                "merchants": np.asarray(self.merchants, dtype=str),
+                "categories": np.asarray(self.categories, dtype=str),
+                "group_keys": self.group_keys, "group_count": self.group_count,
+                "group_first": self.group_first, "group_last": self.group_last,
+                "group_amount": self.group_amount,
+                "gap_keys": self.gap_keys, "gap_counts": self.gap_counts,
+                "amount_keys": self.amount_keys, "amount_counts": self.amount_counts}
+
+    @classmethod
+    def from_arrays(cls, cols):
+        """Inverse of to_arrays."""
+        detector = cls(float(cols["tolerance"]))
+        detector.merchants = cols["merchants"].tolist()
+        detector.categories = cols["categories"].tolist()
+        detector._merchant_ids = {m: i for i, m in enumerate(detector.merchants)}
+        detector._category_ids = {c: i for i, c in enumerate(detector.categories)}
+        for name in ("group_keys", "group_count", "group_first", "group_last",
+                     "group_amount", "gap_keys", "gap_counts", "amount_keys",
+                     "amount_counts"):
+            setattr(detector, name, cols[name])
+        return detector
+
+    def save(self, path):
+        """
+        Saves the history into a .npz file (written atomically).
+        """
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **self.to_arrays())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a history saved with save.
+        """
+
+        with np.load(path, allow_pickle=False) as npz:
+            return cls.from_arrays({name: npz[name] for name in npz.files})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Detect recurring payments and anomalous transactions.")
+    parser.add_argument("csv", nargs="+", help="csv bank statements, oldest first")
+    parser.add_argument("--state", default=None,
+                        help="history to update (e.g. {})".format(DEFAULT_STATE))
+    parser.add_argument("--threshold", type=float, default=3.5,
+                        help="robust z-score above which a transaction is anomalous")
+    args = parser.parse_args(argv)
+
+    if args.state and os.path.exists(args.state):
+        detector = PatternDetector.load(args.state)
+    else:
+        detector = PatternDetector()
+    statements = [Statement.from_csv(p) for p in args.csv]
+    for st in statements:
+        detector.update(st)
+    if args.state:
+        detector.save(args.state)
+
+    rec = detector.recurring()
+    print("{} recurring payments:".format(len(rec["merchant"])))
+    for i in range(len(rec["merchant"])):
+        print("  {:<30} {:>10.2f}  {:<11} next {}".format(
+            rec["merchant"][i], rec["amount"][i], rec["period"][i], rec["next"][i]))
+    for path, st in zip(args.csv, statements):
+        for i in np.flatnonzero(detector.anomalies(st, args.threshold)):
+            print("anomaly in {}: {} {} {:.2f} ({})".format(
+                os.path.basename(path), st.dates[i], st.merchant[i],
+                st.amount[i], st.category[i]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Query API over a transaction history. A TransactionIndex keeps the statement
+sorted by date together with per-category and per-merchant postings (the
+sorted row ids of each code), so that a query
+
+    index.query().between("2021-01-01", "2021-03-31") \\
+         .categories(["Groceries", "Coffee"]).merchant("countdown") \\
+         .amount(-100, 0).group_by("month")
+
+binary-searches the date range, reads only the postings of the requested
+categories/merchants within it (starting from the most selective one) and
+filters the remaining predicates on those candidate rows, without scanning
+the whole history.
+"""
+
+import numpy as np
+from monex_statement import NAT_ORDINAL
+
+# Keys of group_by
+GROUPS = ("day", "week", "month", "category", "merchant")
+
+
+def _postings(codes, n_codes):
+    # Row ids grouped by code (ascending within each code), CSR style
+    rows = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[rows], np.arange(n_codes + 1))
+    dtype = np.int32 if len(codes) < np.iinfo(np.int32).max else np.int64
+    return rows.astype(dtype), bounds
+
+
+class TransactionIndex:
+    """
+    Statement sorted by date with category and merchant postings:
+        statement: rows sorted by date (unparseable dates last)
+        category_rows[category_bounds[c]:category_bounds[c + 1]]: sorted row
+            ids of category code c (merchant_rows/merchant_bounds likewise)
+    """
+
+    def __init__(self, statement):
+        """
+        Constructor of TransactionIndex.
+
+        Parameters:
+        ----------
+        statement: monex_statement.Statement
+                   Transaction history to be indexed (copied sorted by date).
+        """
+
+        # Sorting by date, with unparseable dates (NAT_ORDINAL) at the end
+        key = statement.ordinals.astype(np.int64)
+        key[statement.ordinals == NAT_ORDINAL] = np.iinfo(np.int64).max
+        self.statement = statement.take(np.argsort(key, kind="stable"))
+        self._n_valid = int(np.count_nonzero(key != np.iinfo(np.int64).max))
+
+        st = self.statement
+        self.category_rows, self.category_bounds = _postings(
+            st.category_codes, len(st.categories))
+        self.merchant_rows, self.merchant_bounds = _postings(
+            st.merchant_codes, len(st.merchants))
+
+    def __len__(self):
+        return len(self.statement)
+
+    def query(self):
+        """Returns a Query selecting every transaction."""
+        return Query(self)
+
+    def date_range(self, start=None, end=None):
+        """
+        Returns the [lo, hi) row range of the transactions from start to end
+        (both included, None for no bound). Without any bound the range is
+        every row, unparseable dates included.
+        """
+
+        if start is None and end is None:
+            return 0, len(self)
+
+        # Searching with the dtype of the column (a mismatch would make
+        # searchsorted cast the whole column)
+        ordinals = self.statement.ordinals[:self._n_valid]
+        dtype = ordinals.dtype.type
+        lo = 0 if start is None else np.searchsorted(
+            ordinals, dtype(np.datetime64(start, "D").astype(np.int64)), side="left")
+        hi = self._n_valid if end is None else np.searchsorted(
+            ordinals, dtype(np.datetime64(end, "D").astype(np.int64)), side="right")
+        return int(lo), int(hi)
+
+
+class Query:
+    """
+    Filters (combined with AND) and aggregations over a TransactionIndex.
+    Filter methods return the query itself so they can be chained.
+    """
+
+    def __init__(self, index):
+        """
+        Constructor of Query (no filters: selects every transaction).
+        """
+
+        self.index = index
+        self._start = self._end = None
+        self._category_codes = None
+        self._merchant_codes = None
+        self._min_amount = self._max_amount = None
+
+    def between(self, start=None, end=None):
+        """
+        Keeps the transactions from start to end (both included, None for no
+        bound). Transactions with an unparseable date are only selected by
+        queries without a date bound.
+        """
+        self._start, self._end = start, end
+        return self
+
+    def categories(self, names):
+        """Keeps the transactions of any of the given categories."""
+        wanted = np.isin(self.index.statement.categories, list(names))
+        codes = np.flatnonzero(wanted)
+        self._category_codes = (codes if self._category_codes is None
+                                else np.intersect1d(self._category_codes, codes))
+        return self
+
+    def merchant(self, substring, case=False):
+        """
+        Keeps the transactions whose merchant contains substring (case
+        insensitive unless case=True).
+        """
+
+        merchants = self.index.statement.merchants
+        if not case:
+            substring = substring.lower()
+            merchants = [m.lower() for m in merchants]
+        codes = np.array([i for i, m in enumerate(merchants) if substring in m],
+                         dtype=np.int64)
+        self._merchant_codes = (codes if self._merchant_codes is None
+                                else np.intersect1d(self._merchant_codes, codes))
+        return self
+
+    def amount(self, low=None, high=None):
+        """Keeps the transactions with low <= amount <= high."""
+        self._min_amount, self._max_amount = low, high
+        return self
+
+    def _posting_rows(self, rows, bounds, codes, lo, hi):
+        # Row ids of the given codes within [lo, hi), from their postings
+        pieces = []
+        for c in codes:
+            posting = rows[bounds[c]:bounds[c + 1]]
+            a, b = np.searchsorted(posting, np.array([lo, hi], dtype=rows.dtype))
+            pieces.append(posting[a:b])
+        if not pieces:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(pieces))
+
+    def _count(self, rows, bounds, codes, lo, hi):
+        # Number of rows of the given codes within [lo, hi)
+        total = 0
+        for c in codes:
+            posting = rows[bounds[c]:bounds[c + 1]]
+            a, b = np.searchsorted(posting, np.array([lo, hi], dtype=rows.dtype))
+            total += b - a
+        return total
+
+    def rows(self):
+        """
+        Returns the (sorted) row ids into index.statement of the selected
+        transactions.
+        """
+
+        idx, st = self.index, self.index.statement
+        lo, hi = idx.date_range(self._start, self._end)
+
+        # Candidate rows from the most selective of the date range and the
+        # category/merchant postings
+        drivers = [(hi - lo, None)]
+        if self._category_codes is not None:
+            drivers.append((self._count(idx.category_rows, idx.category_bounds,
+                                        self._category_codes, lo, hi), "category"))
+        if self._merchant_codes is not None:
+            drivers.append((self._count(idx.merchant_rows, idx.merchant_bounds,
+                                        self._merchant_codes, lo, hi), "merchant"))
+        driver = min(drivers, key=lambda d: d[0])[1]
+
+        if driver == "category":
+            rows = self._posting_rows(idx.category_rows, idx.category_bounds,
+                                      self._category_codes, lo, hi)
+        elif driver == "merchant":
+            rows = self._posting_rows(idx.merchant_rows, idx.merchant_bounds,
+                                      self._merchant_codes, lo, hi)
+        else:
+            rows = np.arange(lo, hi)
+
+        # Filtering the other predicates on the candidates only
+        keep = np.ones(len(rows), dtype=bool)
+        if self._category_codes is not None and driver != "category":
+            wanted = np.zeros(len(st.categories), dtype=bool)
+            wanted[self._category_codes] = True
+            keep &= wanted[st.category_codes[rows]]
+        if self._merchant_codes is not None and driver != "merchant":
+            wanted = np.zeros(len(st.merchants), dtype=bool)
+            wanted[self._merchant_codes] = True
+            keep &= wanted[st.merchant_codes[rows]]
+        if self._min_amount is not None or self._max_amount is not None:
+            amount = st.amount[rows]
+            if self._min_amount is not None:
+                keep &= (amount >= self._min_amount)
+            if self._max_amount is not None:
+                keep &= (amount <= self._max_amount)
+        return rows[keep]
+
+    def statement(self):
+        """Returns the selected transactions as a Statement (sorted by date)."""
+        return self.index.statement.take(self.rows())
+
+    def total(self):
+        """Returns the total amount of the selected transactions."""
+        return float(self.index.statement.amount[self.rows()].sum())
+
+    def group_by(self, by):
+        """
+        Aggregates the selected transactions per group.
+
+        Parameters:
+        ----------
+        by: str
+            One of GROUPS: "day", "week" (starting on Monday), "month",
+            "category" or "merchant".
+
+        Returns:
+        -------
+        keys: (1-d) array-like
+              Key of each group: datetime64[D] first day of the day/week,
+              datetime64[M] month (NaT for unparseable dates), or
+              category/merchant name (sorted).
+        totals: (1-d) array-like
+                Sum of the amounts of each group.
+        counts: (1-d) array-like
+                Number of transactions of each group.
+        fees: (1-d) array-like
+              Sum of the fees of each group.
+        """
+
+        if by not in GROUPS:
+            raise ValueError("group_by expects one of {}, got {!r}".format(GROUPS, by))
+
+        rows = self.rows()
+        st = self.index.statement
+        ordinals = st.ordinals[rows].astype(np.int64)
+        if by == "day":
+            group = ordinals
+        elif by == "week":
+            # 1970-01-05 (ordinal 4) was a Monday
+            group = ordinals - (ordinals - 4) % 7
+        elif by == "month":
+            group = ordinals.view("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        elif by == "category":
+            group = st.category_codes[rows]
+        else:
+            group = st.merchant_codes[rows]
+        if by in ("day", "week", "month"):
+            # Unparseable dates in a NaT group (sorted first)
+            group[st.ordinals[rows] == NAT_ORDINAL] = np.iinfo(np.int64).min
+
+        uniq, inverse = np.unique(group, return_inverse=True)
+        totals = np.bincount(inverse, weights=st.amount[rows], minlength=len(uniq))
+        counts = np.bincount(inverse, minlength=len(uniq))
+        fees = np.bincount(inverse, weights=st.fees[rows], minlength=len(uniq))
+
+        if by in ("day", "week"):
+            keys = uniq.view("datetime64[D]")
+        elif by == "month":
+            keys = uniq.view("datetime64[M]")
+        else:
+            names = st.categories if by == "category" else st.merchants
+            keys = names[uniq]
+            order = np.argsort(keys)
+            keys, totals, counts, fees = keys[order], totals[order], counts[order], fees[order]
+        return keys, totals, counts, fees
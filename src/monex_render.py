@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Headless (Agg) rendering of the report figures with reuse and caching:
+    - figures and axes are created once per kind of plot and cleared between
+      renders instead of building a new figure each time (FigurePool)
+    - saved images are cached, keyed by a hash of the data drawn, the plot
+      settings and the matplotlib style (RenderCache), so re-rendering a report
+      whose data has not changed just copies the cached file; the least
+      recently used images are evicted once the cache exceeds max_bytes
+
+Pass a Renderer to MonthlyExpenses_Analytics(..., renderer=Renderer()) or
+RangeExpenses_Analytics(..., renderer=Renderer()) to use it for the saved
+figures (plot methods called with savefig=True).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from monex_cache import DEFAULT_CACHE_DIR, _remove
+
+DEFAULT_RENDER_DIR = os.path.join(DEFAULT_CACHE_DIR, "renders")
+DEFAULT_RENDER_MAX_BYTES = 64 * 1024**2
+
+# Bumped whenever the drawing code changes the images it produces
+RENDER_VERSION = 2
+
+
+def render_key(kind, style, data):
+    """
+    Returns the hex SHA-1 digest identifying a rendered figure.
+
+    Parameters:
+    ----------
+    kind: str
+          Kind of plot (e.g. "pie_chart").
+    style: dict
+           Settings that change the image (format, dpi, matplotlib rcParams).
+    data: dict
+          Everything the figure is drawn from (arrays, labels, titles).
+
+    Returns:
+    -------
+    key: str
+    """
+
+    h = hashlib.sha1("{}|{}|{}".format(RENDER_VERSION, kind, json.dumps(
+        style, sort_keys=True, default=repr)).encode())
+    for name in sorted(data):
+        value = np.asarray(data[name])
+        h.update(name.encode())
+        if value.dtype == object:
+            h.update(repr(value.tolist()).encode())
+        else:
+            h.update("{}{}".format(value.dtype.str, value.shape).encode())
+            h.update(np.ascontiguousarray(value).tobytes())
+    return h.hexdigest()
+
+
+class RenderCache:
+    """
+    Folder of rendered images named after their render_key, with
+    least-recently-used eviction once their total size exceeds max_bytes (as
+    monex_cache.StatementCache).
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_RENDER_MAX_BYTES):
+        """
+        Constructor of RenderCache.
+
+        Parameters:
+        ----------
+        cache_dir: (optional) str
+                   Folder of the cached images. Defaults to DEFAULT_RENDER_DIR.
+        max_bytes: (optional) int
+                   Maximum total size of the images before the least recently
+                   used ones are evicted.
+        """
+
+        self.cache_dir = cache_dir or DEFAULT_RENDER_DIR
+        self.max_bytes = max_bytes
+
+    def _entry(self, key, fmt):
+        return os.path.join(self.cache_dir, "{}.{}".format(key, fmt))
+
+    def get(self, key, fmt, path):
+        """
+        Copies a cached image to path. Returns False if it is not cached. A
+        successful copy marks the image as recently used.
+        """
+
+        entry = self._entry(key, fmt)
+        try:
+            shutil.copyfile(entry, path)
+        except OSError:
+            return False
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            # Evicted by another renderer since it was copied
+            pass
+        return True
+
+    def put(self, key, fmt, path):
+        """
+        Adds the image saved at path to the cache (atomically, so concurrent
+        renderers never see a partial image) and evicts the least recently
+        used images if the cache grew beyond max_bytes.
+        """
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, self._entry(key, fmt))
+        self.evict()
+
+    def entries(self):
+        """
+        Returns a list of (last use, size, path) of the cached images, least
+        recently used first.
+        """
+
+        if not os.path.isdir(self.cache_dir):
+            return []
+        out = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".tmp"):
+                entry = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(entry)
+                except FileNotFoundError:
+                    continue
+                out.append((st.st_mtime_ns, st.st_size, entry))
+        return sorted(out)
+
+    def evict(self):
+        """Deletes least recently used images until the cache fits max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            _remove(entry)
+            total -= size
+
+    def clear(self):
+        """Removes every cached image."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+class FigurePool:
+    """
+    Figures (and their axes) kept alive between renders, one per kind of plot.
+    """
+
+    def __init__(self):
+        """
+        Constructor of FigurePool (empty).
+        """
+
+        self._figures = {}
+
+    def get(self, kind, nrows=1, ncols=1, **subplots_kw):
+        """
+        Returns the (figure, flattened axes) of a kind of plot, creating them
+        on first use and clearing them otherwise.
+
+        Parameters:
+        ----------
+        kind: str
+              Kind of plot; each kind keeps its own figure.
+        nrows, ncols: (optional) int
+                      Grid of axes of the figure.
+        subplots_kw: keyword arguments of matplotlib.pyplot.subplots (e.g.
+                     figsize, sharex), only used when the figure is created.
+        """
+
+        if kind not in self._figures:
+            from matplotlib.figure import Figure
+
+            # Figures not managed by pyplot are never shown and never leak
+            fig = Figure(figsize=subplots_kw.pop("figsize", None))
+            axes = np.atleast_1d(fig.subplots(nrows, ncols, **subplots_kw))
+            self._figures[kind] = (fig, axes.flatten())
+        fig, axes = self._figures[kind]
+
+        for ax in axes:
+            ax.clear()
+        for legend in list(fig.legends):
+            legend.remove()
+        fig.suptitle("")
+        return fig, axes
+
+
+class Renderer:
+    """
+    Renders figures headless with a FigurePool and caches the saved images
+    in a RenderCache.
+    """
+
+    def __init__(self, cache=None, fmt="png", dpi=200, use_cache=True):
+        """
+        Constructor of Renderer.
+
+        Parameters:
+        ----------
+        cache: (optional) RenderCache
+               Cache of rendered images. Defaults to RenderCache().
+        fmt: (optional) str
+             Image format: "png" or "svg".
+        dpi: (optional) int
+             Resolution of the images.
+        use_cache: (optional) boolean
+                   If False, every figure is drawn (and still cached).
+        """
+
+        self.cache = cache or RenderCache()
+        self.fmt = fmt
+        self.dpi = dpi
+        self.use_cache = use_cache
+        self.pool = FigurePool()
+        self.n_renders = 0
+        self.n_hits = 0
+
+    def style(self):
+        """Settings (format, dpi and matplotlib rcParams) of the images."""
+        import matplotlib
+        return {"fmt": self.fmt, "dpi": self.dpi,
+                "matplotlib": matplotlib.__version__,
+                "rc": {k: repr(v) for k, v in matplotlib.rcParams.items()}}
+
+    def render(self, kind, path, draw, layout=None, **data):
+        """
+        Saves a figure to path, from the cache if the same data was already
+        rendered with the same style.
+
+        Parameters:
+        ----------
+        kind: str
+              Kind of plot (e.g. "pie_chart").
+        path: str
+              Where the image is saved.
+        draw: callable
+              draw(fig, axes, **data) draws the figure on the (cleared) pooled
+              figure and axes.
+        layout: (optional) dict
+                Keyword arguments of FigurePool.get (nrows, ncols, figsize...).
+        data: keyword arguments
+              Everything the figure is drawn from, passed on to draw.
+
+        Returns:
+        -------
+        cached: boolean
+                True if the image was served from the cache.
+        """
+
+        layout = layout or {}
+        key = render_key(kind, dict(self.style(), layout=layout), data)
+        if self.use_cache and self.cache.get(key, self.fmt, path):
+            self.n_hits += 1
+            return True
+
+        fig, axes = self.pool.get(kind, **dict(layout))
+        draw(fig, axes, **data)
+        fig.savefig(path, format=self.fmt, dpi=self.dpi, pad_inches=0.1,
+                    bbox_inches='tight')
+        self.n_renders += 1
+        self.cache.put(key, self.fmt, path)
+        return False
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling (windowed) spending statistics over the daily (category x date)
+matrix, for all categories at once: rolling sums, means, transaction counts and
+percentiles of the daily spending over e.g. the last 7, 30 and 90 days.
+
+Sums, means and counts come from the difference of two cumulative sums, i.e.
+O(1) per day and window whatever the window length. Percentiles sort each
+window (vectorized over categories and days, in blocks to bound the memory).
+Like pandas' rolling with min_periods=window, days before the first full
+window are NaN.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_WINDOWS = (7, 30, 90)
+
+# Maximum number of values sorted at once by rolling_percentile
+BLOCK_SIZE = 4 * 1024**2
+
+
+def rolling_sum(daily, window):
+    """
+    Rolling sum along the day axis.
+
+    Parameters:
+    ----------
+    daily: (N-d) array-like
+           Daily values, shape (n_cat x n_days).
+    window: int
+            Number of days of the window (ending on each day, included).
+
+    Returns:
+    -------
+    sums: (N-d) array-like
+          Sum of the last window days, shape (n_cat x n_days). NaN for the
+          days before the first full window.
+    """
+
+    daily = np.asarray(daily, dtype=float)
+    n_days = daily.shape[1]
+    sums = np.full(daily.shape, np.nan)
+    if window > n_days:
+        return sums
+
+    # Each window sum is the difference of two running sums
+    csum = np.cumsum(daily, axis=1)
+    sums[:, window - 1] = csum[:, window - 1]
+    sums[:, window:] = csum[:, window:] - csum[:, :-window]
+    return sums
+
+
+def rolling_percentile(daily, window, q):
+    """
+    Rolling percentiles (linear interpolation, as np.percentile) along the day
+    axis.
+
+    Parameters:
+    ----------
+    daily: (N-d) array-like
+           Daily values, shape (n_cat x n_days).
+    window: int
+            Number of days of the window.
+    q: float or (1-d) array-like
+       Percentile(s) in [0, 100].
+
+    Returns:
+    -------
+    percentiles: (N-d) array-like
+                 Shape (n_cat x n_days), or (len(q) x n_cat x n_days) if q is
+                 an array. NaN for the days before the first full window.
+    """
+
+    daily = np.asarray(daily, dtype=float)
+    n_cat, n_days = daily.shape
+    qs = np.atleast_1d(np.asarray(q, dtype=float))
+    out = np.full((len(qs), n_cat, n_days), np.nan)
+
+    if window <= n_days:
+        # Ranks to interpolate between in each sorted window
+        pos = qs / 100 * (window - 1)
+        lo = np.floor(pos).astype(int)
+        hi = np.minimum(lo + 1, window - 1)
+        frac = (pos - lo)[:, None, None]
+
+        windows = sliding_window_view(daily, window, axis=1)
+        step = max(BLOCK_SIZE // max(n_cat * window, 1), 1)
+        for b in range(0, windows.shape[1], step):
+            block = np.sort(windows[:, b:b + step], axis=-1)
+            lo_v = np.moveaxis(block[..., lo], -1, 0)
+            hi_v = np.moveaxis(block[..., hi], -1, 0)
+            out[:, :, window - 1 + b:window - 1 + b + block.shape[1]] = (
+                lo_v + (hi_v - lo_v) * frac)
+
+    return out if np.ndim(q) else out[0]
+
+
+class RollingStats:
+    """
+    Rolling statistics of the daily spending of every category:
+        daily: (n_cat x n_days) spending of each category on each day
+        counts: (n_cat x n_days) number of transactions on each day
+        dates: datetime64[D] date of each column
+        categories: label of each row
+    """
+
+    def __init__(self, daily, dates, categories, counts=None):
+        """
+        Constructor of RollingStats.
+
+        Parameters:
+        ----------
+        daily: (N-d) array-like
+               Daily values, shape (n_cat x n_days).
+        dates: (1-d) array-like
+               Consecutive days of the columns (datetime64[D]).
+        categories: (1-d) array-like
+                    Label of each row.
+        counts: (optional) (N-d) array-like
+                Number of transactions of each cell, same shape as daily.
+        """
+
+        self.daily = np.asarray(daily, dtype=float)
+        self.dates = np.asarray(dates, dtype="datetime64[D]")
+        self.categories = np.asarray(categories, dtype=object)
+        self.counts = counts
+
+    @classmethod
+    def from_aggregates(cls, agg, income=False):
+        """
+        Rolling statistics of the spending (costs as positive amounts, like
+        multi_costs) or of the income of monex_stream.StatementAggregates.
+
+        Parameters:
+        ----------
+        agg: monex_stream.StatementAggregates
+        income: (optional) boolean
+                If True, the statistics are of the income entries instead.
+        """
+
+        rows = (agg.categories == "Income")
+        if not income:
+            rows = ~rows
+        return cls(agg.sums[rows] * -1, agg.dates, agg.categories[rows],
+                   counts=agg.counts[rows])
+
+    def sum(self, window):
+        """Total spending over the last window days, (n_cat x n_days)."""
+        return rolling_sum(self.daily, window)
+
+    def mean(self, window):
+        """Mean daily spending over the last window days, (n_cat x n_days)."""
+        return rolling_sum(self.daily, window) / window
+
+    def count(self, window):
+        """Number of transactions over the last window days, (n_cat x n_days)."""
+        if self.counts is None:
+            raise ValueError("RollingStats built without transaction counts")
+        return rolling_sum(self.counts, window)
+
+    def percentile(self, window, q):
+        """
+        Percentile(s) q of the daily spending over the last window days (see
+        rolling_percentile).
+        """
+
+        return rolling_percentile(self.daily, window, q)
+
+    def table(self, windows=DEFAULT_WINDOWS, percentiles=(50, 90)):
+        """
+        Returns every statistic for every window.
+
+        Parameters:
+        ----------
+        windows: (optional) tuple of int
+                 Window lengths in days.
+        percentiles: (optional) tuple of float
+                     Percentiles of the daily spending.
+
+        Returns:
+        -------
+        stats: dict
+               (n_cat x n_days) arrays named "sum_7", "mean_7", "count_7",
+               "p50_7", ... for each window.
+        """
+
+        stats = {}
+        for window in windows:
+            stats["sum_{}".format(window)] = self.sum(window)
+            stats["mean_{}".format(window)] = stats["sum_{}".format(window)] / window
+            if self.counts is not None:
+                stats["count_{}".format(window)] = self.count(window)
+            if len(percentiles):
+                values = self.percentile(window, list(percentiles))
+                for q, v in zip(percentiles, values):
+                    stats["p{:g}_{}".format(q, window)] = v
+        return stats
@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""
+Parsed-once representation of a csv bank statement. The columns of the
+statement are kept as typed NumPy arrays so that all the analytics methods can
+share a single parse of the file.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from monex_instrument import span
+
+# Columns read from the csv bank statement (Transferwise format, see README)
+COLUMNS = ["Date", "Amount", "Merchant", "Total fees", "Category"]
+
+
+def is_statement_column(name):
+    """
+    usecols filter for pd.read_csv: keeps the COLUMNS present in the file, so
+    statements without a "Category" column (to be labelled with
+    monex_classify) can be read too.
+    """
+
+    return name in COLUMNS
+
+
+def file_stamp(path):
+    """
+    Returns the (modification time, size) pair used to detect when a statement
+    file has changed on disk.
+
+    Parameters:
+    ----------
+    path: str
+          Path to the csv bank statement.
+
+    Returns:
+    -------
+    stamp: tuple
+           (mtime in nanoseconds, size in bytes) of the file.
+    """
+
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+# Day ordinal (days since 1970-01-01) used for unparseable dates
+NAT_ORDINAL = np.iinfo(np.int32).min
+
+
+def code_dtype(n_values):
+    """
+    Returns the smallest signed integer dtype (int16 or int32) able to hold
+    codes into a dictionary of n_values strings.
+    """
+
+    return np.int16 if n_values <= np.iinfo(np.int16).max else np.int32
+
+
+def intern_dictionary(values):
+    """
+    Returns an object array of the (interned) strings of a dictionary.
+    """
+
+    return np.array([sys.intern(str(v)) for v in values], dtype=object)
+
+
+def to_ordinals(dates):
+    """
+    Converts datetime64 dates into int32 day ordinals (NaT -> NAT_ORDINAL).
+    """
+
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    ordinals = dates.view(np.int64).astype(np.int32)
+    ordinals[np.isnat(dates)] = NAT_ORDINAL
+    return ordinals
+
+
+class Statement:
+    """
+    Compact, typed table of the transactions of a bank statement:
+        ordinals: int32 day ordinal (days since 1970-01-01) of each transaction
+        amount: float64 magnitude of each transaction
+        fees: float64 fees charged by the bank for each transaction
+        category_codes: int16 code of the category of each transaction, which
+                        indexes into categories (ordered by first appearance)
+        merchant_codes: int16 code of the source of each transaction, which
+                        indexes into merchants ("" when the card could not
+                        track it)
+    and, when the export has them (None otherwise):
+        currency_codes: int16 code of the currency of each transaction, which
+                        indexes into currencies (see monex_fx)
+        account_codes: int16 code of the account of each transaction, which
+                       indexes into accounts
+    The dictionaries hold interned strings, so a row takes 24 bytes (28 with
+    currencies and accounts). Dates, merchant, category, currency and account
+    strings are available as properties.
+    """
+
+    # Number of csv files parsed so far (all instances). Useful to check that
+    # a report does not parse the same statement more than once.
+    n_parses = 0
+
+    __slots__ = ("ordinals", "amount", "fees", "category_codes", "categories",
+                 "merchant_codes", "merchants", "path", "stamp", "currency_codes",
+                 "currencies", "account_codes", "accounts")
+
+    def __init__(self, ordinals, amount, fees, category_codes, categories,
+                 merchant_codes, merchants, path=None, stamp=None,
+                 currency_codes=None, currencies=None, account_codes=None,
+                 accounts=None):
+        """
+        Constructor of Statement. Use Statement.from_csv to read a csv file or
+        Statement.from_columns to build one from plain columns.
+        """
+
+        self.ordinals = ordinals
+        self.amount = amount
+        self.fees = fees
+        self.category_codes = category_codes
+        self.categories = categories
+        self.merchant_codes = merchant_codes
+        self.merchants = merchants
+        self.path = path
+        self.stamp = stamp
+        self.currency_codes = currency_codes
+        self.currencies = currencies
+        self.account_codes = account_codes
+        self.accounts = accounts
+
+    @classmethod
+    def from_csv(cls, path, bank=None):
+        """
+        Reads and parses a csv bank statement.
+
+        Parameters:
+        ----------
+        path: str
+              Path to the csv bank statement.
+        bank: (optional) str or monex_banks.BankFormat
+              Format of the statement. Detected from its header by default
+              (see monex_banks).
+
+        Returns:
+        -------
+        statement: Statement
+                   Parsed statement with typed columns.
+        """
+
+        from monex_banks import read_statement
+        return read_statement(path, bank)
+
+    @classmethod
+    def from_csv_bytes(cls, data, path=None, stamp=None, bank=None):
+        """
+        Parses the contents of a csv bank statement already read into memory
+        (e.g. fetched from network storage).
+
+        Parameters:
+        ----------
+        data: bytes
+              Contents of the csv bank statement.
+        path, stamp: (optional)
+                     Source file and its file_stamp taken before reading, so
+                     the statement can tell when it becomes stale.
+        bank: (optional) str or monex_banks.BankFormat
+              Format of the statement. Detected from its header by default.
+
+        Returns:
+        -------
+        statement: Statement
+                   Parsed statement with typed columns.
+        """
+
+        from monex_banks import read_statement
+        return read_statement(data, bank, path=path, stamp=stamp)
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Builds a statement from a pandas.DataFrame with the csv columns (e.g. a
+        chunk of a csv file read with pd.read_csv(..., chunksize=...)).
+
+        Parameters:
+        ----------
+        df: pandas.DataFrame
+            Contains the columns listed in COLUMNS. A missing "Category"
+            column leaves every transaction unlabelled ("").
+
+        Returns:
+        -------
+        statement: Statement
+                   Statement with typed columns and no source file.
+        """
+
+        with span("parse"):
+            dates = pd.to_datetime(df["Date"], dayfirst=True).to_numpy(
+                dtype="datetime64[D]")
+            amount = pd.to_numeric(df["Amount"], errors="coerce").to_numpy(
+                dtype=np.float64)
+            fees = pd.to_numeric(df["Total fees"], errors="coerce").fillna(0)
+            if "Category" in df:
+                category = df["Category"].fillna("")
+            else:
+                category = np.full(len(df), "", dtype=object)
+            statement = cls.from_columns(dates, amount, df["Merchant"].fillna(""),
+                                         fees.to_numpy(dtype=np.float64), category)
+        return statement
+
+    @classmethod
+    def from_columns(cls, dates, amount, merchant, fees, category, currency=None,
+                     account=None):
+        """
+        Builds a statement from plain columns, factorizing the merchant and
+        category strings.
+
+        Parameters:
+        ----------
+        dates: (1-d) array-like
+               Date of each transaction (convertible to datetime64[D]).
+        amount, fees: (1-d) array-like
+                      Amount and fees of each transaction.
+        merchant, category: (1-d) array-like
+                            Merchant and category string of each transaction
+                            (missing values, e.g. NaN or None, become "").
+        currency, account: (optional) (1-d) array-like
+                           Currency code and account of each transaction.
+
+        Returns:
+        -------
+        statement: Statement
+                   Statement with no source file.
+        """
+
+        def encode(values):
+            # Codes and interned dictionary of a string column (None if absent),
+            # with missing values as "" (as read by the bank adapters)
+            if values is None:
+                return None, None
+            codes, dictionary = pd.factorize(np.asarray(values, dtype=object))
+            if (codes < 0).any():
+                # Missing values (code -1) point to "", appended if absent
+                dictionary = np.asarray(dictionary, dtype=object)
+                blank = np.flatnonzero(dictionary == "")
+                if not len(blank):
+                    dictionary = np.append(dictionary, "")
+                    blank = [len(dictionary) - 1]
+                codes = np.where(codes < 0, blank[0], codes)
+            return codes.astype(code_dtype(len(dictionary))), intern_dictionary(dictionary)
+
+        category_codes, categories = encode(category)
+        merchant_codes, merchants = encode(merchant)
+        currency_codes, currencies = encode(currency)
+        account_codes, accounts = encode(account)
+        return cls(to_ordinals(dates), np.asarray(amount, dtype=np.float64),
+                   np.asarray(fees, dtype=np.float64), category_codes, categories,
+                   merchant_codes, merchants, currency_codes=currency_codes,
+                   currencies=currencies, account_codes=account_codes,
+                   accounts=accounts)
+
+    @staticmethod
+    def _merge_dictionaries(dictionaries, codes):
+        # Merges string dictionaries and remaps the codes into the merged one
+        merged_codes, merged = pd.factorize(np.concatenate(dictionaries),
+                                            use_na_sentinel=False)
+        dtype = code_dtype(len(merged))
+        out, lo = [], 0
+        for dictionary, c in zip(dictionaries, codes):
+            out.append(merged_codes[lo:lo + len(dictionary)].astype(dtype)[c])
+            lo += len(dictionary)
+        return np.concatenate(out), intern_dictionary(merged)
+
+    @classmethod
+    def concat(cls, statements):
+        """
+        Concatenates several statements into a single one (rows are kept in
+        the given order and the string dictionaries are merged).
+
+        Parameters:
+        ----------
+        statements: list of Statement
+
+        Returns:
+        -------
+        statement: Statement
+                   Statement with the rows of all statements and no source file.
+        """
+
+        category_codes, categories = cls._merge_dictionaries(
+            [s.categories for s in statements], [s.category_codes for s in statements])
+        merchant_codes, merchants = cls._merge_dictionaries(
+            [s.merchants for s in statements], [s.merchant_codes for s in statements])
+
+        # Currencies and accounts, if any statement has them ("" for the rows
+        # of those that do not)
+        optional = {}
+        blank = np.array([""], dtype=object)
+        for codes, dictionary in (("currency_codes", "currencies"),
+                                  ("account_codes", "accounts")):
+            if all(getattr(s, dictionary) is None for s in statements):
+                continue
+            optional[codes], optional[dictionary] = cls._merge_dictionaries(
+                [blank if getattr(s, dictionary) is None else getattr(s, dictionary)
+                 for s in statements],
+                [np.zeros(len(s), dtype=np.int16) if getattr(s, codes) is None
+                 else getattr(s, codes) for s in statements])
+        return cls(np.concatenate([s.ordinals for s in statements]),
+                   np.concatenate([s.amount for s in statements]),
+                   np.concatenate([s.fees for s in statements]),
+                   category_codes, categories, merchant_codes, merchants, **optional)
+
+    def to_arrays(self):
+        """
+        Returns the columns as a dict of plain NumPy arrays (no Python
+        objects), e.g. to be saved with np.savez.
+        """
+
+        cols = {"ordinals": self.ordinals, "amount": self.amount,
+                "fees": self.fees, "merchant_codes": self.merchant_codes,
+                "merchants": np.asarray(self.merchants, dtype=str),
+                "category_codes": self.category_codes,
+                "categories": np.asarray(self.categories, dtype=str)}
+        if self.stamp is not None:
+            cols["stamp"] = np.asarray(self.stamp, dtype=np.int64)
+        if self.currencies is not None:
+            cols["currency_codes"] = self.currency_codes
+            cols["currencies"] = np.asarray(self.currencies, dtype=str)
+        if self.accounts is not None:
+            cols["account_codes"] = self.account_codes
+            cols["accounts"] = np.asarray(self.accounts, dtype=str)
+        return cols
+
+    @classmethod
+    def from_arrays(cls, cols, path=None):
+        """Inverse of to_arrays."""
+        stamp = tuple(cols["stamp"].tolist()) if "stamp" in cols else None
+        optional = {}
+        for codes, dictionary in (("currency_codes", "currencies"),
+                                  ("account_codes", "accounts")):
+            if dictionary in cols:
+                optional[codes] = cols[codes]
+                optional[dictionary] = intern_dictionary(cols[dictionary])
+        return cls(cols["ordinals"], cols["amount"], cols["fees"],
+                   cols["category_codes"], intern_dictionary(cols["categories"]),
+                   cols["merchant_codes"], intern_dictionary(cols["merchants"]),
+                   path=path, stamp=stamp, **optional)
+
+    def replace(self, **columns):
+        """
+        Returns a copy of the statement (same source file) with some of its
+        columns replaced, e.g. statement.replace(amount=amount * rates). The
+        other columns, currencies and accounts included, are shared.
+        """
+
+        kwargs = {name: getattr(self, name) for name in self.__slots__}
+        kwargs.update(columns)
+        return Statement(**kwargs)
+
+    def take(self, rows):
+        """
+        Returns a statement with a subset of the rows. A slice gives a
+        zero-copy view of the columns; a boolean mask or integer indices copy
+        the selected rows.
+
+        Parameters:
+        ----------
+        rows: slice or (1-d) array-like
+              Slice, boolean mask or integer indices of the rows to keep.
+
+        Returns:
+        -------
+        statement: Statement
+                   Selected rows (same dictionaries, no source file).
+        """
+
+        return Statement(self.ordinals[rows], self.amount[rows], self.fees[rows],
+                         self.category_codes[rows], self.categories,
+                         self.merchant_codes[rows], self.merchants,
+                         currency_codes=(None if self.currency_codes is None
+                                         else self.currency_codes[rows]),
+                         currencies=self.currencies,
+                         account_codes=(None if self.account_codes is None
+                                        else self.account_codes[rows]),
+                         accounts=self.accounts)
+
+    def sort_by_date(self):
+        """Returns the statement with its rows (stably) sorted by date."""
+        return self.take(np.argsort(self.ordinals, kind="stable"))
+
+    def between(self, start, end):
+        """
+        Returns a zero-copy view of the transactions from start to end (both
+        included). The statement must be sorted by date (see sort_by_date).
+
+        Parameters:
+        ----------
+        start, end: str or datetime64
+                    First and last day of the view.
+        """
+
+        lo = np.searchsorted(self.ordinals, to_ordinals([start])[0], side="left")
+        hi = np.searchsorted(self.ordinals, to_ordinals([end])[0], side="right")
+        return self.take(slice(lo, hi))
+
+    def __len__(self):
+        return len(self.amount)
+
+    @property
+    def nbytes(self):
+        """Memory taken by the columns (excluding the string dictionaries)."""
+        return sum(arr.nbytes for arr in (self.ordinals, self.amount, self.fees,
+                                          self.category_codes, self.merchant_codes,
+                                          self.currency_codes, self.account_codes)
+                   if arr is not None)
+
+    @property
+    def dates(self):
+        """datetime64[D] date of each transaction (NaT if unparseable)."""
+        ordinals = self.ordinals.astype(np.int64)
+        ordinals[self.ordinals == NAT_ORDINAL] = np.iinfo(np.int64).min
+        return ordinals.view("datetime64[D]")
+
+    @property
+    def days(self):
+        """Day of the month (1-31) of each transaction."""
+        dates = self.dates
+        return (dates - dates.astype("datetime64[M]")).astype(int) + 1
+
+    @property
+    def category(self):
+        """Category string of each transaction."""
+        return self.categories[self.category_codes]
+
+    @property
+    def merchant(self):
+        """Merchant string of each transaction."""
+        return self.merchants[self.merchant_codes]
+
+    @property
+    def currency(self):
+        """Currency code of each transaction (None without currencies)."""
+        return None if self.currencies is None else self.currencies[self.currency_codes]
+
+    @property
+    def account(self):
+        """Account of each transaction (None without accounts)."""
+        return None if self.accounts is None else self.accounts[self.account_codes]
+
+    def category_code(self, name):
+        """Code of a category name, or -1 if the statement does not have it."""
+        hits = np.flatnonzero(self.categories == name)
+        return int(hits[0]) if len(hits) else -1
+
+    def is_stale(self):
+        """
+        Returns True if the csv file this statement was read from has been
+        modified (or removed) since it was parsed.
+        """
+
+        if self.path is None:
+            return False
+        try:
+            return file_stamp(self.path) != self.stamp
+        except OSError:
+            return True
+
+    def to_frame(self):
+        """Returns the statement as a pandas.DataFrame with the csv columns."""
+        df = pd.DataFrame({"Date": self.dates, "Amount": self.amount,
+                           "Merchant": self.merchant, "Total fees": self.fees,
+                           "Category": self.category})
+        if self.currencies is not None:
+            df["Currency"] = self.currency
+        if self.accounts is not None:
+            df["Account"] = self.account
+        return df
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed aggregate store. Every statement ingested into the store is folded
+into per-(category, date) sums, counts and fees (see monex_stream), from which
+the per-(month, category) and per-(day, category) figures of the charts are
+read. The store is persisted in a small .npz index file, so the charts of any
+past month can be rendered again without reading its csv.
+
+Statement files that grow (e.g. a daily bank export appending new rows) are
+ingested incrementally: the store remembers how many bytes of each file it has
+already processed and only parses the appended tail. Digests of the header and
+of the bytes right before that offset detect files rewritten in place. Exports
+that append again an overlapping window of rows are deduplicated with the
+transaction keys of monex_merge (date, amount, merchant, fees and occurrence
+number), so a re-appended row is dropped while identical transactions
+appended together (two coffees the same day) are all counted.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from monex_banks import find_format
+from monex_merge import merge_keys
+from monex_statement import file_stamp
+from monex_stream import StatementAggregates
+
+# Bytes hashed right before the processed offset to detect rewritten files
+ANCHOR_SIZE = 256
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _salt(source):
+    # Salt of the transaction keys of a source, so keys never match across files
+    return np.uint64(int.from_bytes(hashlib.sha1(source.encode()).digest()[:8], "little"))
+
+
+class AggregateStore:
+    """
+    Aggregates of every ingested statement, persisted at self.path. For each
+    ingested source the store remembers its file stamp and the number of bytes
+    and rows processed, and row_keys holds the (salted, sorted) transaction
+    keys of the rows ingested from files, so that no transaction is counted
+    twice.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor of AggregateStore. Loads the index file if it exists.
+
+        Parameters:
+        ----------
+        path: str
+              Path to the .npz index file of the store.
+        """
+
+        self.path = path
+        self.aggregates = StatementAggregates()
+        self.sources = {}
+        self.row_keys = np.array([], dtype=np.uint64)
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as npz:
+                cols = {name: npz[name] for name in npz.files}
+            self.sources = json.loads(str(cols.pop("sources")))
+            # Keys of older stores (without occurrence numbers) are not reused
+            cols.pop("row_keys", None)
+            self.row_keys = cols.pop("merge_keys", self.row_keys)
+            self.aggregates = StatementAggregates.from_arrays(cols)
+
+    def ingest(self, statement, key=None, classifier=None):
+        """
+        Folds a statement into the store (an incremental update of the
+        aggregates, not a rebuild) and saves the index file.
+
+        Parameters:
+        ----------
+        statement: monex_statement.Statement
+                   Statement to be added.
+        key: (optional) str
+             Name of the source, by default the absolute path of the csv file
+             (required for a statement without a path).
+        classifier: (optional) monex_classify.MerchantClassifier
+                    Labels the transactions with no category from their
+                    merchant before they are aggregated.
+
+        Returns:
+        -------
+        ingested: bool
+                  False if this source had already been ingested unchanged.
+        """
+
+        if key is None:
+            if statement.path is None:
+                raise ValueError("A statement without a path needs a key")
+            key = os.path.abspath(statement.path)
+        stamp = None if statement.stamp is None else list(statement.stamp)
+        if key in self.sources:
+            if self.sources[key]["stamp"] == stamp:
+                return False
+            raise ValueError(
+                "{} changed since it was ingested; rebuild the store".format(key))
+
+        if classifier is not None:
+            statement = classifier.classify(statement)
+        self.aggregates.update(statement)
+        self.sources[key] = {"stamp": stamp, "offset": None,
+                             "rows": len(statement)}
+        self.save()
+        return True
+
+    def ingest_file(self, path, bank=None, classifier=None):
+        """
+        Brings the store up to date with a csv statement, parsing only the rows
+        appended since it was last ingested. An incomplete last line (no
+        trailing newline yet) is left for the next call.
+
+        Parameters:
+        ----------
+        path: str
+              Path to the csv bank statement.
+        bank: (optional) str or monex_banks.BankFormat
+              Format of the statement. Detected from its header by default.
+        classifier: (optional) monex_classify.MerchantClassifier
+                    Labels the new transactions with no category from their
+                    merchant before they are aggregated.
+
+        Returns:
+        -------
+        n_new: int
+               Number of new transactions folded into the store.
+        """
+
+        key = os.path.abspath(path)
+        stamp = list(file_stamp(path))
+        source = self.sources.get(key)
+        if source is not None and source["stamp"] == stamp:
+            return 0
+
+        # Lines up to the header (account details of some exports included)
+        fmt, skiprows = find_format(path, bank)
+        with open(path, "rb") as f:
+            header = b"".join(f.readline() for _ in range(skiprows + 1))
+            offset = len(header)
+            if source is not None:
+                if source["offset"] is None:
+                    raise ValueError(
+                        "{} was not ingested from file; rebuild the store".format(key))
+                offset = source["offset"]
+                f.seek(max(offset - ANCHOR_SIZE, 0))
+                anchor = f.read(min(offset, ANCHOR_SIZE))
+                if (_digest(header) != source["header"]
+                        or _digest(anchor) != source["anchor"]):
+                    raise ValueError(
+                        "{} was rewritten since it was ingested; rebuild the store".format(key))
+            f.seek(offset)
+            tail = f.read()
+
+        # Only consuming complete lines
+        tail = tail[:tail.rfind(b"\n") + 1]
+        new_offset = offset + len(tail)
+        n_new = 0
+        if tail.strip():
+            statement = fmt.read(header + tail, skiprows)
+
+            # Dropping the rows already ingested from this file
+            keys = merge_keys(statement) ^ _salt(key)
+            pos = np.minimum(np.searchsorted(self.row_keys, keys),
+                             max(len(self.row_keys) - 1, 0))
+            seen = (self.row_keys[pos] == keys) if len(self.row_keys) else \
+                np.zeros(len(keys), dtype=bool)
+            statement = statement.take(~seen)
+            keys = np.sort(keys[~seen])
+            self.row_keys = np.insert(self.row_keys,
+                                      np.searchsorted(self.row_keys, keys), keys)
+            n_new = len(statement)
+            if classifier is not None:
+                statement = classifier.classify(statement)
+            self.aggregates.update(statement)
+
+        with open(path, "rb") as f:
+            f.seek(max(new_offset - ANCHOR_SIZE, 0))
+            anchor = f.read(min(new_offset, ANCHOR_SIZE))
+        self.sources[key] = {
+            "stamp": stamp, "offset": new_offset,
+            "rows": (0 if source is None else source["rows"]) + n_new,
+            "header": _digest(header), "anchor": _digest(anchor)}
+        self.save()
+        return n_new
+
+    def save(self):
+        """Writes the index file (atomically)."""
+        cols = self.aggregates.to_arrays()
+        cols["sources"] = np.asarray(json.dumps(self.sources))
+        cols["merge_keys"] = self.row_keys
+
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **cols)
+        os.replace(tmp, self.path)
+
+    def has_month(self, month, year=None):
+        """True if the store holds transactions of the month (and year)."""
+        return self.aggregates.has_month(month, year)
+
+    def monthly_table(self):
+        """
+        Returns the per-(month, category) totals, counts and fees.
+
+        Returns:
+        -------
+        months: (1-d) datetime64[M] array
+        categories: (1-d) array-like
+        totals, counts, fees: (N-d) arrays of shape (n_months x n_cat)
+        """
+
+        agg = self.aggregates
+        months = agg.dates.astype("datetime64[M]")
+        uniq, inv = np.unique(months, return_inverse=True)
+        out = []
+        for arr in (agg.sums, agg.counts, agg.fees):
+            table = np.zeros((len(uniq), len(agg.categories)), dtype=arr.dtype)
+            np.add.at(table, inv, arr.T)
+            out.append(table)
+        return (uniq, agg.categories, *out)
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming aggregation of bank statements that do not fit in memory. The csv is
+read in chunks and each chunk is folded into running per-(category, date)
+aggregates, from which the totals needed by pie_chart, multi_costs and
+histogram are derived without ever holding all the rows.
+"""
+
+import numpy as np
+from monex_banks import read_statement_chunks
+from monex_utils import days_number, month_number
+from monex_statement import Statement
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Keys of the (merchant x month) table: merchant << MONTH_BITS | month, with
+# months counted from 1970-01 (offset so earlier months stay positive)
+MONTH_BITS = 20
+_MONTH_OFFSET = 1 << (MONTH_BITS - 1)
+
+# Groups of StatementAggregates.fee_table
+FEE_GROUPS = ("category", "merchant", "month")
+
+# Dates the (category x date) grid may cover: the grid is dense from its first
+# to its last date, so a mistyped date (e.g. year 2201) is skipped instead of
+# allocating centuries of empty columns
+MIN_DATE = np.datetime64("1970-01-01", "D")
+MAX_DATE = np.datetime64("2099-12-31", "D")
+
+
+class StatementAggregates:
+    """
+    Running aggregates of a statement over a (category x date) grid:
+        sums: sum of the amounts of each category on each date
+        counts: number of transactions of each category on each date
+        fees: sum of the fees of each category on each date
+        volume: sum of the absolute amounts of each category on each date (the
+                base of the fee-to-amount ratios)
+        first_row: row number of the first transaction of each cell, used to
+                   reproduce the category order of multi_costs
+    Categories are kept in order of first appearance and the date axis starts
+    at self.start and grows as new dates (from MIN_DATE to MAX_DATE) are
+    folded in. The same pass also
+    folds a sparse (merchant x month) table: merchant_keys (sorted, see
+    MONTH_BITS) with merchant_sums, merchant_volume, merchant_fees and
+    merchant_counts.
+    """
+
+    def __init__(self):
+        """
+        Constructor of StatementAggregates (empty aggregates).
+        """
+
+        self.categories = np.array([], dtype=object)
+        self._codes = {}
+        self.start = None
+        self.sums = np.zeros((0, 0))
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.fees = np.zeros((0, 0))
+        self.volume = np.zeros((0, 0))
+        self.first_row = np.zeros((0, 0), dtype=np.int64)
+        self.n_rows = 0
+        self.merchants = np.array([], dtype=object)
+        self._merchant_codes = {}
+        self.merchant_keys = np.zeros(0, dtype=np.int64)
+        self.merchant_sums = np.zeros(0)
+        self.merchant_volume = np.zeros(0)
+        self.merchant_fees = np.zeros(0)
+        self.merchant_counts = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def from_statement(cls, statement):
+        """Aggregates of an in-memory monex_statement.Statement."""
+        agg = cls()
+        agg.update(statement)
+        return agg
+
+    def to_arrays(self):
+        """
+        Returns the aggregates as a dict of plain NumPy arrays (no Python
+        objects), e.g. to be saved with np.savez.
+        """
+
+        return {"categories": np.asarray(self.categories, dtype=str),
+                "start": np.asarray([] if self.start is None else [self.start],
+                                    dtype="datetime64[D]"),
+                "sums": self.sums, "counts": self.counts, "fees": self.fees,
+                "volume": self.volume, "first_row": self.first_row,
+                "n_rows": np.asarray(self.n_rows, dtype=np.int64),
+                "merchants": np.asarray(self.merchants, dtype=str),
+                "merchant_keys": self.merchant_keys,
+                "merchant_sums": self.merchant_sums,
+                "merchant_volume": self.merchant_volume,
+                "merchant_fees": self.merchant_fees,
+                "merchant_counts": self.merchant_counts}
+
+    @classmethod
+    def from_arrays(cls, cols):
+        """Inverse of to_arrays."""
+        agg = cls()
+        agg.categories = cols["categories"].astype(object)
+        agg._codes = {cat: i for i, cat in enumerate(agg.categories)}
+        agg.start = cols["start"][0] if len(cols["start"]) else None
+        agg.sums, agg.counts = cols["sums"], cols["counts"]
+        agg.fees, agg.first_row = cols["fees"], cols["first_row"]
+        agg.n_rows = int(cols["n_rows"])
+        # Aggregates saved before the fee tables: the volume of a cell is
+        # |sum| when its amounts have one sign, and no merchant table
+        agg.volume = cols["volume"] if "volume" in cols else np.abs(agg.sums)
+        if "merchant_keys" in cols:
+            agg.merchants = cols["merchants"].astype(object)
+            agg._merchant_codes = {m: i for i, m in enumerate(agg.merchants)}
+            for name in ("merchant_keys", "merchant_sums", "merchant_volume",
+                         "merchant_fees", "merchant_counts"):
+                setattr(agg, name, cols[name])
+        return agg
+
+    def has_month(self, month, year=None):
+        """True if there is any transaction in the month name (and year)."""
+        return bool(self.counts[:, self._columns(month, year)].any())
+
+    @property
+    def dates(self):
+        """datetime64[D] date of each column of the aggregate matrices."""
+        if self.start is None:
+            return np.array([], dtype="datetime64[D]")
+        return self.start + np.arange(self.sums.shape[1])
+
+    def range_grid(self, name, start, end):
+        """
+        Returns one of the aggregate matrices ("sums", "counts", "fees" or
+        "volume") over each day of [start, end], shape (n_cat x n_days), with
+        zeros for the dates outside the aggregates.
+        """
+
+        start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+        n_days = int((end - start).astype(int)) + 1
+        grid = getattr(self, name)
+        out = np.zeros((len(self.categories), max(n_days, 0)), dtype=grid.dtype)
+        if self.start is None:
+            return out
+        # Overlap of the range with the dates of the aggregates
+        offset = int((self.start - start).astype(int))
+        lo, hi = max(offset, 0), min(offset + grid.shape[1], n_days)
+        if lo < hi:
+            out[:, lo:hi] = grid[:, lo - offset:hi - offset]
+        return out
+
+    def _grow(self, lo, hi):
+        # Reallocating the matrices so they cover every category and [lo, hi]
+        n_cat = len(self.categories)
+        if self.start is None:
+            start, end = lo, hi
+        else:
+            start = min(self.start, lo)
+            end = max(self.start + self.sums.shape[1] - 1, hi)
+        n_dates = int((end - start).astype(int)) + 1
+        if (n_cat, n_dates) == self.sums.shape:
+            return
+
+        offset = 0 if self.start is None else int((self.start - start).astype(int))
+        old_cat, old_dates = self.sums.shape
+        cells = (slice(0, old_cat), slice(offset, offset + old_dates))
+        for name, fill in (("sums", 0), ("counts", 0), ("fees", 0), ("volume", 0),
+                           ("first_row", np.iinfo(np.int64).max)):
+            old = getattr(self, name)
+            new = np.full((n_cat, n_dates), fill, dtype=old.dtype)
+            new[cells] = old
+            setattr(self, name, new)
+        self.start = start
+
+    def update(self, statement):
+        """
+        Folds the transactions of a statement (or a chunk of one) into the
+        aggregates.
+
+        Parameters:
+        ----------
+        statement: monex_statement.Statement
+                   Rows to be added. Rows with an unparseable date, or dated
+                   before MIN_DATE or after MAX_DATE, are skipped.
+        """
+
+        rows = self.n_rows + np.arange(len(statement))
+        self.n_rows += len(statement)
+
+        # Mapping the categories of the chunk onto the global category codes
+        remap = np.empty(len(statement.categories), dtype=np.int64)
+        for i, cat in enumerate(statement.categories):
+            if cat not in self._codes:
+                self._codes[cat] = len(self._codes)
+            remap[i] = self._codes[cat]
+        self.categories = np.array(list(self._codes), dtype=object)
+        merchant_remap = np.empty(len(statement.merchants), dtype=np.int64)
+        for i, merchant in enumerate(statement.merchants):
+            if merchant not in self._merchant_codes:
+                self._merchant_codes[merchant] = len(self._merchant_codes)
+            merchant_remap[i] = self._merchant_codes[merchant]
+        self.merchants = np.array(list(self._merchant_codes), dtype=object)
+
+        # NaT compares False, so unparseable dates are skipped as well
+        valid = (statement.dates >= MIN_DATE) & (statement.dates <= MAX_DATE)
+        if not valid.any():
+            return
+        dates, rows = statement.dates[valid], rows[valid]
+        cats = remap[statement.category_codes[valid]]
+        amount, fees = statement.amount[valid], statement.fees[valid]
+        volume = np.abs(amount)
+        self._grow(dates.min(), dates.max())
+
+        # Scatter-adding the chunk into the (category x date) grid
+        n_cat, n_dates = self.sums.shape
+        flat = cats * n_dates + (dates - self.start).astype(np.int64)
+        size = n_cat * n_dates
+        self.sums += np.bincount(flat, weights=amount,
+                                 minlength=size).reshape(n_cat, n_dates)
+        self.fees += np.bincount(flat, weights=fees,
+                                 minlength=size).reshape(n_cat, n_dates)
+        self.volume += np.bincount(flat, weights=volume,
+                                   minlength=size).reshape(n_cat, n_dates)
+        self.counts += np.bincount(flat, minlength=size).reshape(n_cat, n_dates)
+        cells, first = np.unique(flat, return_index=True)
+        first_row = self.first_row.reshape(-1)
+        first_row[cells] = np.minimum(first_row[cells], rows[first])
+
+        # Scatter-adding the chunk into a (merchant x month) grid of the chunk
+        # (its own merchant codes and months, so small), whose non-empty cells
+        # are then merged by key into the sparse table
+        months = dates.astype("datetime64[M]").astype(np.int64)
+        first_month = months.min()
+        n_months = months.max() - first_month + 1
+        n_merchants = len(statement.merchants)
+        flat = (statement.merchant_codes[valid].astype(np.int64) * n_months
+                + (months - first_month))
+        size, cell_ids = n_merchants * n_months, None
+        if size > len(flat):
+            # Sparse chunk (many merchants over many months): numbering its
+            # cells instead
+            cell_ids, flat = np.unique(flat, return_inverse=True)
+            size = len(cell_ids)
+        cells = {name: np.bincount(flat, weights=values, minlength=size)
+                 for name, values in (("merchant_sums", amount),
+                                      ("merchant_volume", volume),
+                                      ("merchant_fees", fees),
+                                      ("merchant_counts", None))}
+        filled = np.flatnonzero(cells["merchant_counts"])
+        ids = filled if cell_ids is None else cell_ids[filled]
+        keys = ((merchant_remap[ids // n_months] << MONTH_BITS)
+                | (ids % n_months + first_month + _MONTH_OFFSET))
+        keys, inverse = np.unique(np.concatenate([self.merchant_keys, keys]),
+                                  return_inverse=True)
+        old, new = inverse[:len(self.merchant_keys)], inverse[len(self.merchant_keys):]
+        for name, values in cells.items():
+            merged = np.zeros(len(keys), dtype=getattr(self, name).dtype)
+            merged[old] = getattr(self, name)
+            merged[new] += values[filled].astype(merged.dtype)
+            setattr(self, name, merged)
+        self.merchant_keys = keys
+
+    def _columns(self, month=None, year=None):
+        # Boolean mask over the date axis for a month name (and year)
+        dates = self.dates
+        mask = np.ones(len(dates), dtype=bool)
+        if month is not None:
+            months = dates.astype("datetime64[M]").astype(int) % 12 + 1
+            mask &= (months == month_number(month))
+        if year is not None:
+            mask &= (dates.astype("datetime64[Y]").astype(int) + 1970 == year)
+        return mask
+
+    def category_totals(self, month=None, year=None):
+        """
+        Returns the total amount, number of transactions and fees of each
+        category (in order of first appearance), optionally restricted to a
+        month name and/or year. Categories without transactions are dropped.
+
+        Returns:
+        -------
+        labels: (1-d) array-like
+        totals: (1-d) float array
+        counts: (1-d) int array
+        fees: (1-d) float array
+        """
+
+        cols = self._columns(month, year)
+        counts = self.counts[:, cols].sum(axis=1)
+        keep = counts > 0
+        return (self.categories[keep], self.sums[:, cols].sum(axis=1)[keep],
+                counts[keep], self.fees[:, cols].sum(axis=1)[keep])
+
+    def day_counts(self, month, year=None):
+        """
+        Returns the number of transactions on each day of the month, shape
+        (n_days,). Without a year, all the dates in that month are pooled by
+        day of the month (as data_extract does).
+        """
+
+        cols = self._columns(month, year)
+        days = (self.dates - self.dates.astype("datetime64[M]")).astype(int)[cols]
+        n_days = days_number(month, year)
+        return np.bincount(days, weights=self.counts[:, cols].sum(axis=0),
+                           minlength=n_days)[:n_days]
+
+    def cost_matrix(self, month, income=False, year=None):
+        """
+        Equivalent of monex_utils.multi_costs computed from the aggregates:
+        returns the (n_cat x n_days) cumulative costs per category (or income
+        if income=True) and the category labels.
+        """
+
+        n_days = days_number(month, year)
+        cols = np.flatnonzero(self._columns(month, year))
+        days = (self.dates - self.dates.astype("datetime64[M]")).astype(int)[cols]
+        in_month = days < n_days
+        cols, days = cols[in_month], days[in_month]
+
+        is_income = (self.categories == "Income")
+        if income:
+            cats = np.flatnonzero(is_income)
+        else:
+            cats = np.flatnonzero(~is_income)
+            cats = cats[self.counts[np.ix_(cats, cols)].sum(axis=1) > 0]
+
+        # Pooling the selected dates by day of the month
+        daily = np.zeros((len(cats), n_days))
+        np.add.at(daily.T, days, self.sums[np.ix_(cats, cols)].T)
+
+        if income:
+            daily, label_categ = daily.sum(axis=0, keepdims=True), np.array(["Income"])
+        else:
+            # Order categories by (first day, first row) like multi_costs
+            counts = self.counts[np.ix_(cats, cols)]
+            key = np.where(counts > 0, days * (self.n_rows + 1)
+                           + self.first_row[np.ix_(cats, cols)], np.inf)
+            order = np.argsort(key.min(axis=1, initial=np.inf), kind="stable")
+            daily, label_categ = daily[order], self.categories[cats[order]]
+
+        multi_arr = np.cumsum(daily, axis=1) * -1
+        return multi_arr, label_categ
+
+    def monthly_totals(self):
+        """
+        Returns the calendar months spanned by the aggregates and the total
+        amount per (category, month), shape (n_cat x n_months).
+        """
+
+        months = self.dates.astype("datetime64[M]")
+        uniq, inv = np.unique(months, return_inverse=True)
+        totals = np.zeros((len(self.categories), len(uniq)))
+        np.add.at(totals.T, inv, self.sums.T)
+        return uniq, totals
+
+    def fee_table(self, by="category", month=None, year=None):
+        """
+        Returns the fees charged per category, merchant or month, and their
+        ratio to the (absolute) amounts of the transactions, optionally
+        restricted to a month name and/or year.
+
+        Parameters:
+        ----------
+        by: (optional) str
+            One of FEE_GROUPS: "category", "merchant" or "month".
+        month: (optional) str
+               Month name, e.g. "March".
+        year: (optional) int
+
+        Returns:
+        -------
+        labels: (1-d) array-like
+                Category or merchant names (in order of first appearance), or
+                datetime64[M] months. Groups without transactions are dropped.
+        fees: (1-d) float array
+              Sum of the fees of each group.
+        volume: (1-d) float array
+                Sum of the absolute amounts of each group.
+        counts: (1-d) int array
+                Number of transactions of each group.
+        ratio: (1-d) float array
+               fees / volume (NaN for a zero volume).
+        """
+
+        if by not in FEE_GROUPS:
+            raise ValueError("fee_table expects one of {}, got {!r}".format(
+                FEE_GROUPS, by))
+
+        if by == "merchant":
+            # Months of the merchant table within the month name (and year)
+            months = ((self.merchant_keys & ((1 << MONTH_BITS) - 1))
+                      - _MONTH_OFFSET).astype("datetime64[M]")
+            keep = np.ones(len(months), dtype=bool)
+            if month is not None:
+                keep &= (months.astype(int) % 12 + 1 == month_number(month))
+            if year is not None:
+                keep &= (months.astype("datetime64[Y]").astype(int) + 1970 == year)
+            codes = self.merchant_keys[keep] >> MONTH_BITS
+            n = len(self.merchants)
+            labels = self.merchants
+            fees, volume, counts = (
+                np.bincount(codes, weights=getattr(self, name)[keep], minlength=n)
+                for name in ("merchant_fees", "merchant_volume", "merchant_counts"))
+            counts = counts.astype(np.int64)
+        else:
+            cols = self._columns(month, year)
+            if by == "category":
+                labels = self.categories
+                fees, volume = self.fees[:, cols].sum(axis=1), self.volume[:, cols].sum(axis=1)
+                counts = self.counts[:, cols].sum(axis=1)
+            else:
+                months = self.dates[cols].astype("datetime64[M]")
+                labels, inv = np.unique(months, return_inverse=True)
+                fees, volume, counts = (
+                    np.bincount(inv, weights=arr[:, cols].sum(axis=0), minlength=len(labels))
+                    for arr in (self.fees, self.volume, self.counts))
+                counts = counts.astype(np.int64)
+
+        keep = counts > 0
+        fees, volume, counts = fees[keep], volume[keep], counts[keep]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(volume > 0, fees / volume, np.nan)
+        return labels[keep], fees, volume, counts, ratio
+
+
+def stream_statement(path, chunksize=DEFAULT_CHUNKSIZE, bank=None):
+    """
+    Reads a csv bank statement in chunks and folds it into aggregates, so the
+    memory used is bounded by the chunk size rather than the file size.
+
+    Parameters:
+    ----------
+    path: str
+          Path to the csv bank statement.
+    chunksize: (optional) int
+               Number of rows parsed at a time.
+    bank: (optional) str or monex_banks.BankFormat
+          Format of the statement. Detected from its header by default.
+
+    Returns:
+    -------
+    agg: StatementAggregates
+         Aggregates of the whole statement.
+    """
+
+    agg = StatementAggregates()
+    for chunk in read_statement_chunks(path, chunksize, bank):
+        agg.update(chunk)
+    return agg
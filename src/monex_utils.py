@@ -5,7 +5,35 @@ Created on Tue Aug 18 22:12:53 2020
 @author: rbv
 """
 
+import calendar
 import numpy as np
+import pandas as pd
+from monex_statement import Statement
+
+def factorize(x):
+    """
+    Encodes an array/list of (repeated) strings as integer codes in a single
+    O(n) hash-based pass.
+    
+    Parameters:
+    ----------
+    x: (1-d) array-like 
+       Contains strings.
+    
+    Returns:
+    -------
+    uniques: (1-d) array-like
+             Contains unique string elements from input array, in order of first
+             appearance.
+    codes: (1-d) int array
+           Index of each element of x into uniques, so uniques[codes] == x.
+           Has the same shape as x.
+    """
+
+    codes, uniques = pd.factorize(np.asarray(x, dtype=object), sort=False,
+                                  use_na_sentinel=False)
+    return np.asarray(uniques, dtype=object), codes
+
 
 def unique_elemts(x):
     """
@@ -25,17 +53,12 @@ def unique_elemts(x):
     """    
     
 
-    # Creating empty list and appending unique string values
-    uni_x = []
-    for element in x:
-        if element not in uni_x:
-            uni_x.append(element)
+    # Unique values in order of first appearance, as a string array
+    uni_x = factorize(x)[0]
+    return np.array(uni_x.tolist())
 
-    # Finally return a string array instead of a list
-    return np.array(uni_x)
 
-
-def days_number(month):
+def days_number(month, year=None):
     """
     Returns the number of days for input month.
     
@@ -43,6 +66,9 @@ def days_number(month):
     ----------
     month: str
            Month of interest.
+    year: (optional) int
+          Year of interest, so that February has 29 days in leap years. If not
+          given, February is taken to have 28 days.
    
     Returns:
     -------
@@ -51,6 +77,10 @@ def days_number(month):
     
     """
     
+    # The calendar module knows about leap years
+    if year is not None:
+        return calendar.monthrange(year, month_number(month))[1]
+
     # Create a dictonary with the days of each month
     d = {
         "January": 31,
@@ -72,21 +102,27 @@ def days_number(month):
     return days
 
 
-def sort_ind(x, y):
+def sort_ind(x, y=None):
     """
     This function sorts the main array using np.argsort()
     and getting the indices, it sorts the dependent array.
     
     Parameters:
     ----------
-    x: 1-D array to be sorted in ascending order.
-    y: 1-D array that is dependent on x and will be sorted accordingly.
+    x: 1-D array to be sorted in ascending order, or a
+       monex_statement.Statement to be sorted by date.
+    y: 1-D array that is dependent on x and will be sorted accordingly (not
+       used with a Statement).
                 
     Returns:
     -------
-    sorted_x: 1-D sorted x array.
+    sorted_x: 1-D sorted x array (or the Statement with its rows stably sorted
+              by their int day ordinals).
     sorted_y: 1-D sorted y array in accordance to x so any existing correlation is preserved. 
     """
+
+    if isinstance(x, Statement):
+        return x.sort_by_date()
     
     # Finding the sorted index array and applying it as a mask:
     idx = np.argsort(x)
@@ -96,7 +132,7 @@ def sort_ind(x, y):
     return sorted_x, sorted_y
 
 
-def filt_income(amount, category):
+def filt_income(amount, category=None, categories=None):
     """
     This function filters out the sources of income from an array containing
     monthly costs and their corresponding categories.
@@ -104,29 +140,78 @@ def filt_income(amount, category):
     Parameters:
     ----------
     amount: (1-d) array-like
-            Contains the set of financial inputs read from a csv monthly file.
+            Contains the set of financial inputs read from a csv monthly file,
+            or a monex_statement.Statement (category is then not used).
     category: (1-d) array-like
               contains the category corresponding to the amount array above. 
               Must have the same shape as amount array.
+    categories: (optional) (1-d) array-like
+                If given, category holds integer codes into categories (see
+                multi_costs).
     
     Returns:
     -------
     costs: (1-d) array-like
-           contains monthly costs where the income entries have been removed.
+           contains monthly costs where the income entries have been removed
+           (the Statement without its income rows, for a Statement).
     cost_cats: (1-d) array-like
                contains corresponding category to monthly cost array. Has same
                shape as costs array
     """
-    
-    # Get rid of sources of income through array masking
-    costs = amount[category != "Income"]
-    cost_cats = category[category != "Income"]
+
+    if isinstance(amount, Statement):
+        # Comparing the int16 codes with the code of "Income", not strings
+        st = amount
+        return st.take(st.category_codes != st.category_code("Income"))
+
+    # Get rid of sources of income through array masking (on the codes)
+    amount = np.asarray(amount)
+    codes, _, income_code = _encode(category, categories)
+    is_cost = ~np.isin(codes, income_code)
+    costs = amount[is_cost]
+    cost_cats = np.asarray(category)[is_cost]
 
     # Returning the income-masked arrays:
     return costs, cost_cats
 
 
-def multi_costs(amount, category, days, month, income=False):
+def first_appearance(codes, labels):
+    """
+    Renumbers integer category codes in order of first appearance.
+
+    Parameters:
+    ----------
+    codes: (1-d) int array
+           Codes into labels, in the order they should be ranked.
+    labels: (1-d) array-like
+            Category string of each code.
+
+    Returns:
+    -------
+    label_categ: (1-d) array-like
+                 Labels of the codes present, in order of first appearance.
+    new_codes: (1-d) int array
+               Index of each element of codes into label_categ.
+    """
+
+    present, first = np.unique(codes, return_index=True)
+    order = present[np.argsort(first)]
+    remap = np.zeros(len(labels), dtype=np.int64)
+    remap[order] = np.arange(len(order))
+    return np.asarray(labels, dtype=object)[order], remap[codes]
+
+
+def _encode(category, categories):
+    # Integer codes and labels of a category column (factorized if needed)
+    if categories is None:
+        categories, codes = factorize(category)
+    else:
+        categories, codes = np.asarray(categories, dtype=object), np.asarray(category)
+    return codes, categories, np.flatnonzero(categories == "Income")
+
+
+def multi_costs(amount, category, days, month, income=False, year=None,
+                categories=None):
     """
     Calculates the cumulative costs for each category per day.
     
@@ -146,6 +231,12 @@ def multi_costs(amount, category, days, month, income=False):
     income: (optional) boolean
             If set to True, calculates the cumulative sum of income entries
             for each day of the month
+    year: (optional) int
+          year of the statement, so leap years are handled (see days_number).
+    categories: (optional) (1-d) array-like
+                If given, category holds integer codes into categories (e.g.
+                Statement.category_codes and Statement.categories) and the
+                strings are not factorized again.
             
     Returns:
     -------
@@ -157,51 +248,116 @@ def multi_costs(amount, category, days, month, income=False):
     """
 
     # Defining some general parameters
-    n_days = days_number(month)
-
-    day_arr = np.arange(1, n_days + 1)
+    n_days = days_number(month, year)
+    amount = np.asarray(amount, dtype=float)
+    codes, categories, income_code = _encode(category, categories)
+    days = np.asarray(days).astype(int)
+    is_income = np.isin(codes, income_code)
 
     # Find the multi_cost for the actual costs (excluding income)
     if not income:
-        # Filter out the income and sort array
-        mask = (category != "Income")
-        amount, category, days = amount[mask], category[mask], days[mask]
-        idx = np.argsort(days)
-        costs, costs_cats, days = amount[idx], category[idx], days[idx]
-        
-        #costs, costs_cats = sort_ind(*filt_income(amount, category))
-        #days, costs_cats = sort_ind(*filt_income(days, category))
-        
-        label_categ = unique_elemts(costs_cats)
+        # Filter out the income and sort array (stable so ties keep file order)
+        mask = ~is_income
+        amount, codes, days = amount[mask], codes[mask], days[mask]
+        idx = np.argsort(days, kind="stable")
+        costs, days = amount[idx], days[idx]
+
+        # Labels in order of first appearance
+        label_categ, cat_codes = first_appearance(codes[idx], categories)
         n_cat = len(label_categ)
 
     if income:
         # Only extract income entries
-        costs = amount[category == "Income"]
-        costs_cats = category[category == "Income"]
-        days = days[category == "Income"]
+        costs, days = amount[is_income], days[is_income]
+        cat_codes = np.zeros(len(costs), dtype=int)
 
         # The number of categories will be just one i.e. income
         label_categ = np.array(["Income"])
         n_cat = 1
 
-    # Now creating multi-dim array and appending cumulative values in a loop
-    multi_arr = np.ones((n_cat, n_days))
-    for i in range(n_cat):
-        val = 0
-        curr_cat = label_categ[i]
-        for j in range(n_days):
-            # Finding the cost of a particular day for the current category
-            cost_day = np.sum(
-                costs[(days == day_arr[j]) & (costs_cats == curr_cat)]) * -1
-            # Note we are interested in the cumulative cost
-            val += cost_day
-            # Appending the cost to the multi-dim array
-            multi_arr[i][j] = val
-            
+    # Days outside the month can not be placed in the matrix
+    in_month = (days >= 1) & (days <= n_days)
+    costs, days, cat_codes = costs[in_month], days[in_month], cat_codes[in_month]
+
+    # Scatter-add every transaction into its (category, day) cell in one pass
+    # and then accumulate along the day axis
+    flat = cat_codes * n_days + (days - 1)
+    daily = np.bincount(flat, weights=costs, minlength=n_cat * n_days)
+    multi_arr = np.cumsum(daily.reshape(n_cat, n_days), axis=1) * -1
+
     # Returning the multi-dim array of cumulative costs with category array       
     return multi_arr, label_categ
 
+def range_costs(amount, category, dates, start, end, income=False,
+                categories=None):
+    """
+    Calculates the cumulative costs for each category per calendar day over an
+    arbitrary date range (which may span several months or years).
+    
+    Parameters:
+    ----------
+    amount: (1-d) array-like
+            Contains the set of financial inputs read from csv files.
+    category: (1-d) array-like
+              contains the category corresponding to the amount array above. 
+              Must have the same shape as amount array.
+    dates: (1-d) array-like
+           date of each transaction (anything convertible to datetime64[D]).
+           Must have the same shape as amount array.
+    start, end: str or datetime64
+                first and last day (both included) of the date range.
+    income: (optional) boolean
+            If set to True, calculates the cumulative sum of income entries
+            for each day of the range.
+    categories: (optional) (1-d) array-like
+                If given, category holds integer codes into categories (see
+                multi_costs).
+            
+    Returns:
+    -------
+    multi_arr: (N-d) array-like
+               contains the cumulative sum of costs/entries per day of the range.
+               Shape is (n_cat x n_days).
+    label_categ: (1-d) array-like 
+                 contains the categories in order of first appearance.
+    date_arr: (1-d) datetime64[D] array
+              contains each day of the range, shape (n_days,).
+    """
+
+    # Building the calendar index of the range
+    start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+    date_arr = np.arange(start, end + 1)
+    n_days = len(date_arr)
+
+    amount = np.asarray(amount, dtype=float)
+    codes, categories, income_code = _encode(category, categories)
+    dates = np.asarray(dates, dtype="datetime64[D]")
+
+    # Selecting the transactions in range (NaT never compares True)
+    is_income = np.isin(codes, income_code)
+    mask = (dates >= start) & (dates <= end)
+    mask &= is_income if income else ~is_income
+    costs, codes = amount[mask], codes[mask]
+    offsets = (dates[mask] - start).astype(np.int64)
+
+    if income:
+        label_categ = np.array(["Income"])
+        cat_codes = np.zeros(len(costs), dtype=int)
+    else:
+        # Stable sort by date so categories come in order of first appearance
+        idx = np.argsort(offsets, kind="stable")
+        costs, offsets = costs[idx], offsets[idx]
+        label_categ, cat_codes = first_appearance(codes[idx], categories)
+    n_cat = len(label_categ)
+
+    # Scatter-add into (category, day offset) cells and accumulate over days
+    flat = cat_codes * n_days + offsets
+    daily = np.bincount(flat, weights=costs, minlength=n_cat * n_days)
+    multi_arr = np.cumsum(daily.reshape(n_cat, n_days), axis=1) * -1
+
+    return multi_arr, label_categ, date_arr
+
+
 def month_name(monthNum):
     """
     Returns the number of days for input month.
@@ -235,4 +391,25 @@ def month_name(monthNum):
         
     # Assigining the value from the dictionary and return number of days
     monthName = d[monthNum]
-    return monthName
\ No newline at end of file
+    return monthName
+
+def month_number(monthName):
+    """
+    Returns the number of the month for input month name (inverse of
+    month_name).
+
+    Parameters:
+    ----------
+    monthName: str
+               Name of the month (e.g. "March")
+
+    Returns:
+    -------
+    monthNum: int
+              Corresponding number of the month (i.e. 1 <= monthNum <= 12)
+    """
+
+    for monthNum in range(1, 13):
+        if month_name(monthNum) == monthName:
+            return monthNum
+    raise KeyError(monthName)
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+pytest configuration: the monex modules are imported from src (as the
+benchmarks do), and the reference implementations from the benchmarks.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
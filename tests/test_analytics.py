@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+One csv parse per report of monex_analytics.MonthlyExpenses_Analytics
+(Statement.n_parses), and the statements of RangeExpenses_Analytics.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("matplotlib")
+
+from monex_analytics import MonthlyExpenses_Analytics, RangeExpenses_Analytics
+from monex_mock import write_mock_csv
+from monex_render import RenderCache, Renderer
+from monex_statement import Statement
+
+
+@pytest.fixture
+def analytics(tmp_path):
+    write_mock_csv(str(tmp_path / "March.csv"), 500, "2021-03-01", "2021-03-31",
+                   seed=8)
+    renderer = Renderer(RenderCache(str(tmp_path / "renders")), dpi=20)
+    return MonthlyExpenses_Analytics("March", year=2021, folder=str(tmp_path),
+                                     outdir=str(tmp_path), renderer=renderer)
+
+
+def report(analytics):
+    analytics.data_extract()
+    for plot in (analytics.pie_chart, analytics.cost_plot, analytics.histogram,
+                 analytics.fee_plot):
+        plot(savefig=True)
+
+
+def test_one_parse_per_report(analytics, tmp_path):
+    n_parses = Statement.n_parses
+    report(analytics)
+    assert Statement.n_parses == n_parses + 1
+    assert len([f for f in os.listdir(str(tmp_path)) if f.endswith(".png")]) == 4
+
+    # Parsed again once the csv changes
+    with open(str(tmp_path / "March.csv"), "a") as f:
+        f.write("15/03/2021,-10.00,Bakery,0.00,Groceries\n")
+    report(analytics)
+    assert Statement.n_parses == n_parses + 2
+
+
+def test_range_picks_up_new_files(tmp_path):
+    write_mock_csv(str(tmp_path / "March.csv"), 300, "2021-03-01", "2021-03-31",
+                   seed=8)
+    analytics = RangeExpenses_Analytics("2021-03-01", "2021-04-30",
+                                        folder=str(tmp_path))
+    assert len(analytics.statement()) == 300
+    n_parses = Statement.n_parses
+    analytics.statement()
+    assert Statement.n_parses == n_parses
+
+    # A statement exported into the folder later on is part of the range
+    write_mock_csv(str(tmp_path / "April.csv"), 200, "2021-04-01", "2021-04-30",
+                   seed=9)
+    st = analytics.statement()
+    assert len(st) == 500
+    assert st.dates.max() >= np.datetime64("2021-04-01")
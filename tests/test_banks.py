@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Format detection and parsing of the bank adapters of monex_banks on a small
+export of each bank.
+"""
+
+import numpy as np
+import pytest
+
+from monex_banks import (ANZ, CHASE, REVOLUT, TRANSFERWISE, BankFormat, detect_format,
+                         find_format, read_statement, read_statement_chunks)
+
+TRANSFERWISE_CSV = b"""\
+Date,Amount,Currency,Merchant,Total fees,Category
+02/03/2021,-12.50,EUR,Coffee shop,0.10,Coffee
+13/03/2021,1500.00,EUR,Employer,0.00,Income
+"""
+
+# Account details before the header
+ANZ_CSV = b"""\
+Account,01-1234-5678901-00
+Balance,1234.56
+
+Date,Type,Details,Particulars,Code,Reference,Amount
+02/03/2021,Eft-Pos,Countdown,,,,-45.20
+13/03/2021,Salary,Employer,,,,2500.00
+"""
+
+REVOLUT_CSV = b"""\
+Type,Product,Started Date,Completed Date,Description,Amount,Fee,Currency,State,Balance
+CARD_PAYMENT,Current,2021-03-02 09:12:00,2021-03-02 10:00:01,Bakery,-3.20,0.00,GBP,COMPLETED,96.80
+TOPUP,Savings,2021-03-13 08:00:00,2021-03-13 08:00:05,Top-up,100.00,0.50,GBP,COMPLETED,196.80
+"""
+
+CHASE_CSV = b"""\
+Transaction Date,Post Date,Description,Category,Type,Amount,Memo
+03/02/2021,03/03/2021,STARBUCKS,Food & Drink,Sale,-5.75,
+03/13/2021,03/14/2021,REFUND,Shopping,Return,20.00,
+"""
+
+EXPORTS = [
+    (TRANSFERWISE, TRANSFERWISE_CSV, 0, ["Coffee shop", "Employer"]),
+    (ANZ, ANZ_CSV, 3, ["Countdown", "Employer"]),
+    (REVOLUT, REVOLUT_CSV, 0, ["Bakery", "Top-up"]),
+    (CHASE, CHASE_CSV, 0, ["STARBUCKS", "REFUND"]),
+]
+
+
+@pytest.mark.parametrize("fmt, data, skiprows, merchants", EXPORTS)
+def test_detect_format(fmt, data, skiprows, merchants, tmp_path):
+    assert detect_format(data) == (fmt, skiprows)
+    path = tmp_path / "export.csv"
+    path.write_bytes(data)
+    assert detect_format(str(path)) == (fmt, skiprows)
+    assert find_format(data, fmt.name) == (fmt, skiprows)
+
+
+@pytest.mark.parametrize("fmt, data, skiprows, merchants", EXPORTS)
+def test_read_statement(fmt, data, skiprows, merchants, tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_bytes(data)
+    st = read_statement(str(path))
+    # Every export: a cost on March 2nd and an income on March 13th
+    np.testing.assert_array_equal(st.dates, np.array(["2021-03-02", "2021-03-13"],
+                                                     dtype="datetime64[D]"))
+    assert st.amount[0] < 0 < st.amount[1]
+    assert list(st.merchant) == merchants
+    assert st.path == str(path) and st.stamp is not None
+
+    chunks = list(read_statement_chunks(data, chunksize=1))
+    assert len(chunks) == 2
+    np.testing.assert_array_equal(np.concatenate([c.amount for c in chunks]), st.amount)
+
+
+def test_optional_columns():
+    st = read_statement(TRANSFERWISE_CSV)
+    assert list(st.category) == ["Coffee", "Income"]
+    np.testing.assert_allclose(st.fees, [0.10, 0.0])
+    assert list(st.currency) == ["EUR", "EUR"]
+
+    # Without the optional Category and Currency columns
+    st = read_statement(b"Date,Amount,Merchant,Total fees\n02/03/2021,-1,a,0\n")
+    assert list(st.category) == [""] and st.currencies is None
+
+    st = read_statement(REVOLUT_CSV)
+    assert list(st.account) == ["Current", "Savings"]
+    np.testing.assert_allclose(st.fees, [0.0, 0.5])
+
+    # Single-currency exports
+    assert list(read_statement(ANZ_CSV).currency) == ["NZD", "NZD"]
+    assert list(read_statement(CHASE_CSV).currency) == ["USD", "USD"]
+
+
+def test_sign_conventions():
+    # Costs exported as positive amounts
+    fmt = BankFormat("positive costs", {"date": "Date", "amount": "Amount"},
+                     date_format="%Y-%m-%d", sign=-1)
+    st = fmt.read(b"Date,Amount\n2021-03-02,12.5\n2021-03-03,-100\n")
+    np.testing.assert_allclose(st.amount, [-12.5, 100.0])
+
+    # Debit and credit columns, whatever their sign
+    fmt = BankFormat("debit credit", {"date": "Date", "debit": "Debit",
+                                      "credit": "Credit"}, date_format="%Y-%m-%d")
+    st = fmt.read(b"Date,Debit,Credit\n2021-03-02,12.5,\n2021-03-03,,100\n"
+                  b"2021-03-04,-7,\n")
+    np.testing.assert_allclose(st.amount, [-12.5, 100.0, -7.0])
+
+
+def test_day_first_fallback():
+    # Dates not in the format of the export are parsed day first
+    st = read_statement(b"Date,Amount,Merchant,Total fees\n02/03/2021,-1,a,0\n"
+                        b"2021-03-13,-2,b,0\n4/3/21,-3,c,0\n,-4,d,0\n")
+    np.testing.assert_array_equal(st.dates, np.array(
+        ["2021-03-02", "2021-03-13", "2021-03-04", "NaT"], dtype="datetime64[D]"))
+
+
+def test_non_numeric_amounts():
+    st = read_statement(b"Date,Amount,Merchant,Total fees\n02/03/2021,-1,a,0\n"
+                        b"03/03/2021,n/a,b,x\n")
+    np.testing.assert_allclose(st.amount, [-1.0, np.nan])
+    np.testing.assert_allclose(st.fees, [0.0, 0.0])
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        detect_format(b"When,How much\n2021-03-02,1\n")
+    with pytest.raises(ValueError):
+        BankFormat("no amount", {"date": "Date"}, date_format="%Y-%m-%d")
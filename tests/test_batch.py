@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Year of the monthly statements rendered by monex_batch.
+"""
+
+from monex_batch import statement_year
+from monex_statement import Statement
+
+
+def test_statement_year():
+    st = Statement.from_columns(["2020-02-03", "2020-02-29", "2021-02-01", "2020-03-01"],
+                                [-1.0] * 4, ["a"] * 4, [0.0] * 4, ["Food"] * 4)
+    assert statement_year(st, "February") == 2020
+    assert statement_year(st, "March") == 2020
+    assert statement_year(st, "April") is None
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Merchant-to-category classification of monex_classify.
+"""
+
+import pandas as pd
+import pytest
+
+from monex_classify import MerchantClassifier, label_csv, merchant_prefix
+from monex_statement import Statement
+
+TRAINING = [("COUNTDOWN #123 WLG", "Groceries"), ("COUNTDOWN #123 WLG", "Groceries"),
+            ("Countdown Ponsonby", "Groceries"), ("The Coffee Co", "Coffee"),
+            ("Coffee Supreme", "Coffee"), ("The Book Shop", "Books"),
+            ("Book Depot", "Books"), ("Uber Trip 4821", "Transport"),
+            ("Uber Trip 4821", "Eating Out"), ("Uber Trip 4821", "Transport")]
+
+
+@pytest.fixture
+def classifier():
+    merchants, categories = zip(*TRAINING)
+    n = len(TRAINING)
+    return MerchantClassifier().fit([Statement.from_columns(
+        ["2021-01-01"] * n, [-10.0] * n, list(merchants), [0.0] * n, list(categories))])
+
+
+def test_prefix_skips_stopwords():
+    assert merchant_prefix("the coffee co") == "coffee"
+    assert merchant_prefix("at my pc") == ""
+
+
+@pytest.mark.parametrize("merchant, category", [
+    ("Uber Trip 4821", "Transport"),        # exact (majority of transactions)
+    ("COUNTDOWN #999 wlg", "Groceries"),    # normalized
+    ("Countdown Karori", "Groceries"),      # prefix
+    ("The Coffee Roasters", "Coffee"),      # prefix after a stopword
+    ("The Book Barn", "Books"),
+    ("Best Coffee Place", "Coffee"),        # naive Bayes
+    ("Zzyzx", ""),                          # unknown
+])
+def test_predict(classifier, merchant, category):
+    assert classifier.predict_one(merchant) == category
+
+
+def test_predict_memoizes_distinct_merchants(classifier, monkeypatch):
+    calls = []
+    predict_one = classifier.predict_one
+    monkeypatch.setattr(classifier, "predict_one",
+                        lambda m: calls.append(m) or predict_one(m))
+    labels = classifier.predict(["Book Depot", "Countdown Karori", "Book Depot"])
+    assert labels.tolist() == ["Books", "Groceries", "Books"]
+    assert sorted(calls) == ["Book Depot", "Countdown Karori"]
+    assert "Countdown Karori" in classifier._memo
+
+
+def test_classify_keeps_hand_labels(classifier):
+    st = Statement.from_columns(["2021-02-01"] * 3, [-1.0] * 3,
+                                ["Book Depot", "Coffee Supreme", "Zzyzx"],
+                                [0.0] * 3, ["", "Treats", ""])
+    assert classifier.classify(st).category.tolist() == ["Books", "Treats", ""]
+    assert classifier.classify(st, overwrite=True).category.tolist() == ["Books", "Coffee", ""]
+
+
+def test_save_load(classifier, tmp_path):
+    path = str(tmp_path / "merchants.npz")
+    classifier.save(path)
+    loaded = MerchantClassifier.load(path)
+    for merchant in ("Countdown Karori", "The Book Barn", "Best Coffee Place"):
+        assert loaded.predict_one(merchant) == classifier.predict_one(merchant)
+
+
+def test_label_csv(classifier, tmp_path):
+    path = tmp_path / "March.csv"
+    path.write_text("Date,Amount,Merchant,Total fees,Category,Note\n"
+                    "01/03/2021,-4.50,Coffee Supreme,0.00,,007\n"
+                    "02/03/2021,-10.00,Book Depot,0.00,Gifts,\n")
+    out = tmp_path / "March_labelled.csv"
+    label_csv(classifier, str(path), str(out))
+    labelled = pd.read_csv(out, dtype=str, keep_default_na=False)
+    assert list(labelled.columns) == ["Date", "Amount", "Merchant", "Total fees",
+                                      "Category", "Note"]
+    assert labelled["Category"].tolist() == ["Coffee", "Gifts"]
+    assert labelled["Amount"].tolist() == ["-4.50", "-10.00"]
+    assert labelled["Note"].tolist() == ["007", ""]
+    with pytest.raises(ValueError):
+        label_csv(classifier, str(path), str(path))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Currency conversion (monex_fx) of statements read with their currencies and
+accounts by the bank adapters.
+"""
+
+import numpy as np
+import pytest
+
+from monex_fx import FXRates, split_accounts
+from monex_statement import Statement
+
+REVOLUT = """Type,Product,Started Date,Completed Date,Description,Amount,Fee,Currency,State,Balance
+CARD_PAYMENT,Current,2021-03-01 10:00:00,2021-03-01 10:05:00,Cafe,-4.5,0,EUR,COMPLETED,95.5
+CARD_PAYMENT,Current,2021-03-05 09:00:00,2021-03-05 09:01:00,Shop,-10,0.1,USD,COMPLETED,85.4
+TRANSFER,Savings,2021-03-06 10:00:00,2021-03-06 10:05:00,Top up,50,0,NZD,COMPLETED,50
+"""
+
+
+@pytest.fixture
+def rates():
+    return FXRates(["2021-02-28", "2021-03-04"], ["EUR", "USD"],
+                   [[1.7, 1.4], [1.8, 1.5]])
+
+
+@pytest.fixture
+def revolut(tmp_path):
+    path = tmp_path / "revolut.csv"
+    path.write_text(REVOLUT)
+    return Statement.from_csv(str(path))
+
+
+def test_adapter_reads_currencies_and_accounts(revolut):
+    assert revolut.currency.tolist() == ["EUR", "USD", "NZD"]
+    assert revolut.account.tolist() == ["Current", "Current", "Savings"]
+    # Kept through row selection and concatenation
+    assert revolut.sort_by_date().take([2]).currency.tolist() == ["NZD"]
+    no_currency = Statement.from_columns(["2021-03-07"], [-1.0], ["Bakery"], [0.0], [""])
+    both = Statement.concat([revolut, no_currency])
+    assert both.currency.tolist() == ["EUR", "USD", "NZD", ""]
+
+
+def test_convert_statement_uses_statement_currencies(rates, revolut):
+    converted = rates.convert_statement(revolut)
+    np.testing.assert_allclose(converted.amount, [-4.5 * 1.7, -10 * 1.5, 50])
+    np.testing.assert_allclose(converted.fees, [0, 0.1 * 1.5, 0])
+    assert converted.currency.tolist() == ["NZD"] * 3
+    assert converted.account.tolist() == revolut.account.tolist()
+    assert converted.path == revolut.path
+
+
+def test_convert_statement_needs_currencies(rates):
+    st = Statement.from_columns(["2021-03-01"], [-3.0], ["Bakery"], [0.0], ["Food"])
+    with pytest.raises(ValueError):
+        rates.convert_statement(st)
+    np.testing.assert_allclose(rates.convert_statement(st, ["EUR"]).amount, [-3 * 1.7])
+
+
+def test_rate_skips_missing_rates():
+    # No EUR rate on the second date: the last earlier EUR rate is used
+    rates = FXRates(["2021-03-04", "2021-02-28", "2021-03-10"], ["EUR", "USD"],
+                    [[np.nan, 1.5], [1.7, 1.4], [1.9, np.nan]])
+    dates = ["2021-03-05", "2021-03-05", "2021-03-11", "2021-03-11", "2021-02-01"]
+    np.testing.assert_allclose(
+        rates.rate(["EUR", "USD", "EUR", "USD", "EUR"], dates),
+        [1.7, 1.5, 1.9, 1.5, np.nan])
+
+
+def test_missing_currency_has_no_rate(rates):
+    np.testing.assert_allclose(rates.rate(["EUR", np.nan, "USD"], ["2021-03-05"] * 3),
+                               [1.8, np.nan, 1.5])
+
+
+def test_split_accounts(rates, revolut):
+    accounts = split_accounts(rates.convert_statement(revolut))
+    assert list(accounts) == ["Current", "Savings"]
+    np.testing.assert_allclose(accounts["Current"].amount, [-4.5 * 1.7, -15.0])
+    # Currency balances when the statement has no accounts
+    st = Statement.from_columns(["2021-03-01"] * 3, [-1.0, -2.0, -3.0], ["a"] * 3,
+                                [0.0] * 3, [""] * 3, currency=["EUR", "NZD", "EUR"])
+    assert {k: len(v) for k, v in split_accounts(st).items()} == {"EUR": 2, "NZD": 1}
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent loading of statement files (monex_loader).
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from monex_loader import iter_statements, load_statements, read_file
+from monex_mock import write_mock_csv
+from monex_statement import Statement
+
+
+@pytest.fixture(scope="module")
+def paths(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("loader")
+    return [str(write_mock_csv(str(folder / "{}.csv".format(i)), 50 + i,
+                               "2021-01-01", "2021-01-31", seed=i)) for i in range(8)]
+
+
+def slow_read(delays, state=None):
+    # read function sleeping delays[path] seconds and tracking the reads in
+    # flight
+    lock = threading.Lock()
+
+    def read(path):
+        if state is not None:
+            with lock:
+                state["reading"] += 1
+                state["started"] += 1
+                state["max_reading"] = max(state["max_reading"], state["reading"])
+        time.sleep(delays[path])
+        if state is not None:
+            with lock:
+                state["reading"] -= 1
+        return read_file(path)
+    return read
+
+
+def test_results_in_path_order(paths):
+    # The first files are the slowest, so they complete last
+    delays = {p: 0.02 * (len(paths) - i) for i, p in enumerate(paths)}
+    parses = Statement.n_parses
+    statements = load_statements(paths, read=slow_read(delays))
+    assert [st.path for st in statements] == paths
+    assert [len(st) for st in statements] == [50 + i for i in range(len(paths))]
+    assert Statement.n_parses - parses == len(paths)
+
+
+def test_yields_in_completion_order(paths):
+    delays = {p: 0.03 * (len(paths) - i) for i, p in enumerate(paths)}
+
+    async def collect():
+        return [path async for path, _ in iter_statements(
+            paths, concurrency=len(paths), read=slow_read(delays))]
+    assert asyncio.run(collect()) == paths[::-1]
+
+
+def test_failed_file_raises(paths, tmp_path):
+    missing = str(tmp_path / "missing.csv")
+    with pytest.raises(FileNotFoundError):
+        load_statements(paths[:3] + [missing] + paths[3:])
+
+
+def test_bounded_in_flight(paths):
+    state = {"reading": 0, "started": 0, "max_reading": 0}
+    delays = {p: 0.01 for p in paths}
+    behind = []
+
+    async def consume():
+        consumed = 0
+        async for _ in iter_statements(paths, concurrency=2,
+                                       read=slow_read(delays, state)):
+            consumed += 1
+            # A slow consumer: reads started but not consumed stay bounded
+            await asyncio.sleep(0.05)
+            behind.append(state["started"] - consumed)
+    asyncio.run(consume())
+    assert state["max_reading"] <= 2
+    assert max(behind) <= 2
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Round trips of the typed statement columns: Statement.to_arrays/from_arrays
+(through an npz file) and the binary transaction log of monex_log.
+"""
+
+import numpy as np
+import pytest
+
+import monex_log
+from monex_log import HEADER_DTYPE, RECORD_DTYPE, TransactionLog, csv_to_log
+from monex_mock import mock_table, write_mock_csv
+from monex_statement import Statement
+
+
+def assert_same_rows(a, b):
+    np.testing.assert_array_equal(a.ordinals, b.ordinals)
+    np.testing.assert_array_equal(a.amount, b.amount)
+    np.testing.assert_array_equal(a.fees, b.fees)
+    np.testing.assert_array_equal(a.category, b.category)
+    np.testing.assert_array_equal(a.merchant, b.merchant)
+
+
+@pytest.fixture
+def statement():
+    return mock_table(3000, "2021-01-01", "2021-12-31", seed=2)
+
+
+def test_arrays_round_trip(statement, tmp_path):
+    statement.stamp = (123456789, 4096)
+    path = tmp_path / "statement.npz"
+    np.savez(path, **statement.to_arrays())
+    with np.load(path, allow_pickle=False) as npz:
+        restored = Statement.from_arrays({name: npz[name] for name in npz.files},
+                                         path="March.csv")
+    assert_same_rows(restored, statement)
+    assert restored.stamp == statement.stamp
+    assert restored.path == "March.csv"
+    assert restored.category_codes.dtype == statement.category_codes.dtype
+
+
+def test_log_round_trip(statement, tmp_path):
+    path = str(tmp_path / "history.log")
+    log = TransactionLog(path)
+    assert log.append(statement) == len(statement)
+    assert_same_rows(TransactionLog(path).statement(), statement)
+
+
+def test_log_appends_across_sessions(statement, tmp_path):
+    path = str(tmp_path / "history.log")
+    first, second = statement.take(slice(0, 1000)), statement.take(slice(1000, None))
+    TransactionLog(path).append(first)
+    # A new merchant only in the second part extends the dictionaries
+    second = Statement.concat([second, Statement.from_columns(
+        ["2022-01-05"], [-12.0], ["New Cafe"], [0.0], ["Coffee"])])
+    TransactionLog(path).append(second)
+
+    log = TransactionLog(path)
+    assert len(log) == len(first) + len(second)
+    assert_same_rows(log.statement(), Statement.concat([first, second]))
+
+
+def test_log_drops_partial_record(statement, tmp_path):
+    path = str(tmp_path / "history.log")
+    TransactionLog(path).append(statement.take(slice(0, 10)))
+    with open(path, "ab") as f:
+        f.write(b"\0" * (RECORD_DTYPE.itemsize // 2))
+    assert len(TransactionLog(path)) == 10
+
+    TransactionLog(path).append(statement.take(slice(10, 20)))
+    log = TransactionLog(path)
+    assert len(log) == 20
+    assert_same_rows(log.statement(), statement.take(slice(0, 20)))
+
+
+def test_log_rejects_other_files(tmp_path):
+    path = tmp_path / "other.log"
+    path.write_bytes(b"\0" * HEADER_DTYPE.itemsize)
+    with pytest.raises(ValueError):
+        TransactionLog(str(path))
+
+
+@pytest.mark.parametrize("chunksize", [None, 700])
+def test_csv_to_log_matches_csv(tmp_path, chunksize):
+    paths = [str(write_mock_csv(str(tmp_path / "{}.csv".format(month)), 1500,
+                                "2021-{:02d}-01".format(month),
+                                "2021-{:02d}-28".format(month), seed=month))
+             for month in (1, 2)]
+    log = csv_to_log(paths, str(tmp_path / "history.log"), chunksize=chunksize)
+    expected = Statement.concat([Statement.from_csv(p) for p in paths])
+    assert_same_rows(log.statement(), expected)
+
+
+def test_unflushed_records_are_not_committed(statement, tmp_path):
+    path = str(tmp_path / "history.log")
+    log = TransactionLog(path)
+    log.append(statement.take(slice(0, 100)))
+    log.append(statement.take(slice(100, 200)), flush=False)
+    assert len(log) == 200
+    # Another reader only sees the flushed records
+    assert len(TransactionLog(path)) == 100
+    log.flush()
+    assert_same_rows(TransactionLog(path).statement(), statement.take(slice(0, 200)))
+
+
+def test_dictionaries_written_once(tmp_path, monkeypatch):
+    path = str(write_mock_csv(str(tmp_path / "March.csv"), 3000, "2021-03-01",
+                              "2021-03-31", seed=3))
+    writes = []
+    dump = monex_log.json.dump
+    monkeypatch.setattr(monex_log.json, "dump",
+                        lambda obj, f: writes.append(obj) or dump(obj, f))
+    log = csv_to_log([path], str(tmp_path / "history.log"), chunksize=500)
+    assert len(writes) == 1 and writes[0]["records"] == len(log) == 3000
+
+
+def test_single_currency(tmp_path):
+    path = str(tmp_path / "history.log")
+    eur = Statement.from_columns(["2021-03-01"] * 2, [-1.0, -2.0], ["a", "b"],
+                                 [0.0] * 2, ["Food"] * 2, currency=["EUR", "EUR"])
+    log = TransactionLog(path)
+    log.append(eur)
+    assert TransactionLog(path).statement().currency.tolist() == ["EUR", "EUR"]
+
+    mixed = eur.replace(currency_codes=np.array([0, 1], dtype=np.int8),
+                        currencies=np.array(["EUR", "GBP"], dtype=object))
+    with pytest.raises(ValueError):
+        TransactionLog(path).append(mixed)
+    with pytest.raises(ValueError):
+        TransactionLog(path).append(Statement.from_columns(
+            ["2021-03-02"], [-3.0], ["c"], [0.0], ["Food"], currency=["GBP"]))
+    assert len(TransactionLog(path)) == 2
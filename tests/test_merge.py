@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Merging of overlapping statements (monex_merge).
+"""
+
+import numpy as np
+import pytest
+
+from monex_merge import merge_files, merge_statements
+from monex_mock import mock_table, write_mock_csv
+from monex_statement import Statement
+
+
+def rows(st):
+    return list(zip(st.ordinals.tolist(), st.amount.tolist(), st.fees.tolist(),
+                    st.merchant.tolist(), st.category.tolist()))
+
+
+@pytest.fixture
+def statement():
+    return mock_table(1000, "2021-01-01", "2021-03-31", seed=9).sort_by_date()
+
+
+def test_overlapping_statements(statement):
+    first, second = statement.take(slice(0, 600)), statement.take(slice(400, None))
+    merged, n_duplicates = merge_statements([first, second])
+    assert n_duplicates == 200
+    assert rows(merged) == rows(statement)
+
+
+def test_repeated_transactions_are_kept():
+    coffee = (["2021-03-01"], [-4.5], ["Cafe"], [0.0], ["Coffee"])
+    twice = Statement.concat([Statement.from_columns(*coffee)] * 2)
+    once = Statement.concat([Statement.from_columns(*coffee), Statement.from_columns(
+        ["2021-03-02"], [-4.5], ["Cafe"], [0.0], ["Coffee"])])
+    merged, n_duplicates = merge_statements([twice, once])
+    # Two coffees on the 1st (the copy in the other export is dropped), one
+    # on the 2nd
+    assert n_duplicates == 1
+    assert merged.dates.astype(str).tolist() == ["2021-03-01", "2021-03-01", "2021-03-02"]
+    # A different fee makes a different transaction
+    other = Statement.from_columns(*coffee[:3], [0.1], coffee[4])
+    assert merge_statements([twice, other])[1] == 0
+
+
+def test_order_is_preserved(statement):
+    # Sorted by date, ties in input order, the first copy kept
+    later, earlier = statement.take(slice(500, None)), statement.take(slice(0, 700))
+    merged, _ = merge_statements([later, earlier])
+    expected = Statement.concat([later, earlier.take(slice(0, 500))])
+    order = np.argsort(expected.ordinals, kind="stable")
+    assert rows(merged) == rows(expected.take(order))
+
+
+def test_merge_files_is_incremental(tmp_path):
+    paths = [str(write_mock_csv(str(tmp_path / "{}.csv".format(i)), 300, start, end, seed=i))
+             for i, (start, end) in enumerate([("2021-01-01", "2021-01-31"),
+                                               ("2021-02-01", "2021-02-28")])]
+    out = str(tmp_path / "merged.npz")
+    merged, _ = merge_files(paths[:1], out=out)
+    assert len(merged) == 300
+    merged, n_duplicates = merge_files(paths, out=out)
+    assert (len(merged), n_duplicates) == (600, 300)
+
+
+def test_merge_nothing():
+    with pytest.raises(ValueError):
+        merge_statements([])
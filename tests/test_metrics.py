@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Report metrics of monex_metrics against monex_utils.range_costs, and their
+JSON export.
+"""
+
+import json
+
+import numpy as np
+
+from monex_metrics import statement_metrics, write_json
+from monex_mock import mock_table
+from monex_statement import Statement
+from monex_utils import range_costs
+
+
+def test_cumulative_matches_range_costs():
+    st = mock_table(5000, "2021-01-01", "2021-04-30", seed=6)
+    start, end = "2020-12-25", "2021-04-10"
+    metrics = statement_metrics(st, start, end)
+    costs, labels, dates = range_costs(st.amount, st.category_codes, st.dates,
+                                       start, end, categories=st.categories)
+    income, _, _ = range_costs(st.amount, st.category_codes, st.dates, start, end,
+                               income=True, categories=st.categories)
+
+    cum = metrics["cumulative"]
+    assert cum["date"] == dates.astype(str).tolist()
+    assert cum["category"] == list(labels)
+    np.testing.assert_allclose(cum["costs"], np.round(costs, 2))
+    np.testing.assert_allclose(cum["income"], np.round(income[0] * -1, 2))
+    in_range = st.between(start, end)
+    assert sum(metrics["histogram"]["count"]) == metrics["n_transactions"] == len(in_range)
+
+
+def test_json_has_no_nan(tmp_path):
+    st = Statement.from_columns(["2021-03-01", "2021-03-02", "2021-03-04"],
+                                [-3.0, np.nan, 5.0], ["a", "b", "c"],
+                                [0.1, 0.0, 0.0], ["Food", "Food", "Income"])
+    path = tmp_path / "metrics.json"
+    write_json(statement_metrics(st), str(path))
+    metrics = json.loads(path.read_text())
+    assert metrics["categories"]["total"] == [None, 5.0]
+    assert metrics["cumulative"]["costs"] == [[3.0, None, None, None]]
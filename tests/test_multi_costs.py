@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Equivalence of the vectorized monex_utils.multi_costs with the original
+nested-loop implementation (kept in benchmarks/bench_multi_costs.py), and the
+Statement inputs of the other utils.
+"""
+
+import numpy as np
+import pytest
+
+from bench_multi_costs import legacy_multi_costs, mock_columns
+from monex_statement import Statement
+from monex_utils import filt_income, multi_costs, sort_ind
+
+@pytest.mark.parametrize("income", [False, True])
+@pytest.mark.parametrize("month", ["March", "April"])
+def test_multi_costs_matches_legacy(month, income):
+    amount, category, days = mock_columns(2000, month)
+    new, new_labels = multi_costs(amount, category, days, month, income)
+    old, old_labels = legacy_multi_costs(amount, category, days, month, income)
+    assert list(new_labels) == list(old_labels)
+    np.testing.assert_allclose(new, old)
+
+
+def test_multi_costs_leap_february():
+    amount, category, days = mock_columns(500, "February", year=2020)
+    new, _ = multi_costs(amount, category, days, "February", year=2020)
+    old, _ = legacy_multi_costs(amount, category, days, "February", year=2020)
+    assert new.shape[1] == 29
+    np.testing.assert_allclose(new, old)
+
+
+def test_multi_costs_category_codes():
+    # Statement codes (no string factorization) give the same matrix
+    amount, category, days = mock_columns(1000, "March")
+    st = Statement.from_columns(np.datetime64("2021-03-01") + (days - 1), amount,
+                                np.full(len(days), "m", dtype=object),
+                                np.zeros(len(days)), category)
+    for income in (False, True):
+        coded, coded_labels = multi_costs(st.amount, st.category_codes, st.days, "March",
+                                          income, categories=st.categories)
+        plain, plain_labels = multi_costs(amount, category, days, "March", income)
+        assert list(coded_labels) == list(plain_labels)
+        np.testing.assert_allclose(coded, plain)
+
+
+def test_multi_costs_no_costs():
+    amount = np.array([100.0], dtype=object)
+    category = np.array(["Income"], dtype=object)
+    costs, labels = multi_costs(amount, category, np.array([3]), "March")
+    assert costs.shape == (0, 31) and len(labels) == 0
+
+
+def test_filt_income_statement_and_codes():
+    amount, category, days = mock_columns(1000, "March")
+    st = Statement.from_columns(np.datetime64("2021-03-01") + (days - 1), amount,
+                                np.full(len(days), "m", dtype=object),
+                                np.zeros(len(days)), category)
+    costs, cost_cats = filt_income(amount, category)
+    filtered = filt_income(st)
+    assert isinstance(filtered, Statement)
+    np.testing.assert_allclose(filtered.amount, costs.astype(float))
+    assert list(filtered.category) == list(cost_cats)
+    coded, coded_cats = filt_income(st.amount, st.category_codes, st.categories)
+    np.testing.assert_allclose(coded, costs.astype(float))
+    assert list(st.categories[coded_cats]) == list(cost_cats)
+
+
+def test_sort_ind_statement():
+    amount, category, days = mock_columns(500, "March", seed=3)
+    st = Statement.from_columns(np.datetime64("2021-03-01") + (days - 1), amount,
+                                np.full(len(days), "m", dtype=object),
+                                np.zeros(len(days)), category)
+    ordered = sort_ind(st)
+    sorted_days, sorted_amount = sort_ind(days, amount)
+    np.testing.assert_array_equal(ordered.days, sorted_days)
+    # Stable: ties keep the file order
+    idx = np.argsort(days, kind="stable")
+    np.testing.assert_allclose(ordered.amount, amount[idx].astype(float))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Recurring payments and anomalies of monex_patterns.PatternDetector.
+"""
+
+import numpy as np
+import pytest
+
+from monex_mock import mock_table
+from monex_patterns import PatternDetector
+from monex_statement import Statement
+
+
+def monthly(merchant, amount, category, start="2021-01", n=12):
+    dates = np.arange(np.datetime64(start, "M"), np.datetime64(start, "M") + n)
+    dates = dates.astype("datetime64[D]")
+    return Statement.from_columns(dates, [amount] * n, [merchant] * n,
+                                  [0.0] * n, [category] * n)
+
+
+@pytest.fixture
+def history():
+    return Statement.concat([mock_table(3000, "2021-01-01", "2021-12-31", seed=7),
+                             monthly("Landlord Property Ltd", -520.0, "Rent"),
+                             monthly("NETFLIX.COM 8842", -15.99, "Others")])
+
+
+def test_recurring(history):
+    detector = PatternDetector.from_statement(history.sort_by_date())
+    rec = detector.recurring()
+    found = dict(zip(rec["merchant"], rec["period"]))
+    assert found["landlord property ltd"] == found["netflix com"] == "monthly"
+    i = list(rec["merchant"]).index("netflix com")
+    assert rec["count"][i] == 12
+    assert np.isclose(rec["amount"][i], -15.99)
+    assert rec["last"][i] == np.datetime64("2021-12-01")
+
+
+def test_update_is_incremental(history):
+    history = history.sort_by_date()
+    months = history.dates.astype("datetime64[M]")
+    detector = PatternDetector()
+    for month in np.unique(months):
+        detector.update(history.take(months == month))
+    at_once = PatternDetector.from_statement(history)
+    for name in ("group_keys", "group_count", "gap_keys", "gap_counts",
+                 "amount_keys", "amount_counts"):
+        np.testing.assert_array_equal(getattr(detector, name), getattr(at_once, name))
+
+
+def test_anomaly_scores(history):
+    detector = PatternDetector.from_statement(history)
+    spike = Statement.from_columns(["2022-01-05", "2022-01-06", "2022-01-07"],
+                                   [-900.0, -5.0, -1.0], ["Big", "Cafe", "Shop"],
+                                   [0.0] * 3, ["Groceries", "Groceries", "Unknown"])
+    scores = detector.anomaly_scores(spike)
+    assert abs(scores[0]) > 3.5 and np.isnan(scores[2])
+    assert detector.anomalies(spike).tolist() == [True, False, False]
+
+
+def test_unparseable_amounts_are_skipped(history):
+    broken = Statement.from_columns(["2021-06-01", "2021-06-02"], [np.nan, -3.0],
+                                    ["Cafe", "Cafe"], [0.0, 0.0], ["Coffee", "Coffee"])
+    detector = PatternDetector.from_statement(Statement.concat([history, broken]))
+    reference = PatternDetector.from_statement(Statement.concat([history, broken.take([1])]))
+    np.testing.assert_array_equal(detector.amount_keys, reference.amount_keys)
+    assert np.isfinite(detector.anomaly_scores(history)).any()
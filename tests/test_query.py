@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Indexed queries of monex_query against plain masks over the statement.
+"""
+
+import numpy as np
+import pytest
+
+from monex_mock import mock_table
+from monex_query import TransactionIndex
+from monex_statement import Statement
+
+
+@pytest.fixture(scope="module")
+def index():
+    st = mock_table(5000, "2020-01-01", "2021-12-31", seed=10)
+    nat = Statement.from_columns(["NaT", "NaT"], [-5.0, -7.0],
+                                 ["Groceries merchant 1", "Coffee merchant 2"],
+                                 [0.0, 0.0], ["Groceries", "Coffee"])
+    return TransactionIndex(Statement.concat([nat, st]))
+
+
+def test_postings(index):
+    st = index.statement
+    # Sorted by date with the unparseable dates last
+    assert (np.diff(st.ordinals[:-2]) >= 0).all() and np.isnat(st.dates[-2:]).all()
+    for c in range(len(st.categories)):
+        posting = index.category_rows[index.category_bounds[c]:index.category_bounds[c + 1]]
+        np.testing.assert_array_equal(posting, np.flatnonzero(st.category_codes == c))
+    for m in range(len(st.merchants)):
+        posting = index.merchant_rows[index.merchant_bounds[m]:index.merchant_bounds[m + 1]]
+        np.testing.assert_array_equal(posting, np.flatnonzero(st.merchant_codes == m))
+
+
+@pytest.mark.parametrize("start, end, categories, merchant, low, high", [
+    (None, None, None, None, None, None),
+    ("2020-03-01", "2020-05-31", None, None, None, None),
+    ("2021-01-01", None, ["Groceries", "Coffee"], None, None, None),
+    (None, "2020-06-30", None, "merchant 1", -50, 0),
+    ("2020-02-01", "2021-02-01", ["Groceries"], "GROCERIES", None, -20),
+    (None, None, ["Rent"], None, None, None),
+])
+def test_query_matches_masks(index, start, end, categories, merchant, low, high):
+    st = index.statement
+    query = index.query().between(start, end).amount(low, high)
+    mask = np.ones(len(st), dtype=bool)
+    dates = st.dates
+    if start is not None:
+        mask &= dates >= np.datetime64(start)
+    if end is not None:
+        mask &= dates <= np.datetime64(end)
+    if categories is not None:
+        query.categories(categories)
+        mask &= np.isin(st.category, categories)
+    if merchant is not None:
+        query.merchant(merchant)
+        mask &= np.array([merchant.lower() in m.lower() for m in st.merchant])
+    if low is not None:
+        mask &= st.amount >= low
+    if high is not None:
+        mask &= st.amount <= high
+    np.testing.assert_array_equal(query.rows(), np.flatnonzero(mask))
+    assert np.isclose(query.total(), st.amount[mask].sum())
+
+
+def test_unparseable_dates(index):
+    # Selected without a date filter only
+    assert len(index.query().rows()) == len(index)
+    assert np.isnat(index.query().statement().dates).sum() == 2
+    assert not np.isnat(index.query().between("2020-01-01").statement().dates).any()
+    keys, totals, counts, _ = index.query().group_by("month")
+    assert np.isnat(keys[0]) and counts[0] == 2 and totals[0] == -12.0
+    assert counts.sum() == len(index)
+
+
+def test_group_by(index):
+    st = index.statement
+    query = index.query().between("2020-01-01", "2021-12-31")
+    keys, totals, counts, fees = query.group_by("category")
+    for key, total, count in zip(keys, totals, counts):
+        rows = (st.category == key) & ~np.isnat(st.dates)
+        assert count == rows.sum() and np.isclose(total, st.amount[rows].sum())
+    keys, _, counts, _ = query.group_by("week")
+    assert (keys.astype("datetime64[W]").astype("datetime64[D]") + 4 == keys).all()
+    with pytest.raises(ValueError):
+        query.group_by("year")
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Cached renders of monex_render.Renderer and the eviction of RenderCache.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("matplotlib")
+
+from monex_render import RenderCache, Renderer
+
+
+def draw_bars(fig, axes, values, title):
+    axes[0].bar(np.arange(len(values)), values)
+    axes[0].set_title(title)
+
+
+def test_second_render_is_a_cache_hit(tmp_path):
+    renderer = Renderer(RenderCache(str(tmp_path / "renders")), dpi=20)
+    first, second = str(tmp_path / "first.png"), str(tmp_path / "second.png")
+    data = dict(values=np.array([3.0, 1.0, 2.0]), title="Costs")
+    assert not renderer.render("bars", first, draw_bars, **data)
+    assert renderer.render("bars", second, draw_bars, **data)
+    assert (renderer.n_renders, renderer.n_hits) == (1, 1)
+    with open(first, "rb") as a, open(second, "rb") as b:
+        assert a.read() == b.read()
+
+    # Other data is drawn again
+    assert not renderer.render("bars", second, draw_bars, values=np.array([1.0]),
+                               title="Costs")
+    assert (renderer.n_renders, renderer.n_hits) == (2, 1)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = RenderCache(str(tmp_path / "renders"), max_bytes=250)
+    image = tmp_path / "image.png"
+    image.write_bytes(b"x" * 100)
+    out = str(tmp_path / "out.png")
+    cache.put("a", "png", str(image))
+    cache.put("b", "png", str(image))
+    for i, (_, _, entry) in enumerate(cache.entries()):
+        os.utime(entry, ns=(i, i))
+
+    # Using "a" again, so "b" is the least recently used image
+    assert cache.get("a", "png", out)
+    cache.put("c", "png", str(image))
+    assert cache.get("a", "png", out) and cache.get("c", "png", out)
+    assert not cache.get("b", "png", out)
+    assert len(cache.entries()) == 2
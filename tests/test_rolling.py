@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling statistics of monex_rolling against pandas' rolling.
+"""
+
+import numpy as np
+import pandas as pd
+
+from monex_mock import mock_table
+from monex_rolling import RollingStats
+from monex_stream import StatementAggregates
+
+
+def test_table_matches_pandas_rolling():
+    agg = StatementAggregates.from_statement(
+        mock_table(4000, "2021-01-01", "2021-06-30", seed=8))
+    stats = RollingStats.from_aggregates(agg)
+    table = stats.table(windows=(7, 30), percentiles=(50,))
+
+    for window in (7, 30):
+        roll = pd.DataFrame(stats.daily.T).rolling(window)
+        np.testing.assert_allclose(table["sum_{}".format(window)], roll.sum().to_numpy().T)
+        np.testing.assert_allclose(table["mean_{}".format(window)], roll.mean().to_numpy().T)
+        np.testing.assert_allclose(table["p50_{}".format(window)], roll.median().to_numpy().T)
+        counts = pd.DataFrame(stats.counts.T).rolling(window).sum().to_numpy().T
+        np.testing.assert_allclose(table["count_{}".format(window)], counts)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Typed columns of monex_statement.Statement.
+"""
+
+import numpy as np
+
+from monex_statement import Statement
+
+
+def test_missing_strings_are_blank():
+    st = Statement.from_columns(["2021-03-01"] * 4, [-1.0, -2.0, -3.0, -4.0],
+                                ["Cafe", np.nan, "Shop", None],
+                                [0.0] * 4, ["Coffee", np.nan, None, "Coffee"])
+    assert st.category.tolist() == ["Coffee", "", "", "Coffee"]
+    assert st.merchant.tolist() == ["Cafe", "", "Shop", ""]
+    assert (st.category_codes >= 0).all() and (st.merchant_codes >= 0).all()
+    both = Statement.concat([st, st.take([1])])
+    assert both.category.tolist() == ["Coffee", "", "", "Coffee", ""]
+
+
+def test_blank_category_cell(tmp_path):
+    path = tmp_path / "March.csv"
+    path.write_text("Date,Amount,Merchant,Total fees,Category\n"
+                    "01/03/2021,-4.5,Cafe,0,Coffee\n"
+                    "02/03/2021,-10,Shop,0,\n"
+                    "03/03/2021,-3,Cafe,0,Coffee\n")
+    st = Statement.from_csv(str(path))
+    assert st.category.tolist() == ["Coffee", "", "Coffee"]
+    assert st.category_code("") == st.category_codes[1]
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental ingestion of monex_store.AggregateStore against the aggregates of
+the (classified) in-memory statement.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from monex_classify import MerchantClassifier
+from monex_mock import mock_table, write_mock_csv
+from monex_statement import Statement
+from monex_store import AggregateStore
+from monex_stream import StatementAggregates
+
+
+def assert_same_aggregates(a, b):
+    assert list(a.categories) == list(b.categories)
+    assert a.start == b.start
+    np.testing.assert_allclose(a.sums, b.sums)
+    np.testing.assert_allclose(a.fees, b.fees)
+    np.testing.assert_array_equal(a.counts, b.counts)
+
+
+@pytest.fixture
+def unlabelled_csv(tmp_path):
+    # Every other transaction without a category
+    path = str(write_mock_csv(str(tmp_path / "March.csv"), 2000, "2021-03-01",
+                              "2021-03-31", seed=4))
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df.loc[::2, "Category"] = ""
+    df.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def classifier():
+    return MerchantClassifier().fit([mock_table(5000, "2021-01-01", "2021-02-28",
+                                                seed=5)])
+
+
+def test_ingest_file_appends_tail(unlabelled_csv, tmp_path):
+    expected = StatementAggregates.from_statement(Statement.from_csv(unlabelled_csv))
+    lines = open(unlabelled_csv).readlines()
+    with open(unlabelled_csv, "w") as f:
+        f.writelines(lines[:1200])
+    store = AggregateStore(str(tmp_path / "store.npz"))
+    assert store.ingest_file(unlabelled_csv) == 1199
+
+    # An export appending again the last rows with the new ones: the overlap
+    # is dropped
+    with open(unlabelled_csv, "a") as f:
+        f.writelines(lines[1100:])
+    store = AggregateStore(str(tmp_path / "store.npz"))
+    assert store.ingest_file(unlabelled_csv) == len(lines) - 1200
+    assert store.ingest_file(unlabelled_csv) == 0
+    assert_same_aggregates(store.aggregates, expected)
+
+
+def test_ingest_file_keeps_repeated_transactions(unlabelled_csv, tmp_path):
+    lines = open(unlabelled_csv).readlines()
+    with open(unlabelled_csv, "w") as f:
+        f.writelines(lines[:11] + [lines[10]])
+    store = AggregateStore(str(tmp_path / "store.npz"))
+    # Two identical transactions in one file are both counted...
+    assert store.ingest_file(unlabelled_csv) == 11
+    # ...and a third one appended with a new row as well
+    with open(unlabelled_csv, "a") as f:
+        f.writelines([lines[10]] * 3 + [lines[11]])
+    assert store.ingest_file(unlabelled_csv) == 2
+    assert store.aggregates.counts.sum() == 13
+
+
+def test_ingest_needs_a_key(tmp_path):
+    st = mock_table(10, seed=1)
+    store = AggregateStore(str(tmp_path / "store.npz"))
+    with pytest.raises(ValueError):
+        store.ingest(st)
+    assert store.ingest(st, key="mock")
+
+
+def test_ingest_file_classifies(unlabelled_csv, classifier, tmp_path):
+    store = AggregateStore(str(tmp_path / "store.npz"))
+    store.ingest_file(unlabelled_csv, classifier=classifier)
+    expected = StatementAggregates.from_statement(
+        classifier.classify(Statement.from_csv(unlabelled_csv)))
+    assert "" not in list(store.aggregates.categories)
+    assert_same_aggregates(store.aggregates, expected)
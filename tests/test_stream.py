@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Streamed (chunked) aggregation of monex_stream against the in-memory
+statement and monex_utils.multi_costs.
+"""
+
+import numpy as np
+import pytest
+
+from monex_mock import write_mock_csv
+from monex_statement import Statement
+from monex_stream import StatementAggregates, stream_statement
+from monex_utils import multi_costs
+
+
+@pytest.fixture(scope="module")
+def statement_csv(tmp_path_factory):
+    path = tmp_path_factory.mktemp("stream") / "statement.csv"
+    return str(write_mock_csv(str(path), 5000, "2020-01-01", "2020-06-30", seed=1))
+
+
+@pytest.mark.parametrize("chunksize", [333, 1000, 10_000])
+def test_streamed_aggregates_match_in_memory(statement_csv, chunksize):
+    st = Statement.from_csv(statement_csv)
+    in_memory = StatementAggregates.from_statement(st)
+    streamed = stream_statement(statement_csv, chunksize=chunksize)
+
+    assert list(streamed.categories) == list(in_memory.categories)
+    assert streamed.start == in_memory.start
+    assert streamed.n_rows == len(st)
+    np.testing.assert_allclose(streamed.sums, in_memory.sums)
+    np.testing.assert_allclose(streamed.fees, in_memory.fees)
+    np.testing.assert_array_equal(streamed.counts, in_memory.counts)
+    np.testing.assert_array_equal(streamed.first_row, in_memory.first_row)
+
+
+@pytest.mark.parametrize("month", ["February", "March"])
+@pytest.mark.parametrize("income", [False, True])
+def test_streamed_cost_matrix_matches_multi_costs(statement_csv, month, income):
+    st = Statement.from_csv(statement_csv)
+    in_month = st.dates.astype("datetime64[M]") == np.datetime64(
+        "2020-{:02d}".format(2 if month == "February" else 3))
+    st = st.take(in_month)
+    expected, labels = multi_costs(st.amount, st.category_codes, st.days, month,
+                                   income, year=2020, categories=st.categories)
+
+    costs, cost_labels = stream_statement(statement_csv, chunksize=700).cost_matrix(
+        month, income, year=2020)
+    assert list(cost_labels) == list(labels)
+    np.testing.assert_allclose(costs, expected, atol=1e-8)
+
+
+def test_category_totals_match_statement(statement_csv):
+    st = Statement.from_csv(statement_csv)
+    labels, totals, counts, fees = stream_statement(statement_csv, 900).category_totals()
+    for label, total, count, fee in zip(labels, totals, counts, fees):
+        rows = st.category == label
+        assert count == rows.sum()
+        assert np.isclose(total, st.amount[rows].sum())
+        assert np.isclose(fee, st.fees[rows].sum())
+
+
+def test_mistyped_dates_are_skipped():
+    st = Statement.from_columns(["2021-03-01", "2201-03-02", "NaT", "1921-03-04",
+                                 "2021-03-05"],
+                                [-1.0, -2.0, -4.0, -8.0, -16.0], list("abcde"),
+                                np.zeros(5), ["Food"] * 5)
+    agg = StatementAggregates.from_statement(st)
+    # The grid only spans the plausible dates
+    assert agg.start == np.datetime64("2021-03-01") and agg.sums.shape == (1, 5)
+    assert agg.sums.sum() == -17.0 and agg.counts.sum() == 2
+    agg.update(st.take(np.array([1, 3])))
+    assert agg.sums.shape == (1, 5)